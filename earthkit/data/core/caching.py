@@ -13,6 +13,7 @@
 # The calling code is responsible for checking if the file exists and
 # decide to read it or create it.
 
+import atexit
 import ctypes
 import datetime
 import hashlib
@@ -124,7 +125,39 @@ class Future:
         return self._result
 
 
+def _entry_size(path):
+    if os.path.isdir(path):
+        size = 0
+        for root, _, files in os.walk(path):
+            for f in files:
+                size += os.path.getsize(os.path.join(root, f))
+        return "directory", size
+    return "file", os.path.getsize(path)
+
+
 class CacheManager(threading.Thread):
+    # Batched write of the accesses to the entries. The entries not yet in the
+    # database are inserted.
+    UPSERT = """
+        INSERT INTO cache(
+                        path,
+                        owner,
+                        args,
+                        creation_date,
+                        last_access,
+                        accesses,
+                        parent,
+                        size,
+                        type,
+                        owner_data)
+        VALUES(?,?,?,?,?,?,?,?,?,?)
+        ON CONFLICT(path) DO UPDATE SET
+            accesses    = COALESCE(accesses, 0) + excluded.accesses,
+            last_access = excluded.last_access,
+            size        = COALESCE(excluded.size, size),
+            type        = COALESCE(excluded.type, type),
+            owner_data  = COALESCE(excluded.owner_data, owner_data)"""
+
     def __init__(self):
         super().__init__(daemon=True)
         self._connection = None
@@ -132,14 +165,60 @@ class CacheManager(threading.Thread):
         self._condition = threading.Condition()
         self._policy = EmptyCachePolicy()
 
+        # The entries known to this process, by path, and the number of accesses
+        # to each of them not yet written to the database. They are written by
+        # _flush(), at the latest after "cache-database-flush-interval".
+        self._entries = {}
+        self._accesses = {}
+        self._entries_lock = threading.Lock()
+        self._flush_deadline = None
+
+        # The cache size checks requested on the creation of entries are run at
+        # most once every "cache-size-check-interval".
+        self._check_size_deadline = None
+        self._last_check_size = None
+
+        atexit.register(self._flush_at_exit)
+
     def run(self):
         while True:
             with self._condition:
                 while len(self._queue) == 0:
-                    self._condition.wait()
-                s = self._queue.pop(0)
+                    timeout = self._timeout()
+                    if timeout is not None and timeout <= 0:
+                        break
+                    self._condition.wait(timeout)
+                s = self._queue.pop(0) if self._queue else None
+                check_size = self._due(self._check_size_deadline)
+                if check_size:
+                    self._check_size_deadline = None
                 self._condition.notify_all()
-            s.execute()
+
+            # The pending writes are done before any other use of the database.
+            # The lookup of an unknown entry does not need them.
+            if s is None or s.func != self._lookup_entry:
+                self._flush()
+            if check_size:
+                try:
+                    self._check_cache_size()
+                except Exception as e:
+                    LOG.error(e)
+            if s is not None:
+                s.execute()
+
+    @staticmethod
+    def _due(deadline):
+        return deadline is not None and deadline <= time.monotonic()
+
+    def _timeout(self):
+        deadlines = [
+            x
+            for x in (self._flush_deadline, self._check_size_deadline)
+            if x is not None
+        ]
+        if not deadlines:
+            return None
+        return min(deadlines) - time.monotonic()
 
     @property
     def connection(self):
@@ -185,6 +264,120 @@ class CacheManager(threading.Thread):
             self._condition.notify_all()
             return s
 
+    def register_cache_file(self, path, owner, args, parent=None):
+        """Register an access to a cache file. Unlike the other methods it is
+        called by the thread using the cache. Only the first access to an entry
+        unknown to this process waits for the database, the accesses are
+        written later in batches. Returns the entry.
+        """
+        return self._register_cache_file(
+            path,
+            owner,
+            args,
+            parent,
+            lookup=lambda x: self.enqueue(self._lookup_entry, x).result(),
+        )
+
+    def update_entry(self, path, owner_data=None):
+        """Set the size and the ``owner_data`` of an entry once the cache file is
+        created. Called by the thread using the cache, the entry is written later.
+        """
+        with self._entries_lock:
+            known = path in self._entries
+        if not known:
+            return self.enqueue(self._update_entry, path, owner_data).result()
+
+        self._ensure_in_cache(path)
+        kind, size = _entry_size(path)
+        owner_data = json.dumps(owner_data, default=default_serialiser)
+        with self._entries_lock:
+            entry = self._entries.get(path)
+            if entry is not None:
+                entry.update(size=size, type=kind, owner_data=owner_data)
+                self._accesses.setdefault(path, 0)
+        self._schedule_flush()
+
+    def schedule_check_cache_size(self):
+        """Request a check of the cache size, which is delayed when the
+        previous one is more recent than "cache-size-check-interval".
+        """
+        with self._condition:
+            if self._check_size_deadline is None:
+                now = time.monotonic()
+                if self._last_check_size is None:
+                    self._check_size_deadline = now
+                else:
+                    interval = SETTINGS.get("cache-size-check-interval")
+                    self._check_size_deadline = max(
+                        now, self._last_check_size + interval
+                    )
+                self._condition.notify_all()
+
+    def _schedule_flush(self):
+        with self._condition:
+            if self._flush_deadline is None:
+                interval = SETTINGS.get("cache-database-flush-interval")
+                self._flush_deadline = time.monotonic() + interval
+                self._condition.notify_all()
+
+    def _flush(self):
+        """Write the pending accesses to the database in a single transaction."""
+        with self._condition:
+            self._flush_deadline = None
+
+        with self._entries_lock:
+            if not self._accesses:
+                return
+            rows = []
+            for path, accesses in self._accesses.items():
+                e = self._entries[path]
+                rows.append(
+                    (
+                        path,
+                        e["owner"],
+                        e["args"],
+                        e["creation_date"],
+                        e["last_access"],
+                        accesses,
+                        e["parent"],
+                        e["size"],
+                        e["type"],
+                        e["owner_data"],
+                    )
+                )
+            self._accesses = {}
+
+        # a temporary cache may be deleted before the settings change reaches
+        # the manager, its pending accesses are dropped with it
+        if not self._policy.managed() or not os.path.isdir(self._policy.directory()):
+            return
+
+        try:
+            with self.connection as db:
+                db.executemany(self.UPSERT, rows)
+        except Exception as e:
+            LOG.error(e)
+
+    def _flush_at_exit(self):
+        if self.is_alive():
+            self.enqueue(self._flush).result()
+
+    def _forget(self, path=None):
+        """Remove an entry, or all of them when ``path`` is None, from the entries
+        known to this process."""
+        with self._entries_lock:
+            if path is None:
+                self._entries.clear()
+                self._accesses.clear()
+            else:
+                self._entries.pop(path, None)
+                self._accesses.pop(path, None)
+
+    def _lookup_entry(self, path):
+        with self.connection as db:
+            entry = db.execute("SELECT * FROM cache WHERE path=?", (path,)).fetchone()
+        return None if entry is None else dict(entry)
+
     def _ensure_in_cache(self, path):
         assert self._policy.file_in_cache_directory(path), f"File not in cache {path}"
 
@@ -192,6 +385,7 @@ class CacheManager(threading.Thread):
         LOG.debug("Settings changed")
         self._policy = policy
         self._connection = None  # The user may have changed the cache directory
+        self._forget()
         self._check_cache_size()
 
     def _latest_date(self):
@@ -237,16 +431,7 @@ class CacheManager(threading.Thread):
 
     def _update_entry(self, path, owner_data=None):
         self._ensure_in_cache(path)
-
-        if os.path.isdir(path):
-            kind = "directory"
-            size = 0
-            for root, _, files in os.walk(path):
-                for f in files:
-                    size += os.path.getsize(os.path.join(root, f))
-        else:
-            kind = "file"
-            size = os.path.getsize(path)
+        kind, size = _entry_size(path)
 
         with self.connection as db:
             db.execute(
@@ -280,6 +465,7 @@ class CacheManager(threading.Thread):
                 except Exception:
                     if clean:
                         db.execute("DELETE from cache WHERE path=?", (path,))
+                        self._forget(path)
                         commit = True
 
             if update:
@@ -289,6 +475,7 @@ class CacheManager(threading.Thread):
                 db.commit()
 
     def _housekeeping(self, clean=False):
+        self._flush()
         top = self._policy.directory()
         with self.connection as db:
             for name in os.listdir(top):
@@ -296,6 +483,10 @@ class CacheManager(threading.Thread):
                     continue
 
                 full = os.path.join(top, name)
+                with self._entries_lock:
+                    if full in self._entries:
+                        continue
+
                 count = db.execute(
                     "SELECT count(*) FROM cache WHERE path=?", (full,)
                 ).fetchone()[0]
@@ -398,6 +589,7 @@ class CacheManager(threading.Thread):
             LOG.warning(f"cache file lost: {path}")
             with self.connection as db:
                 db.execute("DELETE FROM cache WHERE path=?", (path,))
+            self._forget(path)
             return total
 
         LOG.warning(f"earthkit-data cache: deleting {path} ({humanize.bytes(size)})")
@@ -406,6 +598,7 @@ class CacheManager(threading.Thread):
 
         with self.connection as db:
             db.execute("DELETE FROM cache WHERE path=?", (path,))
+        self._forget(path)
 
         return total + size
 
@@ -438,7 +631,7 @@ class CacheManager(threading.Thread):
 
         LOG.warning("earthkit-data cache: could not free %s", humanize.bytes(bytes))
 
-    def _register_cache_file(self, path, owner, args, parent=None):
+    def _register_cache_file(self, path, owner, args, parent=None, lookup=None):
         """Register a file in the cache
 
         Parameters
@@ -449,48 +642,54 @@ class CacheManager(threading.Thread):
             Owner of the cache file (generally a source or a dataset)
         args : dict
             Dictionary to save with the file in the database, as json string.
+        parent : str, None
+            Path of the entry this one is derived from.
+        lookup : callable, None
+            Method reading the entry of an unknown path from the database.
 
         Returns
         -------
-        changes :
-            None or False if database does not need to be updated. TODO: clarify.
+        dict
+            The cache entry, with the access counted. It is written to the
+            database by :obj:`_flush`.
         """
         self._ensure_in_cache(path)
 
-        with self.connection as db:
-            now = datetime.datetime.now()
-
-            args = json.dumps(args, default=default_serialiser)
-
-            db.execute(
-                """
-                UPDATE cache
-                SET accesses    = accesses + 1,
-                    last_access = ?
-                WHERE path=?""",
-                (now, path),
-            )
-
-            changes = db.execute("SELECT changes()").fetchone()[0]
-
-            if not changes:
-                db.execute(
-                    """
-                    INSERT INTO cache(
-                                    path,
-                                    owner,
-                                    args,
-                                    creation_date,
-                                    last_access,
-                                    accesses,
-                                    parent)
-                    VALUES(?,?,?,?,?,?,?)""",
-                    (path, owner, args, now, now, 1, parent),
+        with self._entries_lock:
+            entry = self._entries.get(path)
+
+        if entry is None:
+            entry = (lookup or self._lookup_entry)(path)
+
+        now = datetime.datetime.now().isoformat(" ")
+        with self._entries_lock:
+            if path in self._entries:
+                entry = self._entries[path]
+            elif entry is None:
+                entry = dict(
+                    path=path,
+                    owner=owner,
+                    args=json.dumps(args, default=default_serialiser),
+                    creation_date=now,
+                    flags=0,
+                    owner_data=None,
+                    last_access=now,
+                    type=None,
+                    parent=parent,
+                    replaced=None,
+                    extra=None,
+                    expires=None,
+                    accesses=0,
+                    size=None,
                 )
+            entry["accesses"] = (entry["accesses"] or 0) + 1
+            entry["last_access"] = now
+            self._entries[path] = entry
+            self._accesses[path] = self._accesses.get(path, 0) + 1
+            result = dict(entry)
 
-            return dict(
-                db.execute("SELECT * FROM cache WHERE path=?", (path,)).fetchone()
-            )
+        self._schedule_flush()
+        return result
 
     def _cache_size(self):
         LOG.debug("cache_size")
@@ -504,6 +703,7 @@ class CacheManager(threading.Thread):
         self._delete_entry(path)
 
     def _check_cache_size(self):
+        self._last_check_size = time.monotonic()
         if self._policy.managed():
             # Check absolute limit
             maximum = self._policy.maximum_cache_size()
@@ -852,11 +1052,20 @@ class Cache:
         """
         return self._call_manager(False, "summary_dump_cache_database", *args, **kwargs)
 
+    def _call_manager_directly(self, name, *args, **kwargs):
+        # the method is run by the calling thread
+        if self.policy.managed() and self._manager is not None:
+            with self._manager_lock:
+                return getattr(self._manager, name)(*args, **kwargs)
+
     def _register_cache_file(self, *args, **kwargs):
-        return self._call_manager(False, "register_cache_file", *args, **kwargs)
+        return self._call_manager_directly("register_cache_file", *args, **kwargs)
 
     def _update_entry(self, *args, **kwargs):
-        return self._call_manager(False, "update_entry", *args, **kwargs)
+        return self._call_manager_directly("update_entry", *args, **kwargs)
+
+    def _check_size_later(self):
+        return self._call_manager_directly("schedule_check_cache_size")
 
     def _decache_file(self, *args, **kwargs):
         return self._call_manager(False, "decache_file", *args, **kwargs)
@@ -948,6 +1157,26 @@ class Cache:
 CACHE = Cache()
 
 
+def _cache_file_path(owner, args, hash_extra, extension):
+    m = hashlib.sha256()
+    m.update(owner.encode("utf-8"))
+
+    m.update(
+        json.dumps(args, sort_keys=True, default=default_serialiser).encode("utf-8")
+    )
+    m.update(json.dumps(hash_extra, sort_keys=True).encode("utf-8"))
+    m.update(json.dumps(extension, sort_keys=True).encode("utf-8"))
+
+    return os.path.join(
+        CACHE.directory(),
+        "{}-{}{}".format(
+            owner.lower(),
+            m.hexdigest(),
+            extension,
+        ),
+    )
+
+
 def cache_file(
     owner: str,
     create,
@@ -994,28 +1223,12 @@ def cache_file(
     managed = CACHE.policy.managed() and CACHE.directory() is not None
 
     if managed:
-        m = hashlib.sha256()
-        m.update(owner.encode("utf-8"))
-
-        m.update(
-            json.dumps(args, sort_keys=True, default=default_serialiser).encode("utf-8")
-        )
-        m.update(json.dumps(hash_extra, sort_keys=True).encode("utf-8"))
-        m.update(json.dumps(extension, sort_keys=True).encode("utf-8"))
-
         if replace is not None:
             # Don't replace files that are not in the cache
             if not CACHE.policy.file_in_cache_directory(replace):
                 replace = None
 
-        path = os.path.join(
-            CACHE.directory(),
-            "{}-{}{}".format(
-                owner.lower(),
-                m.hexdigest(),
-                extension,
-            ),
-        )
+        path = _cache_file_path(owner, args, hash_extra, extension)
 
         record = CACHE._register_cache_file(path, owner, args)
         if os.path.exists(path):
@@ -1038,7 +1251,7 @@ def cache_file(
                     owner_data = create(path + ".tmp", args)
                     os.rename(path + ".tmp", path)
                     CACHE._update_entry(path, owner_data)
-                    CACHE.check_size()
+                    CACHE._check_size_later()
 
             try:
                 os.unlink(lock)
@@ -1088,7 +1301,6 @@ def auxiliary_cache_file(
     It can be used for example to cache an index for a message based format
     such as GRIB. It is invalidated if ``path`` is changed.
     """
-    stat = os.stat(path)
 
     def create(target, args):
         # Simply touch the file
@@ -1099,16 +1311,37 @@ def auxiliary_cache_file(
     return cache_file(
         owner,
         create,
-        (
-            path,
-            stat.st_ctime,
-            stat.st_mtime,
-            stat.st_size,
-            index,
-        ),
+        _auxiliary_cache_args(path, index),
         extension=extension,
     )
 
 
+def existing_auxiliary_cache_file(owner, path, index=0, extension=".cache"):
+    r"""Return the auxiliary cache file that :func:`auxiliary_cache_file` would
+    return for the same arguments, or None when it was never created. Unlike
+    :func:`auxiliary_cache_file` no new cache entry is created.
+    """
+    if not CACHE.policy.managed() or CACHE.directory() is None:
+        return None
+
+    target = _cache_file_path(
+        owner, _auxiliary_cache_args(path, index), None, extension
+    )
+    if os.path.exists(target):
+        return target
+    return None
+
+
+def _auxiliary_cache_args(path, index):
+    stat = os.stat(path)
+    return (
+        path,
+        stat.st_ctime,
+        stat.st_mtime,
+        stat.st_size,
+        index,
+    )
+
+
 # housekeeping()
 SETTINGS.on_change(CACHE._settings_changed)
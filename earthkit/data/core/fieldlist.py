@@ -9,10 +9,10 @@
 
 import math
 from abc import abstractmethod
-from collections import defaultdict
 
 from earthkit.data.core import Base
 from earthkit.data.core.index import Index
+from earthkit.data.core.settings import SETTINGS
 from earthkit.data.decorators import cached_method
 from earthkit.data.utils.metadata import metadata_argument
 
@@ -62,7 +62,21 @@ class Field(Base):
             self.__metadata = self._make_metadata()
         return self.__metadata
 
-    def to_numpy(self, flatten=False, dtype=None):
+    def _bulk_metadata(self):
+        r"""Metadata: Get the object used to extract multiple keys at once."""
+        return self._metadata
+
+    def _metadata_row(self, keys, astype, default=None, raise_on_missing=True):
+        r"""Return the values of ``keys`` as a list. ``astype`` must be a list
+        with one item per key. Used by the bulk metadata extraction.
+        """
+        md = self._bulk_metadata()
+        return [
+            md.get(k, default=default, astype=kt, raise_on_missing=raise_on_missing)
+            for k, kt in zip(keys, astype)
+        ]
+
+    def to_numpy(self, flatten=False, dtype=None, out=None):
         r"""Return the values stored in the field as an ndarray.
 
         Parameters
@@ -73,15 +87,27 @@ class Field(Base):
         dtype: str, numpy.dtype or None
             Typecode or data-type of the array. When it is :obj:`None` the default
             type used by the underlying data accessor is used. For GRIB it is ``np.float64``.
+            When ``out`` is specified the default is the type of ``out``.
+        out: ndarray, None
+            Array to store the result in. Its shape must be the shape of the result.
+            When it is None a new array is returned.
 
         Returns
         -------
         ndarray
-            Field values
+            Field values. ``out`` when it is specified.
 
+        Raises
+        ------
+        ValueError
+            When ``out`` has an invalid shape.
         """
+        if out is not None and dtype is None:
+            dtype = out.dtype
         v = self._values(dtype=dtype)
         shape = self._required_shape(flatten)
+        if out is not None:
+            return _copy_to(out, v, shape)
         if shape != v.shape:
             return v.reshape(shape)
         return v
@@ -93,7 +119,7 @@ class Field(Base):
         shape = self._required_shape(flatten)
         return shape == array.shape and (dtype is None or dtype == array.dtype)
 
-    def data(self, keys=("lat", "lon", "value"), flatten=False, dtype=None):
+    def data(self, keys=("lat", "lon", "value"), flatten=False, dtype=None, out=None):
         r"""Return the values and/or the geographical coordinates for each grid point.
 
         Parameters
@@ -107,6 +133,10 @@ class Field(Base):
         dtype: str, numpy.dtype or None
             Typecode or data-type of the arrays. When it is :obj:`None` the default
             type used by the underlying data accessor is used. For GRIB it is ``np.float64``.
+            When ``out`` is specified the default is the type of ``out``.
+        out: ndarray, None
+            Array to store the result in. Its shape must be the shape of the result.
+            When it is None a new array is returned.
 
 
         Returns
@@ -114,7 +144,12 @@ class Field(Base):
         ndarray
             An ndarray containing one ndarray per key is returned
             (following the order in ``keys``). When ``keys`` is a single value only the
-            ndarray belonging to the key is returned.
+            ndarray belonging to the key is returned. ``out`` when it is specified.
+
+        Raises
+        ------
+        ValueError
+            When ``out`` has an invalid shape.
 
 
         Examples
@@ -159,6 +194,21 @@ class Field(Base):
             if k not in _keys:
                 raise ValueError(f"data: invalid argument: {k}")
 
+        if out is not None:
+            if dtype is None:
+                dtype = out.dtype
+            shape = self._required_shape(flatten)
+            if len(keys) == 1:
+                return _copy_to(out, _keys[keys[0]](dtype=dtype), shape)
+
+            if out.shape != (len(keys),) + shape:
+                raise ValueError(
+                    f"out: invalid shape={out.shape}, expected={(len(keys),) + shape}"
+                )
+            for i, k in enumerate(keys):
+                _copy_to(out[i], _keys[k](dtype=dtype), shape)
+            return out
+
         r = [_keys[k](dtype=dtype) for k in keys]
         shape = self._required_shape(flatten)
         if shape != r[0].shape:
@@ -210,7 +260,8 @@ class Field(Base):
                 y = y.reshape(shape)
             return dict(x=x, y=y)
         elif self.projection().CARTOPY_CRS == "PlateCarree":
-            lon, lat = self.data(("lon", "lat"), flatten=flatten, dtype=dtype)
+            lon = self.data("lon", flatten=flatten, dtype=dtype)
+            lat = self.data("lat", flatten=flatten, dtype=dtype)
             return dict(x=lon, y=lat)
         else:
             raise ValueError(
@@ -241,7 +292,10 @@ class Field(Base):
         to_points
 
         """
-        lon, lat = self.data(("lon", "lat"), flatten=flatten, dtype=dtype)
+        # the coordinates are not stacked so that the arrays shared between the
+        # fields on the same grid are not copied
+        lat = self.data("lat", flatten=flatten, dtype=dtype)
+        lon = self.data("lon", flatten=flatten, dtype=dtype)
         return dict(lat=lat, lon=lon)
 
     @property
@@ -564,24 +618,30 @@ class FieldList(Index):
         else:
             return []
 
+    def _column_index_keys(self):
+        return self._default_index_keys()
+
+    def _compute_column_values(self, keys):
+        rows = self._metadata_rows(
+            keys, [None] * len(keys), default=None, raise_on_missing=False
+        )
+        return {k: [r[i] for r in rows] for i, k in enumerate(keys)}
+
     def _find_index_values(self, key):
-        values = set()
-        for f in self:
-            v = f.metadata(key, default=None)
-            if v is not None:
-                values.add(v)
+        values = set(self._column_index().values(key))
+        values.discard(None)
         return sorted(list(values))
 
     def _find_all_index_dict(self):
-        indices = defaultdict(set)
-        for f in self:
-            for k in self._default_index_keys():
-                v = f.metadata(k, default=None)
-                if v is None:
-                    continue
-                indices[k].add(v)
-
-        return {k: sorted(list(v)) for k, v in indices.items()}
+        columns = self._column_index()
+        columns.build(self._default_index_keys())
+        indices = {}
+        for k in self._default_index_keys():
+            v = set(columns.values(k))
+            v.discard(None)
+            if v:
+                indices[k] = sorted(list(v))
+        return indices
 
     def indices(self, squeeze=False):
         r"""Return the unique, sorted values for a set of metadata keys (see below)
@@ -662,12 +722,86 @@ class FieldList(Index):
         self._md_indices[key] = self._find_index_values(key)
         return self._md_indices[key]
 
-    def to_numpy(self, **kwargs):
+    def _to_numpy_array(self, func, out=None):
+        r"""Create an ndarray from the arrays returned by ``func`` for each field.
+
+        The output array is allocated only once (using the shape and dtype of the
+        first array) and filled in place. When the ``number-of-decode-threads``
+        setting is larger than 1 the fields are processed by a thread pool.
+
+        Parameters
+        ----------
+        func: callable
+            Function returning an ndarray for a field.
+        out: ndarray, None
+            Array to store the result in. Its first dimension must be the number of
+            fields and the rest must match the shape of the arrays returned by ``func``.
+
+        Returns
+        -------
+        ndarray
+            ``out`` when it is specified, otherwise a new array.
+        """
+        import numpy as np
+
+        n = len(self)
+        if n == 0:
+            if out is not None:
+                if out.shape[:1] != (0,):
+                    raise ValueError(
+                        f"out: invalid shape={out.shape}, expected first dimension=0"
+                    )
+                return out
+            return np.array([])
+
+        it = iter(self)
+        v = func(next(it))
+        shape = (n,) + v.shape
+        if out is None:
+            out = np.empty(shape, dtype=v.dtype)
+        elif out.shape != shape:
+            raise ValueError(f"out: invalid shape={out.shape}, expected={shape}")
+        out[0] = v
+        del v
+
+        def _fill(i, f):
+            v = func(f)
+            if v.shape != shape[1:]:
+                raise ValueError(
+                    f"Field {i} has shape={v.shape}, expected={shape[1:]}."
+                    " Fields do not have the same shape"
+                )
+            out[i] = v
+
+        nthreads = min(SETTINGS.get("number-of-decode-threads"), n - 1)
+        if nthreads > 1:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(max_workers=nthreads) as executor:
+                for _ in executor.map(_fill, range(1, n), it):
+                    pass
+        else:
+            for i, f in enumerate(it, 1):
+                _fill(i, f)
+
+        return out
+
+    def to_numpy(self, out=None, **kwargs):
         r"""Return the field values as an ndarray. It is formed as the array of the
         :obj:`data.core.fieldlist.Field.to_numpy` values per field.
 
+        The resulting array is allocated only once and filled in place field by field.
+        The number of threads used for decoding the fields is controlled by
+        the ``number-of-decode-threads`` setting.
+
         Parameters
         ----------
+        out: ndarray, None
+            Array to store the result in. Its shape must be ``(len(self), *shape)``,
+            where ``shape`` is the shape of the array returned by
+            :obj:`data.core.fieldlist.Field.to_numpy` for a field.
+            When it is None a new array is allocated. When ``dtype`` is not specified
+            the fields are decoded with the type of ``out``.
         **kwargs: dict, optional
             Keyword arguments passed to :obj:`data.core.fieldlist.Field.to_numpy`
 
@@ -676,13 +810,18 @@ class FieldList(Index):
         ndarray
             Array containing the field values.
 
+        Raises
+        ------
+        ValueError
+            When the fields do not have the same shape or ``out`` has an invalid shape.
+
         See Also
         --------
         values
         """
-        import numpy as np
-
-        return np.array([f.to_numpy(**kwargs) for f in self])
+        if out is not None and kwargs.get("dtype") is None:
+            kwargs["dtype"] = out.dtype
+        return self._to_numpy_array(lambda f: f.to_numpy(**kwargs), out=out)
 
     @property
     def values(self):
@@ -708,11 +847,9 @@ class FieldList(Index):
         array([262.78027344, 267.44726562, 268.61230469])
 
         """
-        import numpy as np
+        return self._to_numpy_array(lambda f: f.values)
 
-        return np.array([f.values for f in self])
-
-    def data(self, keys=("lat", "lon", "value"), flatten=False, dtype=None):
+    def data(self, keys=("lat", "lon", "value"), flatten=False, dtype=None, out=None):
         r"""Return the values and/or the geographical coordinates.
 
         Only works when all the fields have the same grid geometry.
@@ -728,7 +865,10 @@ class FieldList(Index):
         dtype: str, numpy.dtype or None
             Typecode or data-type of the arrays. When it is :obj:`None` the default
             type used by the underlying data accessor is used. For GRIB it is
-            ``np.float64``.
+            ``np.float64``. When ``out`` is specified the default is the type of ``out``.
+        out: ndarray, None
+            Array to store the result in. Its shape must be the shape of the result.
+            When it is None a new array is returned.
 
         Returns
         -------
@@ -778,34 +918,70 @@ class FieldList(Index):
         values
 
         """
+        return self._data(keys=keys, flatten=flatten, dtype=dtype, out=out)
+
+    def _data(
+        self,
+        keys=("lat", "lon", "value"),
+        flatten=False,
+        dtype=None,
+        out=None,
+        **kwargs,
+    ):
+        r"""Implement :obj:`data`. ``kwargs`` are passed to :obj:`to_numpy`."""
         import numpy as np
 
+        if out is not None and dtype is None:
+            dtype = out.dtype
+
         if self._is_shared_grid():
             if isinstance(keys, str):
                 keys = [keys]
 
-            if "lat" in keys or "lon" in keys:
-                latlon = self[0].to_latlon(flatten=flatten, dtype=dtype)
+            for k in keys:
+                if k not in ("lat", "lon", "value"):
+                    raise ValueError(f"data: invalid argument: {k}")
+
+            def _values(out=None):
+                return self.to_numpy(flatten=flatten, dtype=dtype, out=out, **kwargs)
 
-            r = []
+            if "lat" not in keys and "lon" not in keys:
+                if len(keys) == 1:
+                    return _values(out=out)
+                r = np.array([v for _ in keys for v in _values()])
+                if out is not None:
+                    return _copy_to(out, r, r.shape)
+                return r
+
+            latlon = self[0].to_latlon(flatten=flatten, dtype=dtype)
+
+            # the result is allocated only once and the field values are
+            # directly written into it
+            n = sum(len(self) if k == "value" else 1 for k in keys)
+            shape = (n,) + latlon["lat"].shape
+            if out is None:
+                r = np.empty(shape, dtype=latlon["lat"].dtype)
+            elif out.shape != shape:
+                raise ValueError(f"out: invalid shape={out.shape}, expected={shape}")
+            else:
+                r = out
+            pos = 0
             for k in keys:
-                if k == "lat":
-                    r.append(latlon["lat"])
-                elif k == "lon":
-                    r.append(latlon["lon"])
-                elif k == "value":
-                    r.extend([f.to_numpy(flatten=flatten, dtype=dtype) for f in self])
+                if k == "value":
+                    _values(out=r[pos : pos + len(self)])
+                    pos += len(self)
                 else:
-                    raise ValueError(f"data: invalid argument: {k}")
+                    r[pos] = latlon[k]
+                    pos += 1
 
-            return np.array(r)
+            return r
 
         elif len(self) == 0:
             return np.array([])
         else:
             raise ValueError("Fields do not have the same grid geometry")
 
-    def metadata(self, *args, **kwargs):
+    def metadata(self, *args, output=None, **kwargs):
         r"""Return the metadata values for each field.
 
         Parameters
@@ -813,14 +989,28 @@ class FieldList(Index):
         *args: tuple
             Positional arguments defining the metadata keys. Passed to
             :obj:`GribField.metadata() <data.readers.grib.codes.GribField.metadata>`
+        output: str, None
+            When it is None a list with one item per field is returned. Otherwise the
+            values are extracted in bulk and returned column-wise, one column per key:
+
+            - "columns": a dict of ndarrays
+            - "pandas": a pandas DataFrame
+            - "pyarrow": a pyarrow Table
+
+            The dtype of the columns is derived from the values: integer keys are stored as
+            ``int64``, other numeric keys as ``float64`` (missing values become ``nan``),
+            datetimes as ``datetime64`` and everything else as ``object``. Only valid when
+            keys are specified.
         **kwargs: dict, optional
             Keyword arguments passed to
             :obj:`GribField.metadata() <data.readers.grib.codes.GribField.metadata>`
 
         Returns
         -------
-        list
-            List with one item per :obj:`GribField <data.readers.grib.codes.GribField>`
+        list, dict, DataFrame or Table
+            When ``output`` is None the list with one item per
+            :obj:`GribField <data.readers.grib.codes.GribField>`. Otherwise the
+            column-wise values in the format specified by ``output``.
 
         Examples
         --------
@@ -832,12 +1022,71 @@ class FieldList(Index):
         [('2t', 'K'), ('msl', 'Pa')]
         >>> ds.metadata(["param", "units"])
         [['2t', 'K'], ['msl', 'Pa']]
+        >>> ds.metadata(["param", "level"], output="columns")
+        {'param': array(['2t', 'msl'], dtype=object), 'level': array([0, 0])}
 
         """
-        result = []
-        for s in self:
-            result.append(s.metadata(*args, **kwargs))
-        return result
+        if output is None:
+            result = []
+            for s in self:
+                result.append(s.metadata(*args, **kwargs))
+            return result
+
+        return self._metadata_columns(*args, output=output, **kwargs)
+
+    def _metadata_columns(self, *args, output="columns", **kwargs):
+        if output not in METADATA_OUTPUTS:
+            raise ValueError(
+                f"metadata: invalid output={output}, must be one of {METADATA_OUTPUTS}"
+            )
+
+        namespace = kwargs.pop("namespace", None)
+        astype = kwargs.pop("astype", None)
+        names, namespace, astype, _ = metadata_argument(
+            *args, namespace=namespace, astype=astype
+        )
+        if not names:
+            raise ValueError(f"metadata: keys must be specified with output={output}")
+
+        keys = names
+        if namespace and namespace[0] != "default":
+            keys = [namespace[0] + "." + k for k in keys]
+
+        raise_on_missing = "default" not in kwargs
+        default = kwargs.pop("default", None)
+
+        rows = self._metadata_rows(
+            keys, astype, default=default, raise_on_missing=raise_on_missing, **kwargs
+        )
+
+        columns = {}
+        for i, name in enumerate(names):
+            columns[name] = _metadata_column([r[i] for r in rows])
+
+        if output == "pandas":
+            import pandas as pd
+
+            return pd.DataFrame(columns)
+        elif output == "pyarrow":
+            import pyarrow as pa
+
+            return pa.table(columns)
+
+        return columns
+
+    def _metadata_rows(
+        self, keys, astype, default=None, raise_on_missing=True, **kwargs
+    ):
+        r"""Return the values of ``keys`` as a list with one list per field.
+        ``kwargs`` are the options of the bulk decoding of subclasses (e.g.
+        ``decode_backend``), they are ignored here.
+        """
+        return [
+            f._metadata_row(
+                keys, astype, default=default, raise_on_missing=raise_on_missing
+            )
+            for f in self
+        ]
 
     def ls(self, n=None, keys=None, extra_keys=None, namespace=None):
         r"""Generate a list like summary using a set of metadata keys.
@@ -1246,3 +1495,44 @@ class FieldList(Index):
 
 
 fieldlist_converters = {"numpy": "_to_numpy_fieldlist"}
+
+METADATA_OUTPUTS = ("columns", "pandas", "pyarrow")
+
+
+def _metadata_column(values):
+    r"""Convert the list of metadata ``values`` into an ndarray."""
+    import datetime
+    import numbers
+
+    import numpy as np
+
+    if len(values) == 0:
+        return np.array([], dtype=object)
+
+    if any(v is None for v in values):
+        if all(
+            v is None or (isinstance(v, numbers.Real) and not isinstance(v, bool))
+            for v in values
+        ):
+            return np.array(
+                [np.nan if v is None else v for v in values], dtype=np.float64
+            )
+        return np.array(values, dtype=object)
+
+    if all(isinstance(v, datetime.datetime) for v in values):
+        return np.array(values, dtype="datetime64[us]")
+
+    a = np.array(values)
+    if a.dtype.kind in ("i", "u", "f", "b"):
+        return a
+    r = np.empty(len(values), dtype=object)
+    r[:] = values
+    return r
+
+
+def _copy_to(out, v, shape):
+    r"""Copy ``v`` reshaped to ``shape`` into ``out`` and return ``out``."""
+    if out.shape != shape:
+        raise ValueError(f"out: invalid shape={out.shape}, expected={shape}")
+    out[...] = v.reshape(shape)
+    return out
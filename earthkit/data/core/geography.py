@@ -7,8 +7,11 @@
 # nor does it submit to any jurisdiction.
 #
 
-
+import threading
 from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
+
+from earthkit.data.core.settings import SETTINGS
 
 
 class Geography(metaclass=ABCMeta):
@@ -117,3 +120,94 @@ class Geography(metaclass=ABCMeta):
         :obj:`BoundingBox <data.utils.bbox.BoundingBox>`
         """
         pass
+
+
+class GeometryCache:
+    r"""Process-wide cache of the coordinate arrays of the grids.
+
+    The arrays are keyed by the identity of the grid, so the fields defined on
+    the same grid share a single copy. The least recently used arrays are evicted
+    when their total size exceeds the ``grid-geometry-cache-memory-limit``
+    setting. The arrays larger than this limit are not cached.
+
+    The returned arrays are always read-only, whether they are cached or not,
+    so the callers have to copy them before modifying them.
+    """
+
+    def __init__(self):
+        self._arrays = OrderedDict()
+        self.lock = threading.Lock()
+        self.memory = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._arrays)
+
+    def get(self, key, create):
+        r"""Return the array stored with ``key``. When it is not in the cache
+        it is generated by calling ``create``.
+        """
+        with self.lock:
+            v = self._arrays.get(key)
+            if v is not None:
+                self._arrays.move_to_end(key)
+                self.hits += 1
+                return v
+            self.misses += 1
+
+        # the lock is not held while generating the array
+        v = create()
+        v.flags.writeable = False
+        max_memory = SETTINGS.get("grid-geometry-cache-memory-limit")
+        if max_memory is not None and v.nbytes > max_memory:
+            return v
+
+        with self.lock:
+            if key in self._arrays:
+                # created by another thread in the meantime
+                self._arrays.move_to_end(key)
+                return self._arrays[key]
+
+            self._arrays[key] = v
+            self.memory += v.nbytes
+            while max_memory is not None and self.memory > max_memory:
+                _, r = self._arrays.popitem(last=False)
+                self.memory -= r.nbytes
+                self.evictions += 1
+
+        return v
+
+    def clear(self):
+        r"""Remove all the arrays from the cache."""
+        with self.lock:
+            self._arrays.clear()
+            self.memory = 0
+
+    def statistics(self):
+        r"""Return the cache statistics.
+
+        Returns
+        -------
+        dict
+            The number of hits, misses and evictions, the number of arrays
+            currently in the cache and their total size (in bytes).
+        """
+        with self.lock:
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                size=len(self._arrays),
+                memory=self.memory,
+            )
+
+    def reset_statistics(self):
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+geometry_cache = GeometryCache()
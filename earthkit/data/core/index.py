@@ -45,12 +45,23 @@ class Selection(OrderOrSelection):
 
             def __call__(self, x):
                 if self.first and x is not None:
-                    self.lst = [
-                        type(x) if not type(x) is type(y) else y for y in self.lst
-                    ]
-                    self.first = False
+                    self._cast(x)
                 return x in self.lst
 
+            def _cast(self, x):
+                self.lst = [type(x) if not type(x) is type(y) else y for y in self.lst]
+                self.first = False
+
+            def mask(self, values, array):
+                x = next((x for x in values if x is not None), None)
+                if self.first and x is not None:
+                    self._cast(x)
+                if array is not None:
+                    # only the items with the same type as the values can match
+                    lst = [y for y in self.lst if type(y) is type(x)]
+                    return np.isin(array, lst)
+                return np.fromiter((x in self.lst for x in values), bool, len(values))
+
         class InSlice:
             def __init__(self, slc):
                 self.slc = slc
@@ -70,10 +81,28 @@ class Selection(OrderOrSelection):
                     or (self.slc.stop is not None and x > self.slc.stop)
                 )
 
+            def mask(self, values, array):
+                if array is not None and array.dtype.kind in "iuf":
+                    # the same comparisons as __call__, so NaN is selected
+                    r = np.zeros(len(array), dtype=bool)
+                    if self.slc.start is not None:
+                        r |= array < self.slc.start
+                    if self.slc.stop is not None:
+                        r |= array > self.slc.stop
+                    return ~r
+                return np.fromiter(map(self, values), bool, len(values))
+
+        class AnyValue:
+            def __call__(self, x):
+                return True
+
+            def mask(self, values, array):
+                return np.ones(len(values), dtype=bool)
+
         self.actions = {}
         for k, v in kwargs.items():
             if v is None or v is earthkit.data.ALL:
-                self.actions[k] = lambda x: True
+                self.actions[k] = AnyValue()
                 continue
 
             if callable(v):
@@ -95,6 +124,27 @@ class Selection(OrderOrSelection):
         metadata = self.remapping(element.metadata)
         return all(v(metadata(k, default=None)) for k, v in self.actions.items())
 
+    def match_columns(self, columns):
+        r"""Return the boolean mask of the elements matching the selection.
+
+        Parameters
+        ----------
+        columns: :class:`ColumnIndex`
+            The metadata values of the elements.
+
+        Returns
+        -------
+        ndarray
+        """
+        mask = np.ones(len(columns), dtype=bool)
+        for k, v in self.actions.items():
+            values, array = columns.remapped(k, self.remapping)
+            if hasattr(v, "mask"):
+                mask &= v.mask(values, array)
+            else:
+                mask &= np.fromiter(map(v, values), bool, len(values))
+        return mask
+
 
 class OrderBase(OrderOrSelection):
     def __init__(self, kwargs, remapping):
@@ -115,6 +165,22 @@ class OrderBase(OrderOrSelection):
         return 0
 
 
+def _compare_ranks(values, cmp):
+    r"""Return the dense integer ranks of ``values`` ordered by the comparison
+    function ``cmp``. Equal values (``cmp`` returns 0) get the same rank."""
+    n = len(values)
+    indices = sorted(
+        range(n), key=functools.cmp_to_key(lambda i, j: cmp(values[i], values[j]))
+    )
+    ranks = np.zeros(n, dtype=np.int64)
+    r = 0
+    for k in range(1, n):
+        if cmp(values[indices[k - 1]], values[indices[k]]) != 0:
+            r += 1
+        ranks[indices[k]] = r
+    return ranks
+
+
 class Order(OrderBase):
     def build_actions(self, kwargs):
         actions = {}
@@ -137,6 +203,35 @@ class Order(OrderBase):
                 return 1
             raise ValueError(f"{a},{b}")
 
+        class Ascending:
+            def __call__(self, a, b):
+                return ascending(a, b)
+
+            def ranks(self, values, array):
+                if array is not None:
+                    # nan cannot be compared so it is left to the comparison
+                    if array.dtype.kind != "f" or not np.isnan(array).any():
+                        return np.unique(array, return_inverse=True)[1]
+                else:
+                    try:
+                        # equal values are merged by the set, which is what
+                        # the comparison does too
+                        rank = {x: i for i, x in enumerate(sorted(set(values)))}
+                        return np.fromiter(
+                            (rank[x] for x in values), np.int64, len(values)
+                        )
+                    except TypeError:
+                        # unhashable or not comparable values
+                        pass
+                return _compare_ranks(values, ascending)
+
+        class Descending(Ascending):
+            def __call__(self, a, b):
+                return descending(a, b)
+
+            def ranks(self, values, array):
+                return -super().ranks(values, array)
+
         class Compare:
             def __init__(self, order):
                 self.order = order
@@ -147,13 +242,16 @@ class Order(OrderBase):
             def get(self, x):
                 return self.order[x]
 
+            def ranks(self, values, array):
+                return np.fromiter(map(self.get, values), np.int64, len(values))
+
         for k, v in kwargs.items():
             if v == "ascending" or v is None:
-                actions[k] = ascending
+                actions[k] = Ascending()
                 continue
 
             if v == "descending":
-                actions[k] = descending
+                actions[k] = Descending()
                 continue
 
             if callable(v):
@@ -179,12 +277,131 @@ class Order(OrderBase):
 
         return actions
 
+    def order_columns(self, columns):
+        r"""Return the indices of the elements in the requested order.
+
+        Each key is encoded as integer ranks computed from its column of values and
+        the permutation is computed with :func:`numpy.lexsort`. Like the comparison
+        based sort it is stable.
+
+        Parameters
+        ----------
+        columns: :class:`ColumnIndex`
+            The metadata values of the elements.
+
+        Returns
+        -------
+        ndarray
+        """
+        ranks = []
+        for k, v in self.actions.items():
+            values, array = columns.remapped(k, self.remapping)
+            if hasattr(v, "ranks"):
+                ranks.append(v.ranks(values, array))
+            else:
+                ranks.append(_compare_ranks(values, v))
+        # the last key passed to lexsort is the primary one
+        return np.lexsort(ranks[::-1])
+
+
+class ColumnIndex:
+    r"""Column-wise, in-memory store of the metadata values of the elements of an
+    :class:`Index`. The columns are built lazily and cached so that repeated
+    selections do not have to access the metadata of the elements again.
+
+    The values are stored as they are returned by ``element.metadata(key, default=None)``.
+    When all the values of a key are of the same int, float or str type the column is
+    also available as an ndarray so that it can be evaluated with NumPy.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self._values = {}
+        self._arrays = {}
+        self._built = False
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def build(self, keys):
+        keys = [k for k in keys if k not in self._values]
+        if not self._built:
+            # the first pass also extracts the default keys
+            self._built = True
+            keys += [
+                k
+                for k in self.index._column_index_keys()
+                if k not in self._values and k not in keys
+            ]
+        if keys:
+            self._values.update(self.index._column_values(keys))
+
+    def values(self, key):
+        r"""list: Return the values of ``key`` for each element."""
+        if key not in self._values:
+            self.build([key])
+        return self._values[key]
+
+    def array(self, key):
+        r"""ndarray: Return the values of ``key`` as an ndarray. Returns None when
+        the values are not of the same int, float or str type."""
+        if key not in self._arrays:
+            values = self.values(key)
+            types = set(map(type, values))
+            if len(types) == 1 and types.pop() in (int, float, str):
+                self._arrays[key] = np.array(values)
+            else:
+                self._arrays[key] = None
+        return self._arrays[key]
+
+    def remapped(self, key, remapping):
+        r"""Return the values and the array of ``key`` taking the ``remapping`` into account."""
+        if remapping is None or key not in remapping.as_dict():
+            return self.values(key), self.array(key)
+
+        keys = remapping.as_dict()[key][1::2]
+        self.build(keys)
+        columns = {k: self.values(k) for k in keys}
+
+        def _metadata(i):
+            return remapping(lambda k, **kwargs: columns[k][i])
+
+        values = [_metadata(i)(key, default=None) for i in range(len(self))]
+        return values, None
+
 
 class Index(Source):
+    _column_index_cache = None
+
     @classmethod
     def new_mask_index(self, *args, **kwargs):
         return MaskIndex(*args, **kwargs)
 
+    def _column_index(self):
+        r""":class:`ColumnIndex`: Get the column-wise metadata index of the elements."""
+        if self._column_index_cache is None:
+            self._column_index_cache = ColumnIndex(self)
+        return self._column_index_cache
+
+    def _column_index_keys(self):
+        r"""Return the keys extracted when the column-wise index is first built."""
+        return []
+
+    def _column_values(self, keys):
+        r"""Return a dict with the list of values of each key in ``keys``."""
+        return self._compute_column_values(keys)
+
+    def _compute_column_values(self, keys):
+        r"""Extract the values of ``keys`` from the elements."""
+        r = {k: [] for k in keys}
+        for element in self:
+            for k in keys:
+                r[k].append(element.metadata(k, default=None))
+        return r
+
     @abstractmethod
     def __len__(self):
         self._not_implemented()
@@ -292,11 +509,8 @@ class Index(Source):
         if selection.is_empty:
             return self
 
-        indices = (
-            i for i, element in enumerate(self) if selection.match_element(element)
-        )
-
-        return self.new_mask_index(self, indices)
+        mask = selection.match_columns(self._column_index())
+        return self.new_mask_index(self, np.flatnonzero(mask).tolist())
 
     def isel(self, *args, **kwargs):
         """Uses metadata value indices to select a subset of the elements from a
@@ -500,12 +714,11 @@ class Index(Source):
         if order.is_empty:
             return self
 
-        def cmp(i, j):
-            return order.compare_elements(self[i], self[j])
+        if len(self) < 2:
+            return self.new_mask_index(self, list(range(len(self))))
 
-        indices = list(range(len(self)))
-        indices = sorted(indices, key=functools.cmp_to_key(cmp))
-        return self.new_mask_index(self, indices)
+        indices = order.order_columns(self._column_index())
+        return self.new_mask_index(self, indices.tolist())
 
     def __getitem__(self, n):
         if isinstance(n, slice):
@@ -565,6 +778,13 @@ class MaskIndex(Index):
     def __len__(self):
         return len(self._indices)
 
+    def _column_values(self, keys):
+        # slice the columns of the underlying index when they are available
+        columns = self._index._column_index()
+        if all(k in columns for k in keys):
+            return {k: [columns.values(k)[i] for i in self._indices] for k in keys}
+        return self._compute_column_values(keys)
+
     def __repr__(self):
         return "MaskIndex(%r,%s)" % (self._index, self._indices)
 
@@ -588,6 +808,16 @@ class MultiIndex(Index):
             k += 1
         return self._indexes[k][n]
 
+    def _column_values(self, keys):
+        # concatenate the columns of the underlying indexes
+        r = {k: [] for k in keys}
+        for i in self._indexes:
+            columns = i._column_index()
+            columns.build(keys)
+            for k in keys:
+                r[k].extend(columns.values(k))
+        return r
+
     def __len__(self):
         return sum(len(i) for i in self._indexes)
 
@@ -167,6 +167,53 @@ SETTINGS_AND_HELP = {
         5,
         """Number of threads used to download data.""",
     ),
+    "number-of-decode-threads": _(
+        1,
+        """Number of threads used to decode the values of the fields when
+        creating an array from a fieldlist e.g. with ``to_numpy()`` or ``values``.
+        {validator}""",
+        validator=IntervalValidator(Interval(1, None)),
+    ),
+    "number-of-encode-threads": _(
+        1,
+        """Number of threads used to encode the fields written with
+        ``write_many()`` of the GRIB output. {validator}""",
+        validator=IntervalValidator(Interval(1, None)),
+    ),
+    "decode-backend": _(
+        "thread",
+        """Backend used to decode the GRIB fields when creating an array or extracting
+        metadata from a fieldlist. With "thread" the number of threads is controlled by
+        ``number-of-decode-threads``. With "process" the fields stored in files are
+        decoded on a pool of ``number-of-decode-processes`` processes. {validator}""",
+        validator=ListValidator(["thread", "process"]),
+    ),
+    "number-of-decode-processes": _(
+        0,
+        """Number of processes used to decode the fields when ``decode-backend``
+        is "process". When it is 0 the number of CPUs is used. {validator}""",
+        validator=IntervalValidator(Interval(0, None)),
+    ),
+    "number-of-indexing-processes": _(
+        1,
+        """Number of processes used to parse the GRIB files when indexing a directory
+        into a database. When it is 0 the number of CPUs is used. With 1 the files are
+        parsed in the calling process. {validator}""",
+        validator=IntervalValidator(Interval(0, None)),
+    ),
+    "sql-index-page-size": _(
+        4096,
+        """Number of entries read at once from the SQL database of an indexed GRIB
+        fieldlist when accessing the fields by position. {validator}""",
+        validator=IntervalValidator(Interval(1, None)),
+    ),
+    "sql-index-cache-pages": _(
+        8,
+        """Maximum number of pages of entries (see ``sql-index-page-size``) kept in
+        memory for each indexed GRIB fieldlist. When exceeded the least recently used
+        page is released. {validator}""",
+        validator=IntervalValidator(Interval(1, None)),
+    ),
     "cache-policy": _(
         "off",
         """Caching policy. {validator}
@@ -192,6 +239,18 @@ SETTINGS_AND_HELP = {
         getter="_as_percent",
         none_ok=True,
     ),
+    "cache-database-flush-interval": _(
+        "1s",
+        """Maximum delay before the accesses and the new entries of the cache
+        are written to the cache database. They are written in batches.""",
+        getter="_as_seconds",
+    ),
+    "cache-size-check-interval": _(
+        "10s",
+        """Minimum delay between the checks of the cache size triggered by the
+        creation of cache entries. See :ref:`caching` for more information.""",
+        getter="_as_seconds",
+    ),
     "url-download-timeout": _(
         "30s",
         """Timeout when downloading from an url.""",
@@ -205,10 +264,70 @@ SETTINGS_AND_HELP = {
         False,
         "Re-download URLs when the remote version of a cached file as been changed",
     ),
+    "use-numpy-grib-decoder": _(
+        False,
+        """Decode simple-packed GRIB data with NumPy instead of ecCodes. Other
+        packing types are always decoded by ecCodes.""",
+    ),
+    "use-numpy-grib-encoder": _(
+        False,
+        """Encode the values written by the GRIB output with NumPy instead of ecCodes.
+        Only used for GRIB2 messages with simple packing, otherwise ecCodes
+        is used.""",
+    ),
     "use-standalone-mars-client-when-available": _(
         True,
         "Use the standalone mars client when available instead of using the web API.",
     ),
+    "reader-file-pool-size": _(
+        32,
+        """Maximum number of GRIB/BUFR files kept open for reading messages.
+        When exceeded the least recently used file is closed. {validator}""",
+        validator=IntervalValidator(Interval(1, None)),
+    ),
+    "grib-output-file-pool-size": _(
+        64,
+        """Maximum number of files kept open by a GRIB output when writing with
+        ``split_output``. When exceeded the least recently used file is closed and
+        it is reopened in append mode when needed again. {validator}""",
+        validator=IntervalValidator(Interval(1, None)),
+    ),
+    "grib-output-buffer-size": _(
+        "1M",
+        """Size of the write buffer of each file written by a GRIB output (e.g.: 4M).
+        When None the default buffering is used.""",
+        getter="_as_bytes",
+        none_ok=True,
+    ),
+    "grib-output-background-writer": _(
+        False,
+        """Write the messages of a GRIB output on a background thread, so that the
+        encoding of the fields overlaps with writing them to disk. The messages
+        still queued are written when the output is closed, deleted or at exit.""",
+    ),
+    "handle-pool-size": _(
+        1024,
+        """Maximum number of GRIB handles kept in memory for the fields read from files.
+        When exceeded the least recently used handle is released. {validator}""",
+        validator=IntervalValidator(Interval(0, None)),
+    ),
+    "handle-pool-memory-limit": _(
+        "1G",
+        """Maximum memory used by the GRIB handles kept in memory for the fields read
+        from files (e.g.: 512M or 2G), estimated by the size of the encoded messages.
+        When exceeded the least recently used handles are released. Can be set to None.""",
+        getter="_as_bytes",
+        none_ok=True,
+    ),
+    "grid-geometry-cache-memory-limit": _(
+        "512M",
+        """Maximum memory used by the latitude/longitude arrays cached for the grids
+        of the fields (e.g.: 512M or 2G). The fields on the same grid share the cached
+        arrays. When exceeded the least recently used arrays are released. Can be set
+        to None.""",
+        getter="_as_bytes",
+        none_ok=True,
+    ),
     "reader-type-check-bytes": _(
         64,
         """Number of bytes read from the beginning of a source to identify its type.
@@ -83,6 +83,9 @@ GRIB_KEYS_NAMES = [
 
 
 class Database:
+    # the database can index the files added or changed since it was loaded
+    REFRESHABLE = False
+
     def lookup_parts(self):
         raise NotImplementedError("")
 
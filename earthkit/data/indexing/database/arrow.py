@@ -0,0 +1,412 @@
+# (C) Copyright 2023 ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+#
+
+import logging
+import os
+
+import numpy as np
+
+import earthkit.data
+from earthkit.data.utils.parts import Part
+
+from . import FILEPARTS_KEY_NAMES, Database, FloatDBKey, IntDBKey, StrDBKey
+from .sql import (
+    EntriesLoader,
+    SqlOrder,
+    SqlRemapping,
+    SqlSelection,
+    dbname_to_entryname,
+    entryname_to_dbname,
+)
+
+LOG = logging.getLogger(__name__)
+
+
+def _arrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.ipc  # noqa: F401
+    except ImportError:
+        raise ImportError(
+            "The arrow index requires the 'pyarrow' package. "
+            "Please install it with 'pip install pyarrow'."
+        )
+    return pyarrow
+
+
+def _arrow_type(dbkey):
+    pa = _arrow()
+    if isinstance(dbkey, StrDBKey):
+        # the values of most of the keys are repeated many times
+        return pa.dictionary(pa.int32(), pa.string())
+    if isinstance(dbkey, IntDBKey):
+        return pa.int64()
+    return pa.float64()
+
+
+def _dbkey(name, typ):
+    pa = _arrow()
+    if pa.types.is_integer(typ):
+        return IntDBKey(name)
+    if pa.types.is_floating(typ):
+        return FloatDBKey(name)
+    return StrDBKey(name)
+
+
+class ArrowDatabase(Database):
+    """
+    Read-mostly database storing the entries in the columns of an Arrow IPC
+    file. The string columns are dictionary-encoded and the file is memory
+    mapped when opened.
+
+    The selections and orders (the same :class:`SqlFilter` objects as for
+    :class:`SqlDatabase`) are evaluated on the columns with vectorised
+    predicates and sorts. The result of a chain of filters is the array of the
+    positions of the selected entries in the table in their order.
+    """
+
+    EXTENSION = ".arrow"
+    VERSION = 1
+    BATCH_SIZE = 100_000
+
+    def __init__(self, db_path, filters=None, parent=None):
+        self.db_path = db_path
+        self._filters = filters or []
+        self._parent = parent
+        self._table = None
+        self._indices = None
+        # remapped keys, alias -> (remapping, key)
+        self._remapped = {}
+
+    def __str__(self):
+        return (
+            f"{self.__class__.__name__}({self.db_path},"
+            f"(filters=[{','.join([str(_) for _ in self._filters])}])"
+        )
+
+    @property
+    def table(self):
+        if self._parent is not None:
+            return self._parent.table
+        if self._table is None:
+            pa = _arrow()
+            if os.path.exists(self.db_path):
+                # the columns are read from the mapped file without copy
+                source = pa.memory_map(self.db_path, "r")
+                self._table = pa.ipc.open_file(source).read_all()
+            else:
+                self._table = pa.table({})
+        return self._table
+
+    @property
+    def dbkeys(self):
+        return {f.name: _dbkey(f.name, f.type) for f in self.table.schema}
+
+    def build_indexes(self):
+        pass
+
+    def load_iterator(self, iterator):
+        pa = _arrow()
+
+        dbkeys = {}
+        tables = []
+        batch = []
+
+        def _flush():
+            columns = {}
+            for name, dbkey in dbkeys.items():
+                entryname = dbname_to_entryname(name)
+                values = [e.get(entryname) for e in batch]
+                values = [None if v is None else dbkey.cast(v) for v in values]
+                columns[name] = pa.array(values, type=_arrow_type(dbkey))
+            tables.append(pa.table(columns))
+            batch.clear()
+
+        count = 0
+        for entry in iterator:
+            for k, v in entry.items():
+                name = entryname_to_dbname(k)
+                if name not in dbkeys and v is not None:
+                    klass = EntriesLoader.guess_key_type(type(v), name=k)
+                    dbkeys[name] = klass(name)
+            batch.append(entry)
+            if len(batch) >= self.BATCH_SIZE:
+                _flush()
+            count += 1
+
+        if batch:
+            _flush()
+
+        assert count >= 1, "No entry found."
+        LOG.info("Added %d entries", count)
+
+        # the columns added later are filled with nulls in the previous batches
+        table = pa.concat_tables(tables, promote_options="default")
+        table = table.unify_dictionaries()
+
+        tmp = self.db_path + ".tmp"
+        with pa.OSFile(tmp, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table, max_chunksize=self.BATCH_SIZE)
+        os.replace(tmp, self.db_path)
+
+        self._table = None
+        self._indices = None
+        return count
+
+    def refresh(self, iterator):
+        raise NotImplementedError(
+            f"{self.__class__.__name__}: the index cannot be updated, it must be rebuilt"
+        )
+
+    def filter(self, filter):
+        return self.__class__(
+            self.db_path,
+            filters=self._filters + [filter],
+            parent=self,
+        )
+
+    @property
+    def indices(self):
+        if self._indices is None:
+            if self._parent is None:
+                self._indices = np.arange(self.table.num_rows)
+            else:
+                f = self._filters[-1]
+                indices = self._parent.indices
+                self._remapped = self._parent._remapped
+                if isinstance(f, SqlSelection):
+                    self._indices = self._select(f, indices)
+                elif isinstance(f, SqlOrder):
+                    self._indices = self._order(f, indices)
+                elif isinstance(f, SqlRemapping):
+                    self._remapped = self._remap(f.remapping, self._remapped)
+                    self._indices = indices
+                else:
+                    raise ValueError(f"Unsupported filter {f}")
+        return self._indices
+
+    def rowids(self):
+        """
+        Return the positions of the entries in the table in order.
+        """
+        return self.indices
+
+    def has_column(self, name, remapped=None):
+        remapped = self._remapped if remapped is None else remapped
+        return name in remapped or name in self.table.column_names
+
+    def column(self, name, indices, remapped=None, decode=True):
+        """Return the values of the column ``name`` at ``indices``. Dictionary
+        encoded values are decoded unless ``decode`` is False.
+        """
+        pa = _arrow()
+        pc = pa.compute
+
+        remapped = self._remapped if remapped is None else remapped
+        if name in remapped:
+            return self._remapped_column(*remapped[name], indices, remapped)
+
+        values = self.table.column(name)
+        if len(indices) != len(values) or not np.array_equal(
+            indices, np.arange(len(values))
+        ):
+            values = values.take(pa.array(indices))
+        if decode and pa.types.is_dictionary(values.type):
+            values = pc.cast(values, values.type.value_type)
+        return values
+
+    def _remap(self, remapping, remapped):
+        # as with the SQL views, the keys already defined are not changed
+        remapped = dict(remapped)
+        for k in remapping.remapping.keys():
+            alias = entryname_to_dbname(k)
+            if not self.has_column(alias, remapped):
+                remapped[alias] = (remapping, k)
+        return remapped
+
+    def _remapped_column(self, remapping, key, indices, remapped):
+        pa = _arrow()
+        pc = pa.compute
+        db = self
+
+        class ArrowCustomJoiner:
+            def format_name(self, x):
+                name = entryname_to_dbname(x)
+                if not db.has_column(name, remapped):
+                    return pa.scalar("", pa.string())
+                values = db.column(name, indices, remapped)
+                return pc.fill_null(pc.cast(values, pa.string()), "")
+
+            def format_string(self, x):
+                return str(x)
+
+            def join(self, lst):
+                lst = [_ for _ in lst if not isinstance(_, str) or len(_)]
+                assert len(lst) > 0, lst
+                if len(lst) == 1 and not isinstance(lst[0], str):
+                    return lst[0]
+                return pc.binary_join_element_wise(*lst, "")
+
+        values = remapping.substitute(key, ArrowCustomJoiner())
+        if isinstance(values, str):
+            values = pa.array([values] * len(indices), type=pa.string())
+        return pc.utf8_trim(values, characters="_")
+
+    def _select(self, selection, indices):
+        pa = _arrow()
+        pc = pa.compute
+
+        remapped = self._remap(selection.remapping, self._remapped)
+        for k, v in selection.kwargs.items():
+            if v is None or v is earthkit.data.ALL:
+                continue
+
+            name = entryname_to_dbname(k)
+            if not self.has_column(name, remapped):
+                raise KeyError(name)
+
+            if not isinstance(v, (list, tuple)):
+                v = [v]
+
+            # the dictionary encoded values are compared without decoding them
+            values = self.column(name, indices, remapped, decode=False)
+            v = self._value_set(name, values.type, v)
+
+            mask = pc.fill_null(pc.is_in(values, value_set=v), False)
+            indices = indices[np.asarray(mask)]
+        return indices
+
+    def _order(self, order, indices):
+        pa = _arrow()
+        pc = pa.compute
+
+        columns = {}
+        sort_keys = []
+        for k, v in order.kwargs.items():
+            name = entryname_to_dbname(k)
+            values = self.column(name, indices)
+
+            if v == "ascending" or v is None:
+                direction = "ascending"
+            elif v == "descending":
+                direction = "descending"
+            elif isinstance(v, (list, tuple)):
+                v = self._value_set(name, values.type, v)
+                values = pc.index_in(values, value_set=v)
+                direction = "ascending"
+            else:
+                raise ValueError(f"{k},{v}, {type(v)}")
+
+            # as with sqlite, the nulls come first in ascending order and last
+            # in descending order
+            if values.null_count:
+                columns[f"{len(columns)}"] = pc.is_valid(values)
+                sort_keys.append((f"{len(sort_keys)}", direction))
+            columns[f"{len(columns)}"] = values
+            sort_keys.append((f"{len(sort_keys)}", direction))
+
+        if not sort_keys:
+            return indices
+
+        # the sort is stable so the previous order is kept for equal keys
+        order = pc.sort_indices(pa.table(columns), sort_keys=sort_keys)
+        return indices[np.asarray(order)]
+
+    def _value_set(self, name, typ, values):
+        pa = _arrow()
+        if pa.types.is_dictionary(typ):
+            typ = typ.value_type
+        dbkey = _dbkey(name, typ)
+        return pa.array([dbkey.cast(x) for x in values], type=typ)
+
+    def unique_values(self, *coords, remapping=None, progress_bar=True):
+        """
+        Given a list of metadata attributes, such as date, param, levels,
+        returns the list of unique values for each attributes
+        """
+        pc = _arrow().compute
+        indices = self.indices
+
+        results = {}
+        for c in coords:
+            column = entryname_to_dbname(c)
+            if self.has_column(column):
+                values = self.column(column, indices, decode=False)
+                results[column] = pc.unique(values).to_pylist()
+            else:
+                results[column] = []
+        return results
+
+    def unique_combinations(self, *columns):
+        """
+        Return the distinct combinations of the values of the ``columns`` as a
+        list of tuples, computed by grouping the selected rows.
+        """
+        pa = _arrow()
+        indices = self.indices
+        table = pa.table(
+            {name: self.column(name, indices, remapped={}) for name in columns}
+        )
+        groups = table.group_by(list(columns), use_threads=False).aggregate([])
+        return list(zip(*[groups.column(name).to_pylist() for name in columns]))
+
+    def count(self):
+        return len(self.indices)
+
+    def _columns(self, column_names, indices):
+        return [self.column(name, indices).to_pylist() for name in column_names]
+
+    def _parts(self, indices, resolve_paths):
+        parts = [
+            Part(*x) for x in zip(*self._columns(["path", "offset", "length"], indices))
+        ]
+        if resolve_paths:
+            parts = Part.resolve(parts, os.path.dirname(self.db_path))
+        return parts
+
+    def _dicts(self, indices, remove_none, with_parts):
+        column_names = [k for k in self.table.column_names]
+        if with_parts is False:
+            column_names = [
+                k
+                for k in column_names
+                if dbname_to_entryname(k) not in FILEPARTS_KEY_NAMES
+            ]
+
+        entrynames = [dbname_to_entryname(k) for k in column_names]
+        for tupl in zip(*self._columns(column_names, indices)):
+            dic = {k: v for k, v in zip(entrynames, tupl)}
+
+            if remove_none:
+                dic = {k: v for k, v in dic.items() if v is not None}
+            yield dic
+
+    def _slice(self, limit, offset):
+        offset = offset or 0
+        stop = None if limit is None else offset + limit
+        return self.indices[offset:stop]
+
+    def lookup_parts(self, limit=None, offset=None, resolve_paths=True):
+        return self._parts(self._slice(limit, offset), resolve_paths)
+
+    def iter_parts(self, resolve_paths=True, chunk_size=10_000):
+        indices = self.indices
+        for i in range(0, len(indices), chunk_size):
+            yield from self._parts(indices[i : i + chunk_size], resolve_paths)
+
+    def lookup_parts_by_rowid(self, rowids, resolve_paths=True):
+        return self._parts(np.asarray(rowids), resolve_paths)
+
+    def lookup_dicts(self, limit=None, offset=None, remove_none=True, with_parts=None):
+        return self._dicts(self._slice(limit, offset), remove_none, with_parts)
+
+    def lookup_dicts_by_rowid(self, rowids, remove_none=True, with_parts=None):
+        return self._dicts(np.asarray(rowids), remove_none, with_parts)
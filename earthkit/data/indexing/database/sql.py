@@ -8,8 +8,6 @@
 #
 
 import datetime
-import hashlib
-import json
 import logging
 import os
 import sqlite3
@@ -19,8 +17,8 @@ import numpy as np
 
 import earthkit.data
 from earthkit.data.core.order import build_remapping
-from earthkit.data.indexing.database.json import json_serialiser
 from earthkit.data.utils import tqdm
+from earthkit.data.utils.message import messages_in_place, sample_indices
 from earthkit.data.utils.parts import Part
 
 from . import (
@@ -100,6 +98,7 @@ def dbname_to_entryname(n):
 
 class EntriesLoader:
     table_name = "entries"
+    BATCH_SIZE = 10_000
 
     def __init__(self, connection):
         self.connection = connection
@@ -184,8 +183,18 @@ class EntriesLoader:
         name = entryname_to_dbname(k)
         return klass(name)
 
-    def load_iterator(self, iterator):
+    def load_iterator(self, iterator, batch_size=None, date=None):
+        """Insert the entries with executemany() in batches of ``batch_size``.
+        The paths are stored with ``date`` (by default the time the load started).
+        """
+        if batch_size is None:
+            batch_size = self.BATCH_SIZE
+        if date is None:
+            date = datetime.datetime.now().isoformat()
+
         paths_or_urls = set()
+        dbnames = {}
+        batch = []
 
         count = 0
         for entry in iterator:
@@ -193,7 +202,9 @@ class EntriesLoader:
                 self.keys = self.create_table_from_entry_if_needed(entry)
 
             for k, v in entry.items():
-                dbname = entryname_to_dbname(k)
+                dbname = dbnames.get(k)
+                if dbname is None:
+                    dbname = dbnames[k] = entryname_to_dbname(k)
                 if dbname not in self.keys:
                     LOG.debug(f"Inserting column in databse {k}, {dbname}")
                     self.keys = self._add_column(k, v)
@@ -203,24 +214,69 @@ class EntriesLoader:
             if "_url" in entry:
                 paths_or_urls.add(entry["_url"])
 
-            column_names = [k for k, v in self.keys.items()]
-            statement = (
-                f"INSERT INTO {self.table_name} ("
-                + ",".join(column_names)
-                + ") VALUES("
-                + ",".join(["?"] * len(column_names))
-                + ");"
-            )
-            values = [entry.get(dbname_to_entryname(k)) for k, v in self.keys.items()]
-            execute(self.connection, statement, tuple(values))
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                self._insert(batch)
+                batch = []
             count += 1
 
-        date = datetime.datetime.now().isoformat()
+        if batch:
+            self._insert(batch)
+
         for path in paths_or_urls:
-            self.path_table.insert(path, date)
+            size = os.path.getsize(path) if os.path.isfile(path) else None
+            self.path_table.insert(path, date, size)
 
         return count
 
+    def _insert(self, entries):
+        # new columns are only added so the current keys cover all the entries
+        column_names = [k for k, v in self.keys.items()]
+        entrynames = [dbname_to_entryname(k) for k in column_names]
+        statement = (
+            f"INSERT INTO {self.table_name} ("
+            + ",".join(column_names)
+            + ") VALUES("
+            + ",".join(["?"] * len(column_names))
+            + ");"
+        )
+        self.connection.executemany(
+            statement, [tuple(e.get(k) for k in entrynames) for e in entries]
+        )
+
+    def last_part(self, path):
+        """Return the (offset, length) of the last message of ``path``."""
+        if not self.keys:
+            return None
+        statement = (
+            f"SELECT offset, length FROM {self.table_name} WHERE path=? "
+            "ORDER BY offset DESC LIMIT 1;"
+        )
+        for offset, length in execute(self.connection, statement, (path,)):
+            return offset, length
+        return None
+
+    def sample_parts(self, path, samples):
+        """Return the (offset, length) of up to ``samples`` messages of ``path``
+        evenly spaced in the file, including the first and the last one."""
+        if not self.keys:
+            return []
+        statement = f"SELECT COUNT(*) FROM {self.table_name} WHERE path=?;"
+        (count,) = execute(self.connection, statement, (path,)).fetchone()
+        indices = set(sample_indices(count, samples))
+        statement = (
+            f"SELECT offset, length FROM {self.table_name} WHERE path=? "
+            "ORDER BY offset;"
+        )
+        cursor = execute(self.connection, statement, (path,))
+        return [tuple(x) for i, x in enumerate(cursor) if i in indices]
+
+    def delete_path(self, path):
+        if self.keys:
+            statement = f"DELETE FROM {self.table_name} WHERE path=?;"
+            return execute(self.connection, statement, (path,)).rowcount
+        return 0
+
     def build_sql_indexes(self):
         indexed_columns = [k for k, v in self.keys.items() if k.startswith("i_")]
         indexed_columns += ["path"]
@@ -246,24 +302,141 @@ class Connection(local):
         self._conn = sqlite3.connect(db_path)
 
 
+class SqlQuery:
+    """The single SELECT statement equivalent to a chain of filters.
+
+    The conditions of the selections are combined into one WHERE clause and
+    the orders into one ORDER BY clause, with the expressions of the remapped
+    keys inlined. The values are passed as parameters so the statements can be
+    reused by the statement cache of the connection.
+    """
+
+    def __init__(self, db, filters):
+        self.db = db
+        self.table = EntriesLoader.table_name
+        # the expressions of the keys created by a remapping
+        self.columns = {}
+        self.conditions = []
+        self.params = []
+        # list of (name, expression, params) tuples
+        self.orders = []
+
+        for f in filters:
+            f.compile(self)
+
+    def __str__(self):
+        return self.select()[0]
+
+    def has_column(self, name):
+        return name in self.columns or name in self.db.dbkeys
+
+    def dbkey(self, name):
+        if name in self.columns:
+            return StrDBKey(name)
+        return self.db.dbkeys[name]
+
+    def expression(self, name, columns=None):
+        if columns and name in columns:
+            return columns[name]
+        return self.columns.get(name, name)
+
+    def remapped_columns(self, remapping):
+        """Return the expression of each key of the ``remapping``. As with
+        the columns of a view, the keys already defined are not changed.
+        """
+
+        class SqlCustomJoiner:
+            def format_name(_, x):
+                name = entryname_to_dbname(x)
+                return f"COALESCE({self.expression(name)},'')"
+
+            def format_string(_, name):
+                if not name:
+                    return name
+                return "'" + str(name).replace("'", "''") + "'"
+
+            def join(_, lst):
+                lst = [_ for _ in lst if len(_)]
+                assert len(lst) > 0, lst
+                return " || ".join(lst)
+
+        columns = {}
+        for k in remapping.remapping.keys():
+            alias = entryname_to_dbname(k)
+            if self.has_column(alias):
+                continue
+            expr = remapping.substitute(k, SqlCustomJoiner())
+            columns[alias] = f"TRIM({expr},'_')"
+        return columns
+
+    def _where(self):
+        if not self.conditions:
+            return "", []
+        return " WHERE " + " AND ".join(self.conditions), list(self.params)
+
+    def _order_by(self):
+        if not self.orders:
+            # the entries are in the order of the files
+            return " ORDER BY rowid", []
+        params = []
+        for _, _, p in self.orders:
+            params.extend(p)
+        return " ORDER BY " + ", ".join(x[1] for x in self.orders), params
+
+    def select(self, column_names=None, limit=None, offset=None, order=True):
+        """Return the statement and its parameters selecting ``column_names``
+        from the filtered and ordered entries.
+        """
+        if column_names:
+            names = ",".join(
+                f"{self.columns[x]} AS {x}" if x in self.columns else x
+                for x in column_names
+            )
+        else:
+            names = ",".join(["*"] + [f"{v} AS {k}" for k, v in self.columns.items()])
+
+        where, params = self._where()
+        statement = f"SELECT {names} FROM {self.table}{where}"
+
+        if order:
+            order_by, order_params = self._order_by()
+            statement += order_by
+            params += order_params
+
+        if limit is not None or offset is not None:
+            statement += " LIMIT ? OFFSET ?"
+            params += [-1 if limit is None else limit, offset or 0]
+
+        return statement + ";", params
+
+    def count(self):
+        where, params = self._where()
+        return f"SELECT COUNT(*) FROM {self.table}{where};", params
+
+    def distinct(self, column_names):
+        """Return the statement and its parameters selecting the distinct
+        values of each of ``column_names`` in the order they first appear in
+        the filtered and ordered entries. The rows are (index of the column,
+        value) tuples.
+
+        The ordered entries are computed once by a common table expression,
+        then each column is scanned in that order by a SELECT DISTINCT, which
+        keeps the first appearance of each value. A row number would need a
+        window function, which is slower than the whole query.
+        """
+        statement, params = self.select(column_names)
+        branches = " UNION ALL ".join(
+            f"SELECT * FROM (SELECT DISTINCT {i}, {x} FROM q)"
+            for i, x in enumerate(column_names)
+        )
+        return f"WITH q AS ({statement[:-1]}) {branches};", params
+
+
 class SqlFilter:
     def __init__(self, kwargs=None, remapping=None):
         self.kwargs = kwargs or {}
         self.remapping = build_remapping(remapping)
 
-    def h(self, *args, **kwargs):
-        m = hashlib.md5()
-        m.update(str(args).encode("utf-8"))
-        m.update(str(kwargs).encode("utf-8"))
-        m.update(str(self.remapping.as_dict()).encode("utf-8"))
-        m.update(str(self.__class__.__name__).encode("utf-8"))
-        m.update(
-            json.dumps(self.kwargs, sort_keys=True, default=json_serialiser).encode(
-                "utf-8"
-            )
-        )
-        return m.hexdigest()
-
     def __str__(self):
         return f"{self.__class__.__name__}({self.kwargs})"
 
@@ -271,86 +444,34 @@ class SqlFilter:
     def is_empty(self):
         return not self.kwargs
 
-    def create_new_view(self, db, view):
-        new_view = "entries_" + self.h(parent_view=view)
-        assert new_view != view
-        view_statement = self.create_view_statement(
-            db, old_view=view, new_view=new_view
-        )
-        if not view_statement:
-            # nothing to do
-            return view
-
-        LOG.debug("%s", view_statement)
-        for i in execute(db.connection, view_statement):
-            LOG.error(str(i))
-        return new_view
+    def compile(self, query):
+        """Add the clauses of the filter to the :class:`SqlQuery`."""
+        raise NotImplementedError()
 
 
 class SqlSelection(SqlFilter):
-    def create_view_statement(self, db, old_view, new_view):
-        conditions = []
+    def compile(self, query):
+        columns = query.remapped_columns(self.remapping)
         for k, v in self.kwargs.items():
             if v is None or v is earthkit.data.ALL:
                 continue
 
             name = entryname_to_dbname(k)
-            dbkey = db.dbkeys[name]
+            dbkey = StrDBKey(name) if name in columns else query.dbkey(name)
 
             if not isinstance(v, (list, tuple)):
                 v = [v]
 
             v = [dbkey.cast(x) for x in v]
-            v = ["'" + str(x) + "'" for x in v]
-
-            conditions.append(f"{name} IN ({', '.join(v)})")
 
-        if not conditions:
-            return None
-
-        assert new_view != old_view
-        return (
-            f"CREATE TEMP VIEW IF NOT EXISTS {new_view} AS SELECT * "
-            + f"FROM {old_view} WHERE "
-            + " AND ".join(conditions)
-            + ";"
-        )
+            expr = query.expression(name, columns)
+            query.conditions.append(f"{expr} IN ({', '.join(['?'] * len(v))})")
+            query.params.extend(v)
 
 
 class SqlRemapping(SqlFilter):
-    def create_view_statement(self, db, old_view, new_view):
-        class SqlCustomJoiner:
-            def format_name(self, x):
-                name = entryname_to_dbname(x)
-                return f"COALESCE({name},'')"
-
-            def format_string(self, name):
-                if not name:
-                    return name
-                return "'" + str(name) + "'"
-
-            def join(self, lst):
-                lst = [_ for _ in lst if len(_)]
-                assert len(lst) > 0, lst
-                return " || ".join(lst)
-
-        sql_concatenations = []
-        for k, v in self.remapping.remapping.items():
-            joiner = SqlCustomJoiner()
-            alias = entryname_to_dbname(k)
-            expr = self.remapping.substitute(k, joiner)
-            sql_concatenations.append(f"TRIM({expr},'_') AS {alias}")
-
-        select = ", ".join(sql_concatenations)
-
-        if not sql_concatenations:
-            return None
-
-        assert new_view != old_view
-        return (
-            f"CREATE TEMP VIEW IF NOT EXISTS {new_view} AS SELECT *, {select} "
-            f"FROM {old_view};"
-        )
+    def compile(self, query):
+        query.columns.update(query.remapped_columns(self.remapping))
 
 
 class SqlOrder(SqlFilter):
@@ -365,50 +486,30 @@ class SqlOrder(SqlFilter):
 
         return SqlOrder(kwargs)
 
-    def create_view_statement(self, db, old_view, new_view):
-        func_name = "userorder_" + new_view
-
-        order_bys = []
-        dict_of_dicts = {}
-
+    def compile(self, query):
+        orders = []
         for k, v in self.kwargs.items():
             name = entryname_to_dbname(k)
-
-            dbkey = db.dbkeys.get(name, StrDBKey(name))
+            expr = query.expression(name)
 
             if v == "ascending" or v is None:
-                order_bys.append(name + " ASC")
+                orders.append((name, expr + " ASC", []))
                 continue
             if v == "descending":
-                order_bys.append(name + " DESC")
+                orders.append((name, expr + " DESC", []))
                 continue
             if isinstance(v, (list, tuple)):
+                dbkey = query.db.dbkeys.get(name, StrDBKey(name))
                 v = [dbkey.cast(x) for x in v]
-                dict_of_dicts[name] = dict(zip(v, range(len(v))))
-                order_bys.append(func_name + "(" + "'" + name + "'" + ", " + name + ")")
+                cases = " ".join(f"WHEN ? THEN {i}" for i in range(len(v)))
+                orders.append((name, f"CASE {expr} {cases} END", v))
                 continue
 
             raise ValueError(f"{k},{v}, {type(v)}")
 
-        if not order_bys:
-            return None
-
-        if dict_of_dicts:
-
-            def order_func(k, v):
-                return dict_of_dicts[k][v]
-
-            if LOG.level == logging.DEBUG:
-                sqlite3.enable_callback_tracebacks(True)
-            db.connection.create_function(func_name, 2, order_func, deterministic=True)
-
-        assert new_view != old_view
-        return (
-            f"CREATE TEMP VIEW IF NOT EXISTS {new_view} AS SELECT * "
-            + f"FROM {old_view} ORDER BY "
-            + ",".join(order_bys)
-            + ";"
-        )
+        # as when sorting the result of the previous filters (see merge())
+        names = set(x[0] for x in orders)
+        query.orders = orders + [x for x in query.orders if x[0] not in names]
 
 
 class VersionedDatabaseMixin:
@@ -449,39 +550,73 @@ class PathTable:
         self.ensure_table()
 
     def ensure_table(self):
-        statement = f"CREATE TABLE IF NOT EXISTS {self.table_name} (key TEXT PRIMARY KEY, date TEXT);"
+        statement = (
+            f"CREATE TABLE IF NOT EXISTS {self.table_name} "
+            "(key TEXT PRIMARY KEY, date TEXT, size INTEGER);"
+        )
         for i in execute(self.connection, statement):
             LOG.error(str(i))  # Output of .execute should be empty
 
-    def insert(self, key, date):
-        statement = f"""INSERT INTO {self.table_name} (key, date) VALUES(?,?);"""
+        try:
+            execute(
+                self.connection,
+                f"ALTER TABLE {self.table_name} ADD COLUMN size INTEGER;",
+            )
+        except sqlite3.OperationalError:
+            pass
+
+    def insert(self, key, date, size=None):
+        statement = f"""INSERT OR REPLACE INTO {self.table_name} (key, date, size) VALUES(?,?,?);"""
         LOG.debug("%s", statement)
-        execute(self.connection, statement, (key, date))
+        execute(self.connection, statement, (key, date, size))
+
+    def delete(self, key):
+        statement = f"""DELETE FROM {self.table_name} WHERE key=?;"""
+        execute(self.connection, statement, (key,))
 
     def get_date(self, key):
-        statement = f"""SELECT * FROM {self.table_name} WHERE key="{key}";"""
+        date, _ = self.get(key)
+        return date
+
+    def get(self, key):
+        """Return the date when ``key`` was indexed and the size of the file at that time."""
+        statement = f"""SELECT date, size FROM {self.table_name} WHERE key=?;"""
         LOG.debug("%s", statement)
-        for key, date in execute(self.connection, statement):
-            return date
-        return None
+        for date, size in execute(self.connection, statement, (key,)):
+            return date, size
+        return None, None
+
+    def keys(self):
+        statement = f"""SELECT key FROM {self.table_name};"""
+        return [x[0] for x in execute(self.connection, statement)]
 
 
 class SqlDatabase(Database, VersionedDatabaseMixin):
     EXTENSION = ".db"
+    REFRESHABLE = True
+    MAX_VARIABLES = 999
+    # the number of indexed messages of a file checked before only indexing
+    # the messages appended to it
+    MESSAGES_IN_PLACE_SAMPLES = 16
 
     def __init__(
         self,
         db_path,
         filters=None,
+        connection=None,
+        dbkeys=None,
     ):
         self._cache_column_names = {}
 
         self.db_path = db_path
         self._filters = filters or []
-        self._view = None
-        self._connection = None
+        self._query = None
+        self._rowids = None
+        self._connection = connection
 
-        self.dbkeys = EntriesLoader(self.connection).keys
+        if dbkeys is None:
+            dbkeys = EntriesLoader(self.connection).keys
+        self.dbkeys = dbkeys
 
     def __str__(self):
         return (
@@ -493,13 +628,11 @@ class SqlDatabase(Database, VersionedDatabaseMixin):
         EntriesLoader(self.connection).build_sql_indexes()
 
     @property
-    def view(self):
-        if self._view is None:
-            self._view = "entries"
-            for f in self._filters:
-                self._view = f.create_new_view(self, self._view)
-            LOG.debug("DB %s %s", self.db_path, self._view)
-        return self._view
+    def query(self):
+        if self._query is None:
+            self._query = SqlQuery(self, self._filters)
+            LOG.debug("DB %s %s", self.db_path, self._query)
+        return self._query
 
     @property
     def connection(self):
@@ -512,33 +645,40 @@ class SqlDatabase(Database, VersionedDatabaseMixin):
         Given a list of metadata attributes, such as date, param, levels,
         returns the list of unique values for each attributes
         """
-        remapping = build_remapping(remapping)
-        with self.connection as con:
-            view = self.view
-            # orders = [f for f in self._filters if isinstance(f, SqlOrder)]
-            # if orders:
-            #     order = orders[0].merge(*orders)
-            #     view = order.create_new_view(self, view)
-
-            results = {}
-            for c in coords:
-                column = entryname_to_dbname(c)
-                try:
-                    values = [
-                        v[0]
-                        for v in execute(con, f"SELECT DISTINCT {column} FROM {view};")
-                    ]
-                    LOG.debug("Reordered values for {column}", column, values)
-                    results[column] = values
-                except sqlite3.OperationalError:
-                    results[column] = []
+        query = self.query
+        columns = [entryname_to_dbname(c) for c in coords]
+        results = {c: [] for c in columns}
+
+        # the distinct values of all the columns are computed by a single query
+        names = [c for c in dict.fromkeys(columns) if query.has_column(c)]
+        if names:
+            statement, params = query.distinct(names)
+            with self.connection as con:
+                for i, v in execute(con, statement, params):
+                    results[names[i]].append(v)
 
         return results
 
+    def unique_combinations(self, *columns):
+        """
+        Return the distinct combinations of the values of the database
+        ``columns`` as a list of tuples, computed by a single GROUP BY query.
+        """
+        names = ",".join(columns)
+        where, params = self.query._where()
+        statement = (
+            f"SELECT {names} FROM {EntriesLoader.table_name}{where} GROUP BY {names};"
+        )
+        with self.connection as con:
+            return list(execute(con, statement, params))
+
     def filter(self, filter: SqlFilter):
+        # the connection and the keys are shared with the new database
         return self.__class__(
             self.db_path,
             filters=self._filters + [filter],
+            connection=self._connection,
+            dbkeys=self.dbkeys,
         )
 
     def already_loaded(self, path_or_url, owner):
@@ -551,10 +691,84 @@ class SqlDatabase(Database, VersionedDatabaseMixin):
             loader = EntriesLoader(connection)
             count = loader.load_iterator(iterator)
             self.dbkeys = loader.keys
+            self._query = None
+            self._rowids = None
 
             assert count >= 1, "No entry found."
             LOG.info("Added %d entries", count)
 
+            # the indexes are built once all the entries are inserted
+            loader.build_sql_indexes()
+
+        return count
+
+    def refresh(self, iterator):
+        """
+        Index the files of ``iterator`` (a GribIndexingPathParserIterator) added or
+        modified since they were loaded according to the dates of the paths table.
+        When a file grew and its last known message is still in place, it is
+        assumed to be appended to and only the messages after this one are
+        parsed. Otherwise its entries are replaced. The entries of the files
+        that no longer exist are removed.
+        Returns the number of inserted and deleted entries.
+        """
+        iterator.reset()
+        date = datetime.datetime.now().isoformat()
+        count = 0
+        with self.connection as connection:
+            loader = EntriesLoader(connection)
+            table = loader.path_table
+
+            paths, starts, sizes = [], [], []
+            for path in iterator.tasks:
+                key = iterator.entry_path(path)
+                size = os.path.getsize(path)
+                indexed, indexed_size = table.get(key)
+                if indexed is not None:
+                    indexed = datetime.datetime.fromisoformat(indexed).timestamp()
+                    if os.path.getmtime(path) < indexed:
+                        continue
+
+                start = 0
+                last = loader.last_part(key) if indexed is not None else None
+                if last is not None:
+                    if (
+                        indexed_size is not None
+                        and size > indexed_size
+                        and messages_in_place(
+                            path,
+                            loader.sample_parts(key, self.MESSAGES_IN_PLACE_SAMPLES),
+                            marker=b"GRIB",
+                        )
+                    ):
+                        start = last[0] + last[1]
+                    else:
+                        count += loader.delete_path(key)
+
+                LOG.debug(f"Refreshing {path} from offset={start}")
+                paths.append(path)
+                starts.append(start)
+                sizes.append(size)
+
+            if paths:
+                count += loader.load_iterator(
+                    iterator.entries(paths, starts), date=date
+                )
+                self.dbkeys = loader.keys
+                self._query = None
+                loader.build_sql_indexes()
+
+                # files without new messages are not checked again
+                for path, size in zip(paths, sizes):
+                    table.insert(iterator.entry_path(path), date, size)
+
+            for key in table.keys():
+                if os.path.isabs(key) and not os.path.exists(key):
+                    LOG.debug(f"Removing entries of {key}")
+                    count += loader.delete_path(key)
+                    table.delete(key)
+
+        self._rowids = None
         return count
 
     def lookup_parts(self, limit=None, offset=None, resolve_paths=True):
@@ -564,12 +778,41 @@ class SqlDatabase(Database, VersionedDatabaseMixin):
         offset: Skip the first "offset" entries (used for paging).
         """
         _names = ["path", "offset", "length"]
-        parts = []
-        for path, offset, length in self._execute_select(_names, limit, offset):
-            parts.append(Part(path, offset, length))
-        if resolve_paths:
-            parts = Part.resolve(parts, os.path.dirname(self.db_path))
-        return parts
+        parts = [Part(*x) for x in self._execute_select(_names, limit, offset)]
+        return self._resolve_parts(parts, resolve_paths)
+
+    def iter_parts(self, resolve_paths=True, chunk_size=10_000):
+        """
+        Iterate over the entries as Parts with a single cursor, reading
+        "chunk_size" entries at a time.
+        """
+        _names = ["path", "offset", "length"]
+        statement, params = self.query.select(_names)
+        cursor = execute(self.connection, statement, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from self._resolve_parts([Part(*x) for x in rows], resolve_paths)
+
+    def rowids(self):
+        """
+        Return the rowids of the entries in order as an ndarray. It maps the
+        position of the entries to their row in the entries table.
+        """
+        if self._rowids is None:
+            statement, params = self.query.select(["rowid"])
+            cursor = execute(self.connection, statement, params)
+            self._rowids = np.fromiter((x[0] for x in cursor), dtype=np.int64)
+        return self._rowids
+
+    def lookup_parts_by_rowid(self, rowids, resolve_paths=True):
+        """
+        Return the entries with the given rowids as Parts, in the same order.
+        """
+        _names = ["path", "offset", "length"]
+        parts = [Part(*x) for x in self._select_rowids(_names, rowids)]
+        return self._resolve_parts(parts, resolve_paths)
 
     def lookup_dicts(self, limit=None, offset=None, remove_none=True, with_parts=None):
         """
@@ -577,33 +820,74 @@ class SqlDatabase(Database, VersionedDatabaseMixin):
         limit: Returns only "limit" entries (used for paging).
         offset: Skip the first "offset" entries (used for paging).
         """
-        column_names = [k for k, v in self.dbkeys.items()]
+        column_names = self._dict_column_names(with_parts)
+        return self._to_dicts(
+            column_names,
+            self._execute_select(column_names, limit, offset),
+            remove_none,
+        )
 
-        if with_parts is False:
-            column_names = [k for k in column_names if k not in FILEPARTS_KEY_NAMES]
+    def lookup_dicts_by_rowid(self, rowids, remove_none=True, with_parts=None):
+        """
+        Return the entries dicts with the given rowids, in the same order.
+        """
+        column_names = self._dict_column_names(with_parts)
+        return self._to_dicts(
+            column_names,
+            self._select_rowids(column_names, rowids),
+            remove_none,
+        )
 
+    def _resolve_parts(self, parts, resolve_paths):
+        if resolve_paths:
+            parts = Part.resolve(parts, os.path.dirname(self.db_path))
+        return parts
+
+    def _dict_column_names(self, with_parts):
+        column_names = [k for k, v in self.dbkeys.items()]
+        if with_parts is False:
+            column_names = [
+                k
+                for k in column_names
+                if dbname_to_entryname(k) not in FILEPARTS_KEY_NAMES
+            ]
+        return column_names
+
+    def _to_dicts(self, column_names, rows, remove_none):
         entrynames = [dbname_to_entryname(k) for k in column_names]
-        for tupl in self._execute_select(column_names, limit, offset):
+        for tupl in rows:
             dic = {k: v for k, v in zip(entrynames, tupl)}
 
             if remove_none:
                 dic = {k: v for k, v in dic.items() if v is not None}
             yield dic
 
-    def _execute_select(self, column_names, limit=None, offset=None):
-        names_str = ",".join([x for x in column_names]) if column_names else "*"
-        limit_str = f" LIMIT {limit}" if limit is not None else ""
-        offset_str = f" OFFSET {offset}" if offset is not None else ""
+    def _select_rowids(self, column_names, rowids):
+        # the number of parameters of a statement is limited
+        rows = {}
+        names = ",".join(["rowid"] + list(column_names))
+        table = EntriesLoader.table_name
+        rowids = [int(x) for x in rowids]
+        for i in range(0, len(rowids), self.MAX_VARIABLES):
+            chunk = rowids[i : i + self.MAX_VARIABLES]
+            statement = (
+                f"SELECT {names} FROM {table} "
+                f"WHERE rowid IN ({','.join(['?'] * len(chunk))});"
+            )
+            for x in execute(self.connection, statement, chunk):
+                rows[x[0]] = x[1:]
+        return [rows[x] for x in rowids]
 
-        statement = f"SELECT {names_str} FROM {self.view} {limit_str} {offset_str};"
-        LOG.debug("%s", statement)
+    def _execute_select(self, column_names, limit=None, offset=None):
+        statement, params = self.query.select(column_names, limit, offset)
+        LOG.debug("%s %s", statement, params)
 
-        for tupl in execute(self.connection, statement):
+        for tupl in execute(self.connection, statement, params):
             yield tupl
 
     def count(self):
-        statement = f"SELECT COUNT(*) FROM {self.view};"
-        for result in execute(self.connection, statement):
+        statement, params = self.query.count()
+        for result in execute(self.connection, statement, params):
             return result[0]
         assert False, statement  # Fail if result is empty.
 
@@ -45,6 +45,8 @@ BUFR_LS_KEYS = {
 
 
 class BufrCodesMessagePositionIndex(CodesMessagePositionIndex):
+    MESSAGE_MARKER = b"BUFR"
+
     # This does not belong here, should be in the C library
     def _get_message_positions(self, path):
         fd = os.open(path, os.O_RDONLY)
@@ -165,7 +167,9 @@ class BUFRMessage(Base):
         r""":class:`CodesHandle`: Gets an object providing access to the low level BUFR message structure."""
         if self._handle is None:
             assert self._offset is not None
-            self._handle = BUFRCodesReader.from_cache(self.path).at_offset(self._offset)
+            self._handle = BUFRCodesReader.from_cache(self.path).at_offset(
+                self._offset, self._length
+            )
         return self._handle
 
     def __repr__(self):
@@ -662,7 +666,11 @@ class BUFRInOneFile(BUFRInFiles):
         return self.__positions
 
     def part(self, n):
-        return Part(self.path, self._positions.offsets[n], self._positions.lengths[n])
+        return Part(
+            self.path,
+            int(self._positions.offsets[n]),
+            int(self._positions.lengths[n]),
+        )
 
     def number_of_parts(self):
         return len(self._positions)
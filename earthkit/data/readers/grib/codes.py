@@ -7,18 +7,24 @@
 # nor does it submit to any jurisdiction.
 #
 
+import array
+import hashlib
 import logging
+import mmap
 import os
 
 import eccodes
 import numpy as np
 
 from earthkit.data.core.fieldlist import Field
-from earthkit.data.readers.grib.metadata import GribMetadata
+from earthkit.data.core.settings import SETTINGS
+from earthkit.data.readers.grib import simple_packing
+from earthkit.data.readers.grib.metadata import GribFieldMetadata, GribMetadata
 from earthkit.data.utils.message import (
     CodesHandle,
     CodesMessagePositionIndex,
     CodesReader,
+    handle_pool,
 )
 
 LOG = logging.getLogger(__name__)
@@ -45,7 +51,7 @@ class GribCodesFloatArrayAccessor:
 
     def get(self, handle, dtype=None):
         v = eccodes.codes_get_array(handle, self.KEY)
-        if dtype is not None:
+        if dtype is not None and np.dtype(dtype) != v.dtype:
             return v.astype(dtype)
         else:
             return v
@@ -58,8 +64,15 @@ class GribCodesValueAccessor(GribCodesFloatArrayAccessor):
         super().__init__()
 
     def get(self, handle, dtype=None):
-        if dtype is np.float32 and self.HAS_FLOAT_SUPPORT:
-            return eccodes.codes_get_array(handle, self.KEY, ktype=dtype)
+        # Only the values can be decoded directly into single precision. ecCodes
+        # does not implement it for the keys computed by the geoiterator
+        # (e.g. latitudes).
+        if (
+            dtype is not None
+            and np.dtype(dtype) == np.float32
+            and self.HAS_FLOAT_SUPPORT
+        ):
+            return eccodes.codes_get_array(handle, self.KEY, ktype=np.float32)
         else:
             return super().get(handle, dtype=dtype)
 
@@ -83,8 +96,214 @@ LATITUDE_ACCESSOR = GribCodesLatitudeAccessor()
 LONGITUDE_ACCESSOR = GribCodesLongitudeAccessor()
 
 
+def _grib_message_length(buf, offset):
+    r"""Decode the total length of the GRIB message starting at ``offset`` in
+    ``buf`` (a bytes-like object, e.g. an mmap). Returns None when the header
+    cannot be decoded.
+    """
+
+    def get(pos, count):
+        return int.from_bytes(buf[pos : pos + count], byteorder="big", signed=False)
+
+    size = len(buf)
+    if offset + 16 > size:
+        return None
+
+    edition = buf[offset + 7]
+    if edition == 2:
+        return get(offset + 8, 8)
+
+    if edition == 1:
+        length = get(offset + 4, 3)
+        if length & 0x800000:
+            # Large GRIB1 message: the length is coded in units of 120 bytes
+            # and must be corrected using the length of section 4
+            pos = offset + 8
+            sec1len = get(pos, 3)
+            flags = buf[offset + 15]
+            pos += sec1len
+            if flags & (1 << 7):
+                pos += get(pos, 3)
+            if flags & (1 << 6):
+                pos += get(pos, 3)
+            if pos + 3 > size:
+                return None
+            sec4len = get(pos, 3)
+            if sec4len < 120:
+                length &= 0x7FFFFF
+                length *= 120
+                length -= sec4len
+                length += 4
+        return length
+
+    return None
+
+
+# GRIB1 grid types with the earth shape coded in the resolution and
+# component flags (octet 17 of section 2)
+_GRIB1_EARTH_FLAG_GRIDS = (0, 1, 3, 4, 5, 10, 14, 20, 24, 30, 34)
+
+
+def _grib_grid_section(read):
+    r"""Return the grid section of a GRIB message with the earth shape normalised.
+
+    The grid section is section 2 for GRIB1 and section 3 for GRIB2 and it is
+    located using the section lengths only. ``read(pos, count)`` must return
+    (at most) ``count`` bytes from position ``pos`` relative to the start of
+    the message. Returns None when the message has no grid section.
+
+    Like ``md5GridSection`` the shape of the earth is not part of the result.
+    """
+
+    def get(b):
+        return int.from_bytes(b, byteorder="big", signed=False)
+
+    head = read(0, 16)
+    if len(head) < 16 or head[:4] != b"GRIB":
+        return None
+
+    edition = head[7]
+    if edition == 1:
+        if not head[15] & (1 << 7):
+            return None
+        pos = 8 + get(head[8:11])
+        sec = bytearray(read(pos, get(read(pos, 3))))
+        if len(sec) > 16 and sec[5] in _GRIB1_EARTH_FLAG_GRIDS:
+            sec[16] &= ~(1 << 6) & 0xFF
+        return sec
+
+    if edition == 2:
+        pos = 16
+        while True:
+            h = read(pos, 5)
+            if len(h) < 5 or h[:4] == b"7777":
+                return None
+            length = get(h[:4])
+            if h[4] == 3:
+                sec = bytearray(read(pos, length))
+                # shapeOfTheEarth
+                if len(sec) > 14:
+                    sec[14] = 255
+                return sec
+            if h[4] > 3 or length < 5:
+                return None
+            pos += length
+
+    return None
+
+
+def grib_grid_hash(read):
+    r"""Return the grid identity of a GRIB message as a signed 64-bit integer.
+
+    It is a hash of the grid section (see :func:`_grib_grid_section`) so the
+    messages on the same grid have the same identity. ``read`` has the same
+    meaning as in :func:`_grib_grid_section`. Returns None when the message
+    has no grid section.
+    """
+    sec = _grib_grid_section(read)
+    if sec is None:
+        return None
+    return int.from_bytes(
+        hashlib.blake2b(sec, digest_size=8).digest(), byteorder="little", signed=True
+    )
+
+
 class GribCodesMessagePositionIndex(CodesMessagePositionIndex):
+    VERSION = 4
+    EXTRA_ARRAYS = ("grid_hashes",)
+    MESSAGE_MARKER = b"GRIB"
+
+    def __init__(self, path):
+        self._grid_hashes = None
+        super().__init__(path)
+
+    @property
+    def grid_hashes(self):
+        r"""ndarray: The grid identity (see :func:`grib_grid_hash`) of each message.
+        0 means the message has no grid section. Computed on first access unless
+        loaded from the cache file, then added to the cache file.
+        """
+        if self._grid_hashes is None:
+            self._grid_hashes = self._scan_grid_hashes(self.path, self.offsets)
+            self._extra_array_computed()
+        return self._grid_hashes
+
+    @property
+    def has_grid_hashes(self):
+        return self._grid_hashes is not None
+
+    def _scan_grid_hashes(self, path, offsets):
+        r = np.zeros(len(offsets), dtype=np.int64)
+        if len(offsets) == 0:
+            return r
+
+        with open(path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for i, offset in enumerate(offsets.tolist()):
+
+                    def read(pos, count):
+                        return mm[offset + pos : offset + pos + count]
+
+                    h = grib_grid_hash(read)
+                    if h is not None:
+                        r[i] = h
+        return r
+
+    def _extend(self, offsets, lengths):
+        if self._grid_hashes is not None:
+            self._grid_hashes = np.concatenate(
+                [self._grid_hashes, self._scan_grid_hashes(self.path, offsets)]
+            )
+        super()._extend(offsets, lengths)
+
+    def _scan(self, path, start=0):
+        r"""Locate the GRIB messages starting at or after ``start`` using a memory
+        mapping of ``path``.
+
+        Only the message headers and end markers are touched, so the pages
+        containing the data sections are not read. When the expected "GRIB"
+        marker is not found at the end of the previous message the next
+        candidate is located with a bulk byte search instead of advancing
+        byte by byte.
+        """
+        offsets = array.array("q")
+        lengths = array.array("q")
+
+        with open(path, "rb") as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty file
+                return super()._scan(path, start=start)
+
+        with mm:
+            size = len(mm)
+            offset = mm.find(b"GRIB", start)
+            while offset >= 0:
+                length = _grib_message_length(mm, offset)
+                if (
+                    length is None
+                    or length < 16
+                    or offset + length > size
+                    or mm[offset + length - 4 : offset + length] != b"7777"
+                ):
+                    offset = mm.find(b"GRIB", offset + 1)
+                    continue
+
+                offsets.append(offset)
+                lengths.append(length)
+
+                offset += length
+                if mm[offset : offset + 4] != b"GRIB":
+                    offset = mm.find(b"GRIB", offset)
+
+        return (
+            np.frombuffer(offsets, dtype=np.int64),
+            np.frombuffer(lengths, dtype=np.int64),
+        )
+
     # This does not belong here, should be in the C library
+    # Kept as the reference implementation of the message scanner.
     def _get_message_positions(self, path):
         fd = os.open(path, os.O_RDONLY)
         try:
@@ -158,6 +377,11 @@ class GribCodesHandle(CodesHandle):
 
         return super().get(name, ktype, **kwargs)
 
+    def grid_hash(self):
+        r"""Return the grid identity of the message (see :func:`grib_grid_hash`)."""
+        buf = self.get_buffer()
+        return grib_grid_hash(lambda pos, count: buf[pos : pos + count])
+
     def get_md5GridSection(self):
         # Special case because:
         #
@@ -178,12 +402,14 @@ class GribCodesHandle(CodesHandle):
         #
         # Obviously, the patch causes an inconsistency between the value of md5GridSection
         # read by this code, and the value read by another code without this patch.
-
-        save = eccodes.codes_get_long(self._handle, "shapeOfTheEarth")
-        eccodes.codes_set_long(self._handle, "shapeOfTheEarth", 255)
-        result = eccodes.codes_get_string(self._handle, "md5GridSection")
-        eccodes.codes_set_long(self._handle, "shapeOfTheEarth", save)
-        return result
+        #
+        # The hash is computed from a copy of the grid section with the shape of
+        # the earth set to 255, so the handle is not modified.
+        buf = self.get_buffer()
+        sec = _grib_grid_section(lambda pos, count: buf[pos : pos + count])
+        if sec is None:
+            return eccodes.codes_get_string(self._handle, "md5GridSection")
+        return hashlib.md5(sec).hexdigest()
 
     def as_namespace(self, namespace, param="shortName"):
         r = {}
@@ -204,12 +430,59 @@ class GribCodesHandle(CodesHandle):
     # TODO: once missing value handling is implemented in the base class this method
     # can be removed
     def get_values(self, dtype=None):
-        eccodes.codes_set(self._handle, "missingValue", CodesHandle.MISSING_VALUE)
+        r"""Return the values with the missing values (according to the bitmap) set to nan.
+
+        The handle is not modified, so it can be shared between threads.
+        """
+        if SETTINGS.get("use-numpy-grib-decoder"):
+            vals = simple_packing.decode(self, dtype=dtype)
+            if vals is not None:
+                return vals
+
         vals = VALUE_ACCESSOR.get(self._handle, dtype=dtype)
         if self.get_long("bitmapPresent"):
-            vals[vals == CodesHandle.MISSING_VALUE] = np.nan
+            vals[self._missing_mask(len(vals))] = np.nan
         return vals
 
+    def _message_bytes(self, offset, size):
+        r"""Return ``size`` bytes from ``offset`` in the message. For messages
+        stored in a file only the requested bytes are read.
+        """
+        if self.path is not None and self.offset is not None:
+            return GribCodesReader.from_cache(self.path).read(
+                self.offset + offset, size
+            )
+        else:
+            return self.get_buffer()[offset : offset + size]
+
+    def _missing_mask(self, n):
+        r"""Return the boolean mask of the missing values of a message with a bitmap.
+
+        When the bitmap is stored in the message the bits are unpacked directly from
+        the bitmap section, otherwise the "bitmap" key is used.
+        """
+        if self.get_long("edition") == 1:
+            offset = (
+                self.get_long("offsetSection3")
+                if self.get_long("tableReference") == 0
+                else None
+            )
+        else:
+            offset = (
+                self.get_long("offsetSection6")
+                if self.get_long("bitMapIndicator") == 0
+                else None
+            )
+
+        if offset is None:
+            return eccodes.codes_get_array(self._handle, "bitmap", int) == 0
+
+        # the bits follow a 6 octet header in both editions
+        offset += 6
+        bits = self._message_bytes(offset, (n + 7) // 8)
+        mask = np.unpackbits(np.frombuffer(bits, dtype=np.uint8), count=n)
+        return mask == 0
+
     def get_latitudes(self, dtype=None):
         return LATITUDE_ACCESSOR.get(self._handle, dtype=dtype)
 
@@ -235,6 +508,12 @@ class GribCodesReader(CodesReader):
     PRODUCT_ID = eccodes.CODES_PRODUCT_GRIB
     HANDLE_TYPE = GribCodesHandle
 
+    def grid_hash(self, offset):
+        r"""Return the grid identity of the message at ``offset`` (see
+        :func:`grib_grid_hash`). Only the message headers are read.
+        """
+        return grib_grid_hash(lambda pos, count: self.read(offset + pos, count))
+
 
 class GribField(Field):
     r"""Represents a GRIB message in a GRIB file.
@@ -255,18 +534,38 @@ class GribField(Field):
         self._offset = offset
         self._length = length
         self._handle = None
+        self._grid_hash = None
 
     @property
     def handle(self):
-        r""":class:`CodesHandle`: Gets an object providing access to the low level GRIB message structure."""
-        if self._handle is None:
-            assert self._offset is not None
-            self._handle = GribCodesReader.from_cache(self.path).at_offset(self._offset)
-        return self._handle
+        r""":class:`CodesHandle`: Gets an object providing access to the low level GRIB message structure.
+
+        The handle is not stored in the field but taken from the global handle
+        pool, which creates it on demand.
+        """
+        if self._handle is not None:
+            return self._handle
+        assert self._offset is not None
+        return handle_pool.get(GribCodesReader, self.path, self._offset, self._length)
 
     def _values(self, dtype=None):
         return self.handle.get_values(dtype=dtype)
 
+    @property
+    def grid_hash(self):
+        r"""int: Get the identity of the grid of the field. Fields on the same grid
+        have the same identity. It is computed from the grid section of the message
+        without creating a handle.
+        """
+        if self._handle is not None or self._offset is None:
+            # the handle can be modified so the result is not stored
+            return self.handle.grid_hash()
+        if self._grid_hash is None:
+            self._grid_hash = GribCodesReader.from_cache(self.path).grid_hash(
+                self._offset
+            )
+        return self._grid_hash
+
     @property
     def offset(self):
         r"""number: Gets the offset (in bytes) of the GRIB field within the GRIB file."""
@@ -275,6 +574,10 @@ class GribField(Field):
         return self._offset
 
     def _make_metadata(self):
+        return GribFieldMetadata(self)
+
+    def _bulk_metadata(self):
+        # the handle is only taken once from the pool for all the keys
         return GribMetadata(self.handle)
 
     def __repr__(self):
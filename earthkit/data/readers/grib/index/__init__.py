@@ -104,11 +104,6 @@ class GribFieldList(PandasMixIn, XarrayMixIn, FieldList):
     _availability = None
 
     def __init__(self, *args, **kwargs):
-        if self.availability_path is not None and os.path.exists(
-            self.availability_path
-        ):
-            self._availability = Availability(self.availability_path)
-
         Index.__init__(self, *args, **kwargs)
 
     @classmethod
@@ -125,31 +120,43 @@ class GribFieldList(PandasMixIn, XarrayMixIn, FieldList):
         return GribMultiFieldList(sources)
 
     def _custom_availability(self, ignore_keys=None, filter_keys=lambda k: True):
+        def keep(k):
+            return filter_keys(k) and not (ignore_keys and k in ignore_keys)
+
         def dicts():
             for i in progress_bar(
                 iterable=range(len(self)), desc="Building availability"
             ):
                 dic = self.get_metadata(i)
+                yield {k: v for k, v in dic.items() if keep(k) and v is not None}
+
+        combinations = self._metadata_combinations(keep)
+        if combinations is None:
+            combinations = dicts()
 
-                for k in list(dic.keys()):
-                    if not filter_keys(k):
-                        dic.pop(k)
-                        continue
-                    if ignore_keys and k in ignore_keys:
-                        dic.pop(k)
-                        continue
-                    if dic[k] is None:
-                        dic.pop(k)
-                        continue
+        return Availability(combinations)
 
-                yield dic
+    def _metadata_combinations(self, keep):
+        r"""Return the distinct combinations of the metadata values of the fields
+        as dicts, with only the keys for which ``keep`` is True and without the
+        missing values. Return None when they are not known without reading the
+        metadata of each field.
+        """
+        return None
 
-        from earthkit.data.utils.availability import Availability
+    def _load_availability(self):
+        path = self.availability_path
+        if path is not None and os.path.exists(path):
+            return Availability.load(path)
+        return None
 
-        return Availability(dicts())
+    def _save_availability(self, availability):
+        pass
 
     @property
     def availability(self):
+        if self._availability is None:
+            self._availability = self._load_availability()
         if self._availability is not None:
             return self._availability
         LOG.debug("Building availability")
@@ -160,6 +167,7 @@ class GribFieldList(PandasMixIn, XarrayMixIn, FieldList):
             + MORE_KEY_NAMES_WITH_UNDERSCORE
             + MORE_KEY_NAMES
         )
+        self._save_availability(self._availability)
         return self.availability
 
     def _is_full_hypercube(self):
@@ -171,6 +179,133 @@ class GribFieldList(PandasMixIn, XarrayMixIn, FieldList):
         expected_size = math.prod([len(v) for k, v in non_empty_coords.items()])
         return len(self) == expected_size
 
+    def _decode_parts(self, decode_backend):
+        r"""Return the part descriptors when the fields have to be decoded
+        on the process pool, otherwise return None.
+        """
+        from earthkit.data.readers.grib import parallel
+
+        if parallel.decode_backend(decode_backend) == "process" and len(self) > 1:
+            parts = parallel.file_parts(self)
+            if parts is None:
+                LOG.debug("Cannot use process decode backend, using threads")
+            return parts
+        return None
+
+    def to_numpy(self, out=None, decode_backend=None, **kwargs):
+        r"""Return the field values as an ndarray. It is formed as the array of the
+        :obj:`GribField.to_numpy <data.readers.grib.codes.GribField.to_numpy>`
+        values per field.
+
+        Parameters
+        ----------
+        out: ndarray, None
+            Array to store the result in. Its shape must be ``(len(self), *shape)``,
+            where ``shape`` is the shape of the array returned for a field.
+            When it is None a new array is allocated.
+        decode_backend: str, None
+            The backend used to decode the fields ("thread" or "process"). When it is
+            None the ``decode-backend`` setting is used. With "process" the fields are decoded
+            on a process pool writing into shared memory. Only fields stored in files
+            can be decoded this way, otherwise "thread" is used.
+        **kwargs: dict, optional
+            Keyword arguments passed to
+            :obj:`GribField.to_numpy <data.readers.grib.codes.GribField.to_numpy>`
+
+        Returns
+        -------
+        ndarray
+            Array containing the field values.
+        """
+        parts = self._decode_parts(decode_backend)
+        if parts is not None:
+            from earthkit.data.readers.grib import parallel
+
+            if out is not None and kwargs.get("dtype") is None:
+                kwargs["dtype"] = out.dtype
+            return parallel.to_numpy(parts, out=out, **kwargs)
+        return super().to_numpy(out=out, **kwargs)
+
+    def data(
+        self,
+        keys=("lat", "lon", "value"),
+        flatten=False,
+        dtype=None,
+        out=None,
+        decode_backend=None,
+    ):
+        r"""Return the values and/or the geographical coordinates.
+
+        See :obj:`FieldList.data <data.core.fieldlist.FieldList.data>`. The
+        ``decode_backend`` is used to decode the values (see :obj:`to_numpy`).
+        """
+        return self._data(
+            keys=keys,
+            flatten=flatten,
+            dtype=dtype,
+            out=out,
+            decode_backend=decode_backend,
+        )
+
+    def metadata(self, *args, decode_backend=None, output=None, **kwargs):
+        r"""Return the metadata values for each field.
+
+        See :obj:`FieldList.metadata <data.core.fieldlist.FieldList.metadata>`.
+        When metadata keys are specified the ``decode_backend`` is used to
+        extract the values (see :obj:`to_numpy`).
+        """
+        if output is not None:
+            return super().metadata(
+                *args, output=output, decode_backend=decode_backend, **kwargs
+            )
+
+        if args:
+            parts = self._decode_parts(decode_backend)
+            if parts is not None:
+                from earthkit.data.readers.grib import parallel
+
+                return parallel.metadata(parts, *args, **kwargs)
+        return super().metadata(*args, **kwargs)
+
+    def _metadata_rows(self, keys, astype, decode_backend=None, **kwargs):
+        parts = self._decode_parts(decode_backend)
+        if parts is not None:
+            from earthkit.data.readers.grib import parallel
+
+            return parallel.metadata_rows(parts, keys, astype, **kwargs)
+        return super()._metadata_rows(keys, astype, **kwargs)
+
+    def write(self, f):
+        r"""Write all the fields to a file object.
+
+        The messages stored in files are copied as raw bytes, adjacent messages
+        of the same file in a single operation, without creating ecCodes handles
+        (see :obj:`copy_parts <data.utils.parts.copy_parts>`). The other
+        fields are written with
+        :obj:`GribField.write <data.readers.grib.codes.GribField.write>`.
+
+        Parameters
+        ----------
+        f: file object
+            The target file object.
+        """
+        from earthkit.data.readers.grib.parallel import file_part
+        from earthkit.data.utils.parts import copy_parts
+
+        parts = []
+        for s in self:
+            part = file_part(s)
+            if part is not None:
+                parts.append(part)
+                continue
+            if parts:
+                copy_parts(parts, f)
+                parts = []
+            s.write(f)
+
+        if parts:
+            copy_parts(parts, f)
+
     @alias_argument("levelist", ["level", "levellist"])
     @alias_argument("levtype", ["leveltype"])
     @alias_argument("param", ["variable", "parameter"])
@@ -203,6 +338,30 @@ class GribFieldListInFiles(GribFieldList):
     def __len__(self):
         return self.number_of_parts()
 
+    def refresh(self):
+        r"""Update the fieldlist in place with the changes of the underlying
+        files since they were indexed e.g. when new messages were appended
+        to them or new files were added to an indexed directory.
+
+        Returns
+        -------
+        int
+            The change in the number of fields.
+        """
+        n = len(self)
+        if self._refresh():
+            self._reset_cached()
+        return len(self) - n
+
+    def _refresh(self):
+        r"""Update the index and return True when it has changed."""
+        return False
+
+    def _reset_cached(self):
+        self._column_index_cache = None
+        self._availability = None
+        self.__dict__.pop("__is_shared_grid", None)
+
     @abstractmethod
     def part(self, n):
         self._not_implemented()
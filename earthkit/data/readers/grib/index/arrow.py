@@ -0,0 +1,33 @@
+# (C) Copyright 2023 ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+#
+
+import logging
+
+from earthkit.data.indexing.database.arrow import ArrowDatabase
+from earthkit.data.readers.grib.index.sql import FieldListInFilesWithSqlIndex
+from earthkit.data.utils.serialise import register_serialisation
+
+LOG = logging.getLogger(__name__)
+
+
+class FieldListInFilesWithArrowIndex(FieldListInFilesWithSqlIndex):
+    r"""GRIB fieldlist indexed by an :class:`ArrowDatabase`. The selections and
+    orders are built the same way as for the SQL index.
+    """
+
+    DBCLASS = ArrowDatabase
+
+
+register_serialisation(
+    FieldListInFilesWithArrowIndex,
+    lambda x: [x.db.db_path, x.db._filters],
+    lambda x: FieldListInFilesWithArrowIndex(db=ArrowDatabase(x[0])).apply_filters(
+        filters=x[1]
+    ),
+)
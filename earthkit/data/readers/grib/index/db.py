@@ -20,14 +20,19 @@ LOG = logging.getLogger(__name__)
 
 
 class FieldListInFilesWithDBIndex(GribFieldListInFiles):
-    def __init__(self, db, **kwargs):
+    def __init__(self, db, path_iterator=None, **kwargs):
         """Should not be instantiated directly.
         The public API are the constructors "_from*()" class methods.
+
+        path_iterator: optional
+            The iterator parsing the indexed files (GribIndexingPathParserIterator),
+            used by :obj:`refresh`.
         """
         self.db = db
+        self.path_iterator = path_iterator
 
-        # self._cache is a tuple : (first, length, result). It holds one chunk of the db.
-        # The third element (result) is a list of size length.
+        # self._cache and self._dict_cache hold pages of the entries of the db,
+        # they are created when the fields are first accessed.
         self._cache = None
         self._dict_cache = None
 
@@ -39,7 +44,19 @@ class FieldListInFilesWithDBIndex(GribFieldListInFiles):
     @property
     def availability_path(self):
         dirpath = os.path.dirname(self.db.db_path)
-        return os.path.join(dirpath, "availability.pickle")
+        return os.path.join(dirpath, "availability.json")
+
+    def _refresh(self):
+        if self.path_iterator is None:
+            return False
+        # the database can also be changed by other fieldlists using it
+        self.db.refresh(self.path_iterator)
+        return True
+
+    def _reset_cached(self):
+        super()._reset_cached()
+        self._cache = None
+        self._dict_cache = None
 
     @classmethod
     def from_iterator(
@@ -68,6 +85,8 @@ class FieldListInFilesWithDBIndex(GribFieldListInFiles):
 
         db = cls.DBCLASS(db_name)
 
+        if cls.DBCLASS.REFRESHABLE and hasattr(iterator, "entries"):
+            kwargs.setdefault("path_iterator", iterator)
         new = cls(db=db, **kwargs)
         new = new.sel(selection)
         new = new.order_by(order_by)
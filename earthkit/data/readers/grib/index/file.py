@@ -23,7 +23,7 @@ class GribFieldListInOneFile(GribFieldListInFiles):
 
     @property
     def availability_path(self):
-        return os.path.join(self.path, ".availability.pickle")
+        return os.path.join(self.path, ".availability.json")
 
     def __init__(self, path, **kwargs):
         assert isinstance(path, str), path
@@ -39,7 +39,26 @@ class GribFieldListInOneFile(GribFieldListInFiles):
         return self.__positions
 
     def part(self, n):
-        return Part(self.path, self._positions.offsets[n], self._positions.lengths[n])
+        return Part(
+            self.path,
+            int(self._positions.offsets[n]),
+            int(self._positions.lengths[n]),
+        )
+
+    def _getitem(self, n):
+        field = super()._getitem(n)
+        if field is not None and self._positions.has_grid_hashes:
+            # loaded from the cache file
+            h = int(self._positions.grid_hashes[n])
+            if h != 0:
+                field._grid_hash = h
+        return field
 
     def number_of_parts(self):
         return len(self._positions.offsets)
+
+    def _refresh(self):
+        if self.__positions is None:
+            # the file is indexed on first access
+            return False
+        return self._positions.refresh()
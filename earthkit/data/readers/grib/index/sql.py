@@ -8,24 +8,56 @@
 #
 
 import logging
-from collections import namedtuple
+import os
+from collections import OrderedDict
 
 from earthkit.data.core.constants import DATETIME
 from earthkit.data.core.order import build_remapping, normalize_order_by
 from earthkit.data.core.select import normalize_selection
+from earthkit.data.core.settings import SETTINGS
 from earthkit.data.decorators import cached_method, normalize
 from earthkit.data.indexing.database.sql import (
     SqlDatabase,
     SqlOrder,
     SqlRemapping,
     SqlSelection,
+    dbname_to_entryname,
 )
+from earthkit.data.readers.grib.codes import GribField
 from earthkit.data.readers.grib.index.db import FieldListInFilesWithDBIndex
+from earthkit.data.utils.availability import Availability
 from earthkit.data.utils.serialise import register_serialisation
 
 LOG = logging.getLogger(__name__)
 
-SqlResultCache = namedtuple("SqlResultCache", ["first", "length", "result"])
+
+class SqlPageCache(OrderedDict):
+    r"""Pages of consecutive entries read from the database, with least recently
+    used eviction.
+
+    ``load`` is called with the positions of the first and the last (excluded)
+    entries of a missing page and returns them as a list.
+    """
+
+    def __init__(self, load, page_size=None, max_pages=None):
+        super().__init__()
+        self.load = load
+        self.page_size = page_size or SETTINGS.get("sql-index-page-size")
+        self.max_pages = max_pages or SETTINGS.get("sql-index-cache-pages")
+
+    def entry(self, n):
+        i, j = divmod(n, self.page_size)
+        try:
+            page = self[i]
+            self.move_to_end(i)
+        except KeyError:
+            page = self.load(i * self.page_size, (i + 1) * self.page_size)
+            if j >= len(page):
+                raise IndexError(n)
+            self[i] = page
+            while len(self) > self.max_pages:
+                self.popitem(last=False)
+        return page[j]
 
 
 @normalize(DATETIME, "date-list", format="%Y-%m-%d %H:%M:%S")
@@ -35,8 +67,46 @@ def _normalize_grib_kwargs_values(**kwargs):
 
 class FieldListInFilesWithSqlIndex(FieldListInFilesWithDBIndex):
     DBCLASS = SqlDatabase
-    DB_CACHE_SIZE = 100_000
-    DB_DICT_CACHE_SIZE = 100_000
+    AVAILABILITY_EXTENSION = ".availability.json"
+
+    @property
+    def availability_path(self):
+        # only the availability of the whole database is stored
+        if self.db._filters:
+            return None
+        return self.db.db_path + self.AVAILABILITY_EXTENSION
+
+    def _load_availability(self):
+        path = self.availability_path
+        if path is None or not os.path.exists(path):
+            return None
+        # the database was changed after the availability was written
+        if os.stat(path).st_mtime_ns < os.stat(self.db.db_path).st_mtime_ns:
+            LOG.debug(f"Ignoring outdated availability {path}")
+            return None
+        try:
+            return Availability.load(path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            LOG.debug(f"Ignoring unreadable availability {path}: {e}")
+            return None
+
+    def _save_availability(self, availability):
+        path = self.availability_path
+        if path is not None:
+            try:
+                availability.save(path)
+            except OSError as e:
+                LOG.debug(f"Cannot write availability {path}: {e}")
+
+    def _metadata_combinations(self, keep):
+        names = [k for k in self.db.dbkeys if keep(dbname_to_entryname(k))]
+        if not names:
+            return None
+        entrynames = [dbname_to_entryname(k) for k in names]
+        return [
+            {k: v for k, v in zip(entrynames, row) if v is not None}
+            for row in self.db.unique_combinations(*names)
+        ]
 
     def apply_filters(self, filters):
         obj = self
@@ -81,7 +151,7 @@ class FieldListInFilesWithSqlIndex(FieldListInFilesWithDBIndex):
         if filter.is_empty:
             return self
         db = self.db.filter(filter)
-        return self.__class__(db=db)
+        return self.__class__(db=db, path_iterator=self.path_iterator)
 
     def sel(self, *args, remapping=None, **kwargs):
         kwargs = normalize_selection(*args, **kwargs)
@@ -107,38 +177,44 @@ class FieldListInFilesWithSqlIndex(FieldListInFilesWithDBIndex):
 
         return out
 
+    def __iter__(self):
+        # sequential access does not need the position of the entries
+        for part in self.db.iter_parts():
+            yield GribField(part.path, part.offset, part.length)
+
     def part(self, n):
-        if self._cache is None or not (
-            self._cache.first <= n < self._cache.first + self._cache.length
-        ):
-            first = (n // self.DB_CACHE_SIZE) * self.DB_CACHE_SIZE
-            result = self.db.lookup_parts(limit=self.DB_CACHE_SIZE, offset=first)
-            self._cache = SqlResultCache(first, len(result), result)
-        return self._cache.result[n % self.DB_CACHE_SIZE]
+        if self._cache is None:
+            self._cache = SqlPageCache(self._load_parts)
+        return self._cache.entry(n)
 
     def get_metadata(self, n):
-        assert "Used only in virtual"
-        if self._dict_cache is None or not (
-            self._dict_cache.first
-            <= n
-            < self._dict_cache.first + self._dict_cache.length
-        ):
-            first = (n // self.DB_DICT_CACHE_SIZE) * self.DB_DICT_CACHE_SIZE
-            result = self.db.lookup_dicts(
-                limit=self.DB_DICT_CACHE_SIZE,
-                offset=first,
-                with_parts=False,
-                # remove_none=False ?
+        if self._dict_cache is None:
+            self._dict_cache = SqlPageCache(self._load_dicts)
+        return self._dict_cache.entry(n)
+
+    def _load_parts(self, first, last):
+        # the first page does not need the rowids of all the entries
+        if first == 0:
+            return self.db.lookup_parts(limit=last)
+        return self.db.lookup_parts_by_rowid(self.db.rowids()[first:last])
+
+    def _load_dicts(self, first, last):
+        if first == 0:
+            return list(self.db.lookup_dicts(limit=last, with_parts=False))
+        return list(
+            self.db.lookup_dicts_by_rowid(
+                self.db.rowids()[first:last], with_parts=False
             )
-            result = list(result)
-
-            self._dict_cache = SqlResultCache(first, len(result), result)
-        return self._dict_cache.result[n % self.DB_DICT_CACHE_SIZE]
+        )
 
     @cached_method
     def number_of_parts(self):
         return self.db.count()
 
+    def _reset_cached(self):
+        super()._reset_cached()
+        self._number_of_parts = None
+
 
 register_serialisation(
     FieldListInFilesWithSqlIndex,
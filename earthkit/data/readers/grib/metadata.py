@@ -9,7 +9,9 @@
 
 import datetime
 
-from earthkit.data.core.geography import Geography
+import numpy as np
+
+from earthkit.data.core.geography import Geography, geometry_cache
 from earthkit.data.core.metadata import Metadata
 from earthkit.data.indexing.database import GRIB_KEYS_NAMES
 from earthkit.data.utils.bbox import BoundingBox
@@ -23,24 +25,51 @@ def missing_is_none(x):
 class GribFieldGeography(Geography):
     def __init__(self, metadata):
         self.metadata = metadata
+        self._grid_key = None
 
     def latitudes(self, dtype=None):
         r"""Return the latitudes of the field.
 
+        The array is shared between the fields on the same grid and is read-only.
+
         Returns
         -------
         ndarray
         """
-        return self.metadata._handle.get_latitudes(dtype=dtype)
+        return self._coordinates(
+            "latitudes", lambda: self.metadata._handle.get_latitudes(dtype=dtype), dtype
+        )
 
     def longitudes(self, dtype=None):
         r"""Return the longitudes of the field.
 
+        The array is shared between the fields on the same grid and is read-only.
+
         Returns
         -------
         ndarray
         """
-        return self.metadata._handle.get_longitudes(dtype=dtype)
+        return self._coordinates(
+            "longitudes",
+            lambda: self.metadata._handle.get_longitudes(dtype=dtype),
+            dtype,
+        )
+
+    def _coordinates(self, name, create, dtype):
+        key = self._geometry_key()
+        if key is None:
+            return create()
+        dtype = None if dtype is None else np.dtype(dtype).str
+        return geometry_cache.get((key, name, dtype), create)
+
+    def _geometry_key(self):
+        # the grid identity does not take the shape of the earth into account
+        if self._grid_key is None:
+            grid = self._unique_grid_id()
+            if grid is None:
+                return None
+            self._grid_key = (grid, self.metadata.get("shapeOfTheEarth", None))
+        return self._grid_key
 
     def x(self, dtype=None):
         r"""Return the x coordinates in the field's original CRS.
@@ -86,7 +115,7 @@ class GribFieldGeography(Geography):
         return (Nj, Ni)
 
     def _unique_grid_id(self):
-        return self.metadata.get("md5GridSection", None)
+        return self.metadata._grid_hash()
 
     def projection(self):
         r"""Return information about the projection.
@@ -208,9 +237,13 @@ class GribMetadata(Metadata):
             raise TypeError(
                 f"GribMetadata: expected handle type {self._handle_type()}, got {type(handle)}"
             )
-        self._handle = handle
+        self.__handle = handle
         self._geo = None
 
+    @property
+    def _handle(self):
+        return self.__handle
+
     @staticmethod
     def _handle_type():
         """Return the expected handle type. Implemented like this
@@ -251,6 +284,9 @@ class GribMetadata(Metadata):
     def _is_custom_key(self, key):
         return key in self.CUSTOM_KEYS
 
+    def _grid_hash(self):
+        return self._handle.grid_hash()
+
     def override(self, *args, **kwargs):
         d = dict(*args, **kwargs)
         handle = self._handle.clone()
@@ -359,6 +395,30 @@ class GribMetadata(Metadata):
         return RestrictedGribMetadata(self)
 
 
+class GribFieldMetadata(GribMetadata):
+    """Represent the metadata of a :obj:`GribField`.
+
+    Only the field is stored, the handle is taken from the field on demand so
+    that the metadata does not keep it alive.
+
+    Parameters
+    ----------
+    field: :obj:`GribField`
+        The field the metadata belongs to.
+    """
+
+    def __init__(self, field):
+        self._field = field
+        self._geo = None
+
+    @property
+    def _handle(self):
+        return self._field.handle
+
+    def _grid_hash(self):
+        return self._field.grid_hash
+
+
 # TODO: this is a temporary solution
 class RestrictedGribMetadata(GribMetadata):
     """Hide internal keys and namespaces in GRIB metadata"""
@@ -391,7 +451,15 @@ class RestrictedGribMetadata(GribMetadata):
     INTERNAL_NAMESPACES = ["statistics"]
 
     def __init__(self, md):
-        super().__init__(md._handle)
+        self._md = md
+        self._geo = None
+
+    @property
+    def _handle(self):
+        return self._md._handle
+
+    def _grid_hash(self):
+        return self._md._grid_hash()
 
     def __len__(self):
         if self.INTERNAL_KEYS:
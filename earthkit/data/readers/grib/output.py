@@ -9,9 +9,17 @@
 
 import datetime
 import logging
+import queue
 import re
+import threading
+import weakref
+from collections import OrderedDict, deque
 
+import numpy as np
+
+from earthkit.data.core.settings import SETTINGS
 from earthkit.data.decorators import normalize, normalize_grib_keys
+from earthkit.data.readers.grib import simple_packing
 from earthkit.data.utils.humanize import list_to_human
 
 LOG = logging.getLogger(__name__)
@@ -37,6 +45,153 @@ def order(key):
     return ORDER[key]
 
 
+def _is_scalar(v):
+    if isinstance(v, str):
+        # these cannot be passed to set_multiple
+        return "," not in v and "=" not in v
+    # floats are passed with their shortest exact representation
+    return isinstance(v, (int, float, np.integer)) and not isinstance(v, bool)
+
+
+def set_metadata(handle, metadata):
+    r"""Set the keys in ``metadata`` on ``handle`` in order. Consecutive scalar
+    values are set in a single call with ``set_multiple``.
+    """
+    batch = {}
+    for k, v in metadata.items():
+        if _is_scalar(v):
+            batch[k] = v
+        else:
+            if batch:
+                handle.set_multiple(batch)
+                batch = {}
+            handle.set(k, v)
+    if batch:
+        handle.set_multiple(batch)
+
+
+class OutputFiles:
+    r"""Pool of the files written by :class:`GribOutput` with least recently used
+    eviction.
+
+    At most ``grib-output-file-pool-size`` files are open at the same time. A file
+    is truncated when it is first opened and is reopened in append mode after it
+    has been evicted. The files are buffered with a buffer of
+    ``grib-output-buffer-size`` bytes.
+    """
+
+    def __init__(self, size=None, buffer_size=None):
+        self._files = OrderedDict()
+        self._opened = set()
+        self.size = SETTINGS.get("grib-output-file-pool-size") if size is None else size
+        self.buffer_size = (
+            SETTINGS.get("grib-output-buffer-size")
+            if buffer_size is None
+            else buffer_size
+        )
+
+    def __len__(self):
+        return len(self._files)
+
+    def __contains__(self, path):
+        return path in self._files
+
+    def get(self, path):
+        f = self._files.get(path)
+        if f is not None:
+            self._files.move_to_end(path)
+            return f
+
+        while len(self._files) >= self.size:
+            _, old = self._files.popitem(last=False)
+            old.close()
+
+        mode = "ab" if path in self._opened else "wb"
+        f = open(path, mode, buffering=self.buffer_size or -1)
+        self._opened.add(path)
+        self._files[path] = f
+        return f
+
+    def write(self, path, data):
+        self.get(path).write(data)
+
+    def close(self):
+        while self._files:
+            _, f = self._files.popitem(last=False)
+            f.close()
+
+
+class BackgroundWriter:
+    r"""Write the messages to :class:`OutputFiles` on a separate thread, so the
+    encoding can overlap with the disk I/O. At most ``queue_size`` messages wait
+    to be written. An error in the thread is raised by the next call to
+    :obj:`write` or :obj:`close`.
+
+    The thread does not keep the interpreter alive, so :obj:`close` must be
+    called to write the queued messages.
+    """
+
+    def __init__(self, files, queue_size=64):
+        self.files = files
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self._error is None:
+                try:
+                    self.files.write(*item)
+                except Exception as e:
+                    self._error = e
+
+    def _check(self):
+        if self._error is not None:
+            e, self._error = self._error, None
+            raise e
+
+    def write(self, path, data):
+        self._check()
+        self._queue.put((path, data))
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._check()
+
+
+def _close_output(writer, files):
+    try:
+        if writer is not None:
+            writer.close()
+    finally:
+        files.close()
+
+
+class OutputFile:
+    r"""File-like object returned by :obj:`GribOutput.f`. The data is written in
+    order with the fields written by :obj:`GribOutput.write`.
+    """
+
+    def __init__(self, output, path):
+        self.output = output
+        self.path = path
+
+    def write(self, data):
+        # the data is copied since it can be queued
+        self.output._write_data(self.path, bytes(data))
+        return len(data)
+
+    def flush(self):
+        # the files are flushed when the output is closed
+        pass
+
+
 class Combined:
     def __init__(self, handle, metadata):
         self.handle = handle
@@ -52,9 +207,22 @@ class Combined:
 
 
 class GribOutput:
-    def __init__(self, filename, split_output=False, template=None, **kwargs):
-        self._files = {}
+    TEMPLATE_CACHE_SIZE = 64
+
+    def __init__(
+        self, filename, split_output=False, template=None, precision=None, **kwargs
+    ):
+        self._files = OutputFiles()
+        self._writer = None
+        if SETTINGS.get("grib-output-background-writer"):
+            self._writer = BackgroundWriter(self._files)
+        # the queued messages and the buffers are written when the output is
+        # deleted or at exit if close() was not called
+        self._finalizer = weakref.finalize(
+            self, _close_output, self._writer, self._files
+        )
         self.filename = filename
+        self.precision = precision
 
         if split_output:
             self.split_output = re.findall(r"\{(.*?)\}", self.filename)
@@ -63,6 +231,7 @@ class GribOutput:
 
         self.template = template
         self._bbox = {}
+        self._templates = threading.local()
         self.kwargs = kwargs
 
     @normalize_grib_keys
@@ -70,15 +239,15 @@ class GribOutput:
     def _normalize_kwargs_names(self, **kwargs):
         return kwargs
 
-    def f(self, handle):
+    def path(self, handle):
         if self.split_output:
-            path = self.filename.format(**{k: handle.get(k) for k in self.split_output})
+            return self.filename.format(**{k: handle.get(k) for k in self.split_output})
         else:
-            path = self.filename
+            return self.filename
 
-        if path not in self._files:
-            self._files[path] = open(path, "wb")
-        return self._files[path], path
+    def f(self, handle):
+        path = self.path(handle)
+        return OutputFile(self, path), path
 
     def write(
         self,
@@ -86,32 +255,148 @@ class GribOutput:
         check_nans=False,
         metadata={},
         template=None,
+        precision=None,
         **kwargs,
     ):
+        r"""Write a field.
+
+        When ``precision`` is specified (or was specified when creating the object)
+        ``bitsPerValue`` is chosen so that the absolute error of the encoded values
+        does not exceed it.
+        """
         # Make a copy as we may modify it
         md = self._normalize_kwargs_names(**self.kwargs)
         md.update(self._normalize_kwargs_names(**metadata))
         md.update(self._normalize_kwargs_names(**kwargs))
 
-        metadata = md
+        handle, message = self._encode(values, md, check_nans, template, precision)
+        return self._write(handle, message)
 
+    def write_many(
+        self,
+        values,
+        metadata_list,
+        check_nans=False,
+        template=None,
+        precision=None,
+        **kwargs,
+    ):
+        r"""Write several fields.
+
+        The fields are encoded on a pool of ``number-of-encode-threads`` threads
+        and written in order.
+
+        Parameters
+        ----------
+        values: ndarray or list of ndarrays
+            The values of the fields. With an ndarray the first dimension
+            is the field.
+        metadata_list: list of dict
+            The metadata of each field. The metadata of each field is combined
+            with ``kwargs``.
+        check_nans, template, precision, **kwargs:
+            See :obj:`write`.
+        """
+        if len(values) != len(metadata_list):
+            raise ValueError(
+                f"Number of values={len(values)} and metadata={len(metadata_list)}"
+                " differ"
+            )
+
+        # the common metadata is only normalised once
+        first = self._normalize_kwargs_names(**self.kwargs)
+        last = self._normalize_kwargs_names(**kwargs)
+
+        def _encode(v, metadata):
+            md = dict(first)
+            md.update(self._normalize_kwargs_names(**metadata))
+            md.update(last)
+            return self._encode(v, md, check_nans, template, precision)
+
+        nthreads = min(SETTINGS.get("number-of-encode-threads"), len(metadata_list))
+        if nthreads < 2:
+            for v, md in zip(values, metadata_list):
+                self._write(*_encode(v, md))
+            return
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=nthreads) as executor:
+            # only a limited number of encoded messages are kept in memory
+            pending = deque()
+            for v, md in zip(values, metadata_list):
+                pending.append(executor.submit(_encode, v, md))
+                if len(pending) > 2 * nthreads:
+                    self._write(*pending.popleft().result())
+            while pending:
+                self._write(*pending.popleft().result())
+
+    def _write(self, handle, message):
+        path = self.path(handle)
+        if message is None:
+            message = handle.get_buffer()
+
+        self._write_data(path, message)
+        return handle, path
+
+    def _write_data(self, path, data):
+        if self._writer is not None:
+            self._writer.write(path, data)
+        else:
+            self._files.write(path, data)
+
+    def _encode(self, values, metadata, check_nans, template, precision):
+        r"""Create the handle of a field from the normalised ``metadata``, which
+        is modified. Returns the handle and the message when it was encoded with
+        NumPy, otherwise None.
+        """
         compulsory = ("date", ("param", "paramId", "shortName"))
 
         if template is None:
             template = self.template
 
+        # the handle is only read until it is cloned
         if template is None:
-            handle = self.handle_from_metadata(values, metadata, compulsory)
+            base = self.handle_from_metadata(values, metadata, compulsory)
         else:
-            handle = template.handle.clone()
+            base = template.handle
 
         # print("->", metadata)
-        self.update_metadata(handle, metadata, compulsory)
+        self.update_metadata(base, metadata, compulsory)
         # print("<-", metadata)
 
-        if check_nans:
-            import numpy as np
+        if precision is None:
+            precision = self.precision
+
+        # the precision does not apply to a field with only missing values
+        if precision is not None and np.isnan(values).all():
+            precision = None
+
+        packing = None
+        if SETTINGS.get("use-numpy-grib-encoder"):
+            packing = self._simple_packing(base, values, metadata, check_nans)
+
+        if packing is not None:
+            if precision is not None:
+                bits, scale = simple_packing.bits_per_value_for_precision(
+                    values[~np.isnan(values)],
+                    precision,
+                    packing["decimal_scale_factor"],
+                )
+                packing.update(bits_per_value=bits, binary_scale_factor=scale)
+        elif precision is not None:
+            metadata["bitsPerValue"], _ = simple_packing.bits_per_value_for_precision(
+                values[~np.isnan(values)],
+                precision,
+                metadata.get(
+                    "decimalScaleFactor", base.get("decimalScaleFactor", default=0)
+                ),
+            )
 
+        # the values to compare when checking the precision of ecCodes
+        valid = ~np.isnan(values)
+
+        if check_nans and packing is None:
             if np.isnan(values).any():
                 # missing_value = np.finfo(values.dtype).max
                 missing_value = 9999
@@ -125,19 +410,120 @@ class GribOutput:
 
         LOG.debug("GribOutput.metadata %s", metadata)
 
-        for k, v in metadata.items():
-            handle.set(k, v)
+        if template is None:
+            # the keys changing the structure of the message are always set first
+            # and are the same for most of the fields, so they are set on a
+            # cached copy of the template
+            structure = {}
+            for k in _ORDER:
+                if k in metadata:
+                    structure[k] = metadata.pop(k)
+            if structure:
+                base = self._prepared_template(base, structure)
+
+        handle = base.clone()
+        set_metadata(handle, metadata)
+
+        if packing is not None:
+            import eccodes
 
-        handle.set_values(values)
+            from .codes import GribCodesHandle
 
-        file, path = self.f(handle)
-        handle.write(file)
+            try:
+                message = simple_packing.encode_message(
+                    handle.get_buffer(), values, **packing
+                )
+            except ValueError as e:
+                # e.g. a field with only missing values
+                LOG.debug("Cannot encode with NumPy, using ecCodes: %s", e)
+                values = self._restore_packing(handle, values, packing, check_nans)
+            else:
+                handle = GribCodesHandle(
+                    eccodes.codes_new_from_message(message), None, None
+                )
+                return handle, message
 
-        return handle, path
+        handle.set_values(values)
+        if precision is not None:
+            self._check_precision(handle, values, valid, precision)
+        return handle, None
+
+    def _check_precision(self, handle, values, valid, precision):
+        r"""Add bits per value to ``handle`` until the ``valid`` values encoded by
+        ecCodes are within ``precision``. ecCodes computes its own reference value
+        and binary scale factor (e.g. an IBM float reference value in GRIB1), so
+        the number of bits from :func:`simple_packing.bits_per_value_for_precision`
+        may fall short by one or two.
+        """
+        valid = valid.ravel()
+        expected = values.ravel()[valid]
+        bits = handle.get_long("bitsPerValue")
+        while np.abs(handle.get_values()[valid] - expected).max() > precision:
+            if bits >= 32:
+                # the precision cannot be reached, as with NumPy
+                return
+            bits += 1
+            handle.set_long("bitsPerValue", bits)
+            handle.set_values(values)
+            if handle.get_long("bitsPerValue") != bits:
+                # ecCodes derives the bits per value from a non-zero
+                # decimalScaleFactor and ignores the one requested
+                raise ValueError(
+                    f"precision={precision} cannot be reached with decimalScaleFactor="
+                    f"{handle.get_long('decimalScaleFactor')}, use decimalScaleFactor=0"
+                )
+
+    def _simple_packing(self, handle, values, metadata, check_nans):
+        r"""Return the arguments of :func:`simple_packing.encode_message` when the
+        values can be encoded with NumPy, otherwise return None. The packing
+        keys are removed from ``metadata``.
+        """
+        if handle.get_long("edition") != 2 or metadata.get("edition", 2) != 2:
+            return None
+
+        if metadata.get("packingType", "grid_simple") != "grid_simple":
+            return None
+
+        if handle.get_string("packingType") != "grid_simple":
+            return None
+
+        # without check_nans the nans are passed to ecCodes as they are
+        if not check_nans and np.isnan(values).any():
+            return None
+
+        bits = metadata.get("bitsPerValue", handle.get_long("bitsPerValue"))
+        if bits == 0:
+            return None
+
+        for k in ("packingType", "missingValue", "bitmapPresent", "bitsPerValue"):
+            metadata.pop(k, None)
+
+        return dict(
+            bits_per_value=bits,
+            decimal_scale_factor=metadata.pop(
+                "decimalScaleFactor", handle.get_long("decimalScaleFactor")
+            ),
+        )
+
+    def _restore_packing(self, handle, values, packing, check_nans):
+        r"""Set on ``handle`` the packing keys removed by :obj:`_simple_packing`
+        so that the values can be encoded by ecCodes. Returns the values to
+        encode.
+        """
+        metadata = {
+            "bitsPerValue": packing["bits_per_value"],
+            "decimalScaleFactor": packing["decimal_scale_factor"],
+        }
+        if check_nans and np.isnan(values).any():
+            missing_value = 9999
+            values = np.nan_to_num(values, nan=missing_value)
+            metadata["missingValue"] = missing_value
+            metadata["bitmapPresent"] = 1
+        set_metadata(handle, metadata)
+        return values
 
     def close(self):
-        for f in self._files.values():
-            f.close()
+        self._finalizer()
 
     def __enter__(self):
         return self
@@ -210,19 +596,28 @@ class GribOutput:
             metadata["typeOfLevel"] = levtype_remap[v]
 
     def handle_from_metadata(self, values, metadata, compulsory):
-        from .codes import GribCodesHandle  # Lazy loading of eccodes
-
+        r"""Return the template handle for ``values`` with the grid and packing
+        keys set. The handle is shared between the fields so it must be cloned
+        before being modified.
+        """
+        grid = {}
         if len(values.shape) == 1:
-            sample = self._gg_field(values, metadata)
+            sample = self._gg_field(values, metadata, grid)
         elif len(values.shape) == 2:
-            sample = self._ll_field(values, metadata)
+            sample = self._ll_field(values, metadata, grid)
         else:
             raise ValueError(
                 f"Invalid shape {values.shape} for GRIB, must be 1 or 2 dimension "
             )
 
-        metadata.setdefault("bitsPerValue", 16)
-        metadata["scanningMode"] = 0
+        grid["scanningMode"] = 0
+        for k in grid:
+            metadata.pop(k, None)
+
+        # the packing is part of the template
+        grid["bitsPerValue"] = metadata.pop("bitsPerValue", 16)
+        if "packingType" in metadata:
+            grid["packingType"] = metadata.pop("packingType")
 
         metadata.update(
             ACCUMULATIONS.get(
@@ -261,13 +656,59 @@ class GribOutput:
                 choices = list_to_human([f"'{c}'" for c in check], "or")
                 raise ValueError(f"Please provide a value for {choices}.")
 
-        LOG.debug("GribCodesHandle.from_sample(%s)", sample)
-        return GribCodesHandle.from_sample(sample)
+        def _create():
+            from .codes import GribCodesHandle  # Lazy loading of eccodes
 
-    def _ll_field(self, values, metadata):
+            LOG.debug("GribCodesHandle.from_sample(%s)", sample)
+            handle = GribCodesHandle.from_sample(sample)
+            set_metadata(handle, grid)
+            return handle
+
+        # the sample depends on the edition, the type of the grid and the levtype
+        key = (sample,) + tuple(
+            (k, tuple(v) if isinstance(v, list) else v) for k, v in grid.items()
+        )
+        return self._cached_template(key, _create)
+
+    def _prepared_template(self, handle, metadata):
+        r"""Return a copy of the template ``handle`` with ``metadata`` set."""
+
+        def _create():
+            h = handle.clone()
+            set_metadata(h, metadata)
+            # the source handle is kept with the copy so its id is not reused
+            return handle, h
+
+        key = (id(handle),) + tuple(metadata.items())
+        return self._cached_template(key, _create)[1]
+
+    def _cached_template(self, key, create):
+        r"""Return the template stored in the cache with ``key``. It is created
+        with ``create`` when not found.
+
+        Each thread has its own cache of at most ``TEMPLATE_CACHE_SIZE`` templates,
+        the least recently used ones are removed first. The templates are reused
+        by the next fields so they must be cloned before being modified.
+        """
+        templates = getattr(self._templates, "cache", None)
+        if templates is None:
+            templates = self._templates.cache = OrderedDict()
+
+        item = templates.get(key)
+        if item is not None:
+            templates.move_to_end(key)
+            return item
+
+        item = create()
+        templates[key] = item
+        while len(templates) > self.TEMPLATE_CACHE_SIZE:
+            templates.popitem(last=False)
+        return item
+
+    def _ll_field(self, values, metadata, grid):
         Nj, Ni = values.shape
-        metadata["Nj"] = Nj
-        metadata["Ni"] = Ni
+        grid["Nj"] = Nj
+        grid["Ni"] = Ni
 
         # We assume the scanning mode north->south, west->east
         west_east = 360 / Ni
@@ -284,13 +725,13 @@ class GribOutput:
         west = 0
         east = 360 - west_east
 
-        metadata["iDirectionIncrementInDegrees"] = west_east
-        metadata["jDirectionIncrementInDegrees"] = north_south
+        grid["iDirectionIncrementInDegrees"] = west_east
+        grid["jDirectionIncrementInDegrees"] = north_south
 
-        metadata["latitudeOfFirstGridPointInDegrees"] = north
-        metadata["latitudeOfLastGridPointInDegrees"] = south
-        metadata["longitudeOfFirstGridPointInDegrees"] = west
-        metadata["longitudeOfLastGridPointInDegrees"] = east
+        grid["latitudeOfFirstGridPointInDegrees"] = north
+        grid["latitudeOfLastGridPointInDegrees"] = south
+        grid["longitudeOfFirstGridPointInDegrees"] = west
+        grid["longitudeOfLastGridPointInDegrees"] = east
 
         edition = metadata.get("edition", 2)
         levtype = metadata.get("levtype")
@@ -302,7 +743,7 @@ class GribOutput:
 
         return f"regular_ll_{levtype}_grib{edition}"
 
-    def _gg_field(self, values, metadata):
+    def _gg_field(self, values, metadata, grid):
         GAUSSIAN = {
             6114: (32, False),
             13280: (48, False),
@@ -334,20 +775,20 @@ class GribOutput:
 
             self._bbox[N] = max(eccodes.codes_get_gaussian_latitudes(N))
 
-        metadata["latitudeOfFirstGridPointInDegrees"] = self._bbox[N]
-        metadata["latitudeOfLastGridPointInDegrees"] = -self._bbox[N]
-        metadata["longitudeOfFirstGridPointInDegrees"] = 0
+        grid["latitudeOfFirstGridPointInDegrees"] = self._bbox[N]
+        grid["latitudeOfLastGridPointInDegrees"] = -self._bbox[N]
+        grid["longitudeOfFirstGridPointInDegrees"] = 0
 
-        metadata["N"] = N
+        grid["N"] = N
         if octahedral:
             half = list(range(20, 20 + N * 4, 4))
             pl = half + list(reversed(half))
             assert len(pl) == 2 * N, (len(pl), 2 * N)
-            metadata["pl"] = pl
-            metadata["longitudeOfLastGridPointInDegrees"] = 360 - max(pl) / 360
+            grid["pl"] = pl
+            grid["longitudeOfLastGridPointInDegrees"] = 360 - max(pl) / 360
         else:
             # Assumed to be set properly in the sample
-            # metadata["longitudeOfLastGridPointInDegrees"] = east
+            # grid["longitudeOfLastGridPointInDegrees"] = east
             pass
 
         edition = metadata.get("edition", 2)
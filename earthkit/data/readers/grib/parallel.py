@@ -0,0 +1,249 @@
+# (C) Copyright 2020 ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+#
+
+r"""Decode GRIB fields on a pool of processes.
+
+The workers only receive part descriptors i.e. (path, offset, length) tuples and
+read the messages themselves. Arrays are written into shared memory so they do
+not have to be pickled back to the calling process.
+"""
+
+import logging
+import math
+import os
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from earthkit.data.core.settings import SETTINGS
+from earthkit.data.readers.grib.codes import GribField
+
+LOG = logging.getLogger(__name__)
+
+DECODE_BACKENDS = ("thread", "process")
+
+# the maximum size of the shared memory blocks used to fill a given ``out`` array
+OUT_BLOCK_SIZE = 256 * 1024 * 1024
+
+_lock = threading.Lock()
+_executor = None
+_executor_key = None
+
+
+def decode_backend(backend=None):
+    r"""Return the decode backend to use. When ``backend`` is None the
+    ``decode-backend`` setting is used.
+    """
+    if backend is None:
+        backend = SETTINGS.get("decode-backend")
+    if backend not in DECODE_BACKENDS:
+        raise ValueError(
+            f"Invalid decode_backend={backend}, must be one of {DECODE_BACKENDS}"
+        )
+    return backend
+
+
+def number_of_processes():
+    n = SETTINGS.get("number-of-decode-processes")
+    if n == 0:
+        n = os.cpu_count() or 1
+    return n
+
+
+def executor():
+    r"""Return the process pool, which is shared between the calls."""
+    global _executor, _executor_key
+
+    n = number_of_processes()
+    key = (n, os.getpid())
+    with _lock:
+        if _executor_key != key:
+            if _executor is not None and _executor_key[1] == os.getpid():
+                _executor.shutdown(wait=False)
+            _executor = ProcessPoolExecutor(max_workers=n)
+            _executor_key = key
+        return _executor
+
+
+def file_part(field):
+    r"""Return the (path, offset, length) tuple of ``field``. Returns None
+    when the field is not a GRIB message stored in a file.
+    """
+    if type(field) is not GribField or field._offset is None or field._length is None:
+        return None
+    return (field.path, int(field._offset), int(field._length))
+
+
+def file_parts(fields):
+    r"""Return the (path, offset, length) tuples of ``fields``. Returns None
+    when any of the fields is not a GRIB message stored in a file.
+    """
+    parts = []
+    for f in fields:
+        part = file_part(f)
+        if part is None:
+            return None
+        parts.append(part)
+    return parts
+
+
+def _chunks(n, start=0):
+    count = min(n - start, number_of_processes() * 4)
+    if count <= 0:
+        return
+    size = math.ceil((n - start) / count)
+    for i in range(start, n, size):
+        yield i, min(i + size, n)
+
+
+def _to_numpy_worker(name, shape, dtype, start, parts, kwargs):
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        out = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        for i, part in enumerate(parts, start):
+            v = GribField(*part).to_numpy(**kwargs)
+            if v.shape != shape[1:]:
+                raise ValueError(
+                    f"Field {i} has shape={v.shape}, expected={shape[1:]}."
+                    " Fields do not have the same shape"
+                )
+            out[i] = v
+        del out
+    finally:
+        shm.close()
+
+
+def _metadata_worker(parts, args, kwargs):
+    return [GribField(*part).metadata(*args, **kwargs) for part in parts]
+
+
+def _metadata_rows_worker(parts, keys, astype, kwargs):
+    return [GribField(*part)._metadata_row(keys, astype, **kwargs) for part in parts]
+
+
+def _release(shm):
+    shm.close()
+
+
+def _fill(shm, shape, dtype, parts, start, kwargs):
+    r"""Decode ``parts[start:]`` into the array of ``shape`` stored in ``shm``."""
+    ex = executor()
+    futures = [
+        ex.submit(
+            _to_numpy_worker,
+            shm.name,
+            shape,
+            dtype,
+            i,
+            parts[i:j],
+            kwargs,
+        )
+        for i, j in _chunks(len(parts), start=start)
+    ]
+    for f in futures:
+        f.result()
+
+
+def _to_numpy_out(parts, first, out, kwargs):
+    # the workers cannot write into ``out`` so the fields are decoded into
+    # shared memory blocks of at most OUT_BLOCK_SIZE bytes and copied
+    out[0] = first
+    count = max(number_of_processes(), OUT_BLOCK_SIZE // max(1, first.nbytes))
+    for start in range(1, len(parts), count):
+        stop = min(start + count, len(parts))
+        shape = (stop - start,) + first.shape
+        shm = shared_memory.SharedMemory(
+            create=True, size=max(1, math.prod(shape) * first.dtype.itemsize)
+        )
+        try:
+            _fill(shm, shape, first.dtype, parts[start:stop], 0, kwargs)
+            out[start:stop] = np.ndarray(shape, dtype=first.dtype, buffer=shm.buf)
+        finally:
+            shm.close()
+            shm.unlink()
+    return out
+
+
+def to_numpy(parts, out=None, **kwargs):
+    r"""Decode the values of the messages described by ``parts`` into a
+    single ndarray using the process pool.
+
+    Parameters
+    ----------
+    parts: list
+        List of (path, offset, length) tuples.
+    out: ndarray, None
+        Array to store the result in. As the workers cannot write into it the
+        fields are decoded into shared memory blocks of at most
+        :data:`OUT_BLOCK_SIZE` bytes, which are copied into ``out``. When it is
+        None the result is backed by a shared memory block that is released
+        when the array is deleted.
+    **kwargs: dict, optional
+        Keyword arguments passed to :obj:`GribField.to_numpy`.
+    """
+    n = len(parts)
+    v = GribField(*parts[0]).to_numpy(**kwargs)
+    shape = (n,) + v.shape
+    if out is not None:
+        if out.shape != shape:
+            raise ValueError(f"out: invalid shape={out.shape}, expected={shape}")
+        return _to_numpy_out(parts, v, out, kwargs)
+
+    dtype = v.dtype
+    size = max(1, math.prod(shape) * dtype.itemsize)
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        r = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        r[0] = v
+        del v
+        _fill(shm, shape, dtype, parts, 1, kwargs)
+    except Exception:
+        r = None
+        shm.close()
+        shm.unlink()
+        raise
+
+    shm.unlink()
+
+    # the memory stays mapped until the array (and all its views) is deleted
+    weakref.finalize(r, _release, shm).atexit = False
+    return r
+
+
+def metadata(parts, *args, **kwargs):
+    r"""Extract the metadata of the messages described by ``parts`` using the
+    process pool. The arguments are passed to :obj:`GribField.metadata`.
+    """
+    ex = executor()
+    futures = [
+        ex.submit(_metadata_worker, parts[start:stop], args, kwargs)
+        for start, stop in _chunks(len(parts))
+    ]
+    result = []
+    for f in futures:
+        result.extend(f.result())
+    return result
+
+
+def metadata_rows(parts, keys, astype, **kwargs):
+    r"""Extract the values of ``keys`` from the messages described by ``parts``
+    using the process pool. Returns one list of values per message.
+    """
+    ex = executor()
+    futures = [
+        ex.submit(_metadata_rows_worker, parts[start:stop], keys, astype, kwargs)
+        for start, stop in _chunks(len(parts))
+    ]
+    result = []
+    for f in futures:
+        result.extend(f.result())
+    return result
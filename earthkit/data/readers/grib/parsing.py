@@ -10,12 +10,17 @@
 import datetime
 import fnmatch
 import logging
+import math
 import os
+from collections import deque
 
 from tqdm import tqdm
 
 LOG = logging.getLogger(__name__)
 
+# the maximum number of files parsed by a single task of the indexing process pool
+INDEXING_FILES_PER_TASK = 16
+
 
 def post_process_valid_date(field, h):
     date = h.get("validityDate")
@@ -63,6 +68,8 @@ def _index_grib_file(
     with_statistics=False,
     with_valid_date=True,
     with_parameter_level=True,
+    progress_bar=True,
+    start=0,
 ):
     import eccodes
 
@@ -98,16 +105,18 @@ def _index_grib_file(
     size = os.path.getsize(path)
     pbar = tqdm(
         desc=f"Parsing {path}",
-        total=size,
+        total=size - start,
         unit_scale=True,
         unit_divisor=1024,
         unit="B",
         leave=False,
         # position=TQDM_POSITION,
         dynamic_ncols=True,
+        disable=not progress_bar,
     )
 
     with open(path, "rb") as f:
+        f.seek(start)
         old_position = f.tell()
         h = eccodes.codes_grib_new_from_file(f)
 
@@ -210,35 +219,134 @@ class PathParserIterator:
         return self.tasks
 
 
+def number_of_indexing_processes():
+    from earthkit.data.core.settings import SETTINGS
+
+    n = SETTINGS.get("number-of-indexing-processes")
+    if n == 0:
+        n = os.cpu_count() or 1
+    return n
+
+
+def _parse_grib_file(path, entry_path, with_statistics, progress_bar=True, start=0):
+    try:
+        # We could use reader(self, path) but this will create a json
+        # grib-index auxiliary file in the cache.
+        # Indexing 1M grib files lead to 1M in cache.
+        #
+        # We would need either to refactor the grib reader.
+        for field in _index_grib_file(
+            path,
+            with_statistics=with_statistics,
+            progress_bar=progress_bar,
+            start=start,
+        ):
+            field["_path"] = entry_path
+            yield field
+    except PermissionError as e:
+        LOG.error(f"Could not read {path}: {e}")
+        return
+    except Exception as e:
+        print(f"(grib-parsing) Ignoring {path}, {e}")
+        LOG.exception(f"(grib-parsing) Ignoring {path}, {e}")
+        return
+
+
+def _parse_grib_files_worker(tasks, with_statistics):
+    entries = []
+    for path, entry_path, start in tasks:
+        entries.extend(
+            _parse_grib_file(
+                path, entry_path, with_statistics, progress_bar=False, start=start
+            )
+        )
+    return entries
+
+
 class GribIndexingPathParserIterator(PathParserIterator):
-    def process_one_task(self, path):
-        LOG.debug(f"Parsing file {path}")
+    """When the ``number-of-indexing-processes`` setting is not 1 the files are
+    parsed on a process pool. The workers send back the entries of a batch of files
+    at a time, which are then yielded in the same order as in the serial case.
+    """
+
+    def __iter__(self):
+        yield from self.entries(self.tasks)
 
+    def reset(self):
+        r"""Forget the list of files so that the path is scanned again."""
+        self._tasks = None
+
+    def entries(self, paths, starts=None):
+        r"""Yield the entries of the messages in ``paths``. When ``starts`` is
+        not None only the messages at or after ``starts[i]`` are parsed in ``paths[i]``.
+        """
+        if starts is None:
+            starts = [0] * len(paths)
+
+        n = number_of_indexing_processes()
+        if n == 1 or len(paths) < 2:
+            for path, start in tqdm(
+                list(zip(paths, starts)), dynamic_ncols=True, disable=not paths
+            ):
+                yield from self.process_one_task(path, start=start)
+            return
+
+        for entries in self.batches(n, paths, starts):
+            yield from entries
+
+    def entry_path(self, path):
         if self.relative_paths is True:
-            _path = os.path.relpath(path, self.path)
+            return os.path.relpath(path, self.path)
         elif self.relative_paths is False:
-            _path = os.path.abspath(path)
+            return os.path.abspath(path)
         elif self.relative_paths is None:
-            _path = path
+            return path
         else:
             assert False, self.relative_paths
 
+    def process_one_task(self, path, start=0):
+        LOG.debug(f"Parsing file {path}")
+        yield from _parse_grib_file(
+            path, self.entry_path(path), self.with_statistics, start=start
+        )
+
+    def batches(self, n, paths, starts):
+        r"""Parse the files on a pool of ``n`` processes and yield the list of
+        entries of each batch of files.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+
+        tasks = [
+            (path, self.entry_path(path), start) for path, start in zip(paths, starts)
+        ]
+        size = max(1, min(INDEXING_FILES_PER_TASK, math.ceil(len(tasks) / (n * 4))))
+        pbar = tqdm(total=len(tasks), dynamic_ncols=True)
+
+        # the number of batches in flight is bounded to limit the memory usage
+        executor = ProcessPoolExecutor(max_workers=n)
+        pending = deque()
         try:
-            # We could use reader(self, path) but this will create a json
-            # grib-index auxiliary file in the cache.
-            # Indexing 1M grib files lead to 1M in cache.
-            #
-            # We would need either to refactor the grib reader.
-
-            from earthkit.data.readers.grib.parsing import _index_grib_file
-
-            for field in _index_grib_file(path, with_statistics=self.with_statistics):
-                field["_path"] = _path
-                yield field
-        except PermissionError as e:
-            LOG.error(f"Could not read {path}: {e}")
-            return
-        except Exception as e:
-            print(f"(grib-parsing) Ignoring {path}, {e}")
-            LOG.exception(f"(grib-parsing) Ignoring {path}, {e}")
-            return
+            for i in range(0, len(tasks), size):
+                chunk = tasks[i : i + size]
+                pending.append(
+                    (
+                        len(chunk),
+                        executor.submit(
+                            _parse_grib_files_worker, chunk, self.with_statistics
+                        ),
+                    )
+                )
+                if len(pending) >= 2 * n:
+                    count, future = pending.popleft()
+                    yield future.result()
+                    pbar.update(count)
+
+            while pending:
+                count, future = pending.popleft()
+                yield future.result()
+                pbar.update(count)
+        finally:
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown()
+            pbar.close()
@@ -0,0 +1,462 @@
+# (C) Copyright 2020 ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+#
+
+r"""Decode and encode simple-packed GRIB data with NumPy.
+
+When decoding only the keys describing the packing are taken from ecCodes, the
+packed values are read straight from the message bytes and unpacked with vectorized
+NumPy operations. The result is bit-identical to the values decoded by ecCodes.
+
+When encoding the packed values are spliced into the data section of a template
+GRIB2 message.
+"""
+
+import logging
+
+import numpy as np
+
+LOG = logging.getLogger(__name__)
+
+# offset of the packed values from the start of the data section
+_DATA_OFFSETS = {
+    1: ("offsetSection4", "section4Length", 11),
+    2: ("offsetSection7", "section7Length", 5),
+}
+
+# the largest number of bits per value that can be extracted from a 64-bit word
+# whatever the bit position of the value is
+MAX_BITS_PER_VALUE = 57
+
+
+def codes_power(s, n):
+    r"""Return ``n`` to the power of ``s`` computed the same way as in ecCodes
+    i.e. by repeated multiplications or divisions.
+    """
+    divisor = 1.0
+    if s == 0:
+        return divisor
+    if s == 1:
+        return float(n)
+    while s < 0:
+        divisor /= n
+        s += 1
+    while s > 0:
+        divisor *= n
+        s -= 1
+    return divisor
+
+
+def unpack_bits(data, bits_per_value, count):
+    r"""Unpack ``count`` big-endian unsigned integers of ``bits_per_value`` bits
+    from ``data``.
+
+    Parameters
+    ----------
+    data: bytes-like
+        The packed bit stream.
+    bits_per_value: int
+        The number of bits of each value. Must be between 1 and
+        :data:`MAX_BITS_PER_VALUE`.
+    count: int
+        The number of values.
+
+    Returns
+    -------
+    ndarray
+        Array of uint32 (up to 25 bits per value) or uint64.
+
+    Notes
+    -----
+    When the values are byte aligned they are directly combined from their bytes.
+    Otherwise, since 8 consecutive values always occupy ``bits_per_value`` bytes, the
+    values at the same position in these groups start at the same bit offset. Each
+    position is extracted with strided views of the bytes, so no per value index
+    array is needed.
+    """
+    if not 0 < bits_per_value <= MAX_BITS_PER_VALUE:
+        raise ValueError(f"Unsupported bits_per_value={bits_per_value}")
+
+    dtype = np.uint32 if bits_per_value + 7 <= 32 else np.uint64
+    data = np.frombuffer(data, dtype=np.uint8)
+
+    if bits_per_value % 8 == 0:
+        size = bits_per_value // 8
+        if size in (1, 2, 4):
+            return data[: count * size].view(f">u{size}").astype(dtype)
+
+        b = data[: count * size].reshape(count, size)
+        result = b[:, 0].astype(dtype)
+        for i in range(1, size):
+            result <<= dtype(8)
+            result |= b[:, i]
+        return result
+
+    groups = (count + 7) // 8
+    stop = groups * bits_per_value
+    buf = np.zeros(stop + 8, dtype=np.uint8)
+    data = data[:stop]
+    buf[: len(data)] = data
+
+    mask = dtype((1 << bits_per_value) - 1)
+    result = np.empty((groups, 8), dtype=dtype)
+    for k in range(8):
+        start, bit = divmod(k * bits_per_value, 8)
+        # the number of bytes the value spans
+        size = (bit + bits_per_value + 7) // 8
+        word = buf[start : start + stop : bits_per_value].astype(dtype)
+        for i in range(1, size):
+            word <<= dtype(8)
+            word |= buf[start + i : start + i + stop : bits_per_value]
+        word >>= dtype(8 * size - bits_per_value - bit)
+        np.bitwise_and(word, mask, out=result[:, k])
+
+    return result.reshape(-1)[:count]
+
+
+def decode(handle, dtype=None):
+    r"""Decode the values of a simple-packed GRIB message.
+
+    Parameters
+    ----------
+    handle: :obj:`GribCodesHandle`
+        The handle of the message.
+    dtype: str, numpy.dtype or None
+        The type of the result. When it is None ``float64`` is used.
+
+    Returns
+    -------
+    ndarray or None
+        The values with the missing values (according to the bitmap) set to nan.
+        None is returned when the message is not supported, in this case the values
+        have to be decoded by ecCodes.
+    """
+    if handle.get_string("packingType") != "grid_simple":
+        return None
+
+    edition = handle.get_long("edition")
+    if edition not in _DATA_OFFSETS:
+        return None
+
+    # these can only be set in some local definitions
+    if handle.get("unitsFactor", default=1) != 1 or handle.get("unitsBias", default=0):
+        return None
+
+    bits_per_value = handle.get_long("bitsPerValue")
+    if bits_per_value > MAX_BITS_PER_VALUE:
+        return None
+
+    count = handle.get_long("numberOfCodedValues")
+    reference_value = handle.get("referenceValue", ktype=float)
+    bitmap = handle.get_long("bitmapPresent")
+    size = handle.get_long("numberOfDataPoints") if bitmap else count
+
+    if bits_per_value == 0:
+        # a constant field, ecCodes does not apply the decimal scaling
+        v = np.full(count, reference_value, dtype=np.float64)
+    else:
+        offset_key, length_key, header = _DATA_OFFSETS[edition]
+        offset = handle.get_long(offset_key) + header
+        length = (count * bits_per_value + 7) // 8
+        if length > handle.get_long(length_key) - header:
+            LOG.debug("Packed data section too short, using ecCodes")
+            return None
+
+        data = handle._message_bytes(offset, length)
+        if len(data) != length:
+            return None
+
+        binary_scale = codes_power(handle.get_long("binaryScaleFactor"), 2)
+        decimal_scale = codes_power(-handle.get_long("decimalScaleFactor"), 10)
+
+        # same operations and order as in ecCodes to get identical results
+        v = unpack_bits(data, bits_per_value, count).astype(np.float64)
+        v *= binary_scale
+        v += reference_value
+        v *= decimal_scale
+
+    dtype = np.float64 if dtype is None else np.dtype(dtype)
+    if bitmap:
+        missing = handle._missing_mask(size)
+        if np.count_nonzero(~missing) != count:
+            return None
+        r = np.full(size, np.nan, dtype=dtype)
+        r[~missing] = v
+        return r
+
+    return v if v.dtype == dtype else v.astype(dtype)
+
+
+def _packed_type(bits_per_value):
+    if bits_per_value in (8, 16, 32):
+        return f">u{bits_per_value // 8}"
+    return np.uint32 if bits_per_value + 7 <= 32 else np.uint64
+
+
+def pack_bits(values, bits_per_value):
+    r"""Pack unsigned integers into a big-endian bit stream of ``bits_per_value``
+    bits per value. This is the inverse of :func:`unpack_bits`.
+
+    Parameters
+    ----------
+    values: ndarray
+        The unsigned integers. They must fit into ``bits_per_value`` bits.
+    bits_per_value: int
+        The number of bits of each value. Must be between 1 and
+        :data:`MAX_BITS_PER_VALUE`.
+
+    Returns
+    -------
+    bytes
+    """
+    if not 0 < bits_per_value <= MAX_BITS_PER_VALUE:
+        raise ValueError(f"Unsupported bits_per_value={bits_per_value}")
+
+    values = np.asarray(values)
+    count = len(values)
+
+    if bits_per_value in (8, 16, 32):
+        return values.astype(_packed_type(bits_per_value), copy=False).tobytes()
+
+    dtype = np.uint32 if bits_per_value + 7 <= 32 else np.uint64
+    values = values.astype(dtype, copy=False)
+
+    if bits_per_value % 8 == 0:
+        size = bits_per_value // 8
+
+        result = np.empty((count, size), dtype=np.uint8)
+        for i in range(size):
+            result[:, i] = values >> dtype(8 * (size - 1 - i))
+        return result.tobytes()
+
+    groups = (count + 7) // 8
+    v = np.zeros(groups * 8, dtype=dtype)
+    v[:count] = values
+    v = v.reshape(groups, 8)
+
+    result = np.zeros((groups, bits_per_value), dtype=np.uint8)
+    for k in range(8):
+        start, bit = divmod(k * bits_per_value, 8)
+        size = (bit + bits_per_value + 7) // 8
+        word = v[:, k] << dtype(8 * size - bits_per_value - bit)
+        for i in range(size):
+            result[:, start + i] |= (word >> dtype(8 * (size - 1 - i))).astype(np.uint8)
+
+    return result.reshape(-1)[: (count * bits_per_value + 7) // 8].tobytes()
+
+
+def _float32_floor(x):
+    r = np.float32(x)
+    if r > x:
+        r = np.nextafter(r, np.float32(-np.inf))
+    return float(r)
+
+
+def _binary_scale_factor(value_range, bits_per_value):
+    max_int = (1 << bits_per_value) - 1
+    e = int(np.ceil(np.log2(value_range / max_int)))
+    while np.floor(np.ldexp(value_range, -e) + 0.5) > max_int:
+        e += 1
+    return e
+
+
+def bits_per_value_for_precision(values, precision, decimal_scale_factor=0):
+    r"""Return the number of bits per value and the binary scale factor needed to
+    encode ``values`` with an absolute error not larger than ``precision``.
+
+    Parameters
+    ----------
+    values: ndarray
+        The values to encode. Must not contain nans.
+    precision: float
+        The maximum absolute error of the encoded values.
+    decimal_scale_factor: int
+        The decimal scale factor used for the encoding.
+
+    Returns
+    -------
+    tuple
+        The number of bits per value (between 0 and 32) and the binary scale
+        factor. The binary scale factor is None when 32 bits are not enough to
+        reach ``precision``, in this case it has to be computed from the
+        number of bits per value.
+    """
+    if precision <= 0:
+        raise ValueError(f"precision={precision} must be positive")
+
+    v = np.asarray(values, dtype=np.float64)
+    scale = codes_power(decimal_scale_factor, 10)
+    v_min, v_max = v.min() * scale, v.max() * scale
+    if v_min == v_max:
+        return 0, 0
+
+    # the rounding error is at most half of the quantisation step
+    e = int(np.floor(np.log2(2 * precision * scale)))
+    value_range = v_max - _float32_floor(v_min)
+    bits = int(np.floor(np.ldexp(value_range, -e) + 0.5)).bit_length()
+    if bits > 32:
+        return 32, None
+    return max(bits, 1), e
+
+
+def encode(values, bits_per_value, decimal_scale_factor=0, binary_scale_factor=None):
+    r"""Encode ``values`` with simple packing.
+
+    Parameters
+    ----------
+    values: ndarray
+        The values to encode. Must not contain nans.
+    bits_per_value: int
+        The number of bits per value.
+    decimal_scale_factor: int
+        The decimal scale factor.
+    binary_scale_factor: int or None
+        The binary scale factor. When it is None the smallest one for which the
+        packed values fit into ``bits_per_value`` bits is used.
+
+    Returns
+    -------
+    tuple
+        The reference value, the binary scale factor, the number of bits per value
+        and the packed data (bytes). A constant field is encoded with 0 bits per value
+        and the reference value only.
+    """
+    v = np.asarray(values, dtype=np.float64).reshape(-1)
+    v_min, v_max = v.min(), v.max()
+    if v_min == v_max:
+        # no decimal scaling is applied to constant fields when decoding
+        return float(np.float32(v_min)), 0, 0, b""
+
+    if bits_per_value <= 0:
+        raise ValueError(f"bits_per_value={bits_per_value} needs a constant field")
+
+    if decimal_scale_factor != 0:
+        v = v * codes_power(decimal_scale_factor, 10)
+        v_min, v_max = v.min(), v.max()
+
+    # the reference value is stored as a float32 so it must not exceed the minimum
+    reference_value = _float32_floor(v_min)
+    if binary_scale_factor is None:
+        binary_scale_factor = _binary_scale_factor(
+            v_max - reference_value, bits_per_value
+        )
+
+    max_int = (1 << bits_per_value) - 1
+    if (
+        np.floor(np.ldexp(v_max - reference_value, -binary_scale_factor) + 0.5)
+        > max_int
+    ):
+        raise ValueError(
+            f"binary_scale_factor={binary_scale_factor} is too small for"
+            f" bits_per_value={bits_per_value}"
+        )
+
+    # all the values are positive so the conversion to integers rounds them down
+    x = v - reference_value
+    x *= 2.0**-binary_scale_factor
+    x += 0.5
+    return (
+        reference_value,
+        binary_scale_factor,
+        bits_per_value,
+        pack_bits(x.astype(_packed_type(bits_per_value)), bits_per_value),
+    )
+
+
+def _sign_magnitude(v):
+    return (0x8000 | -v) if v < 0 else v
+
+
+def _grib2_sections(message):
+    sections = {}
+    pos = 16
+    while message[pos : pos + 4] != b"7777":
+        length = int.from_bytes(message[pos : pos + 4], "big")
+        number = message[pos + 4]
+        if number in sections or length < 5 or pos + length > len(message):
+            raise ValueError("Only messages with a single field are supported")
+        sections[number] = (pos, length)
+        pos += length
+    return sections
+
+
+def encode_message(
+    message,
+    values,
+    bits_per_value,
+    decimal_scale_factor=0,
+    binary_scale_factor=None,
+):
+    r"""Create a GRIB2 message by replacing the data of ``message`` with ``values``
+    encoded with simple packing.
+
+    Parameters
+    ----------
+    message: bytes
+        The template GRIB2 message. It must contain a single field using simple
+        packing. Its sections up to the grid and product definitions are copied
+        as they are.
+    values: ndarray
+        The values. The nans are encoded as missing values in a bitmap.
+    bits_per_value: int
+        The number of bits per value.
+    decimal_scale_factor: int
+        The decimal scale factor.
+    binary_scale_factor: int or None
+        The binary scale factor. When it is None it is computed from
+        ``bits_per_value``.
+
+    Returns
+    -------
+    bytes
+    """
+    if message[:4] != b"GRIB" or message[7] != 2:
+        raise ValueError("Only GRIB2 messages are supported")
+
+    sections = _grib2_sections(message)
+    for n in (3, 5, 7):
+        if n not in sections:
+            raise ValueError(f"Section {n} is missing from the message")
+
+    pos5, length5 = sections[5]
+    if length5 != 21 or int.from_bytes(message[pos5 + 9 : pos5 + 11], "big") != 0:
+        raise ValueError("Only simple packing is supported")
+
+    values = np.asarray(values).reshape(-1)
+    missing = np.isnan(values)
+    coded = values[~missing] if missing.any() else values
+    if len(coded) == 0:
+        raise ValueError("Cannot encode a field with only missing values")
+
+    reference_value, binary_scale_factor, bits_per_value, data = encode(
+        coded, bits_per_value, decimal_scale_factor, binary_scale_factor
+    )
+
+    header = bytearray(message[:pos5])
+    # the number of data points of the grid definition
+    pos3 = sections[3][0]
+    header[pos3 + 6 : pos3 + 10] = len(values).to_bytes(4, "big")
+
+    sec5 = bytearray(message[pos5 : pos5 + 21])
+    sec5[5:9] = len(coded).to_bytes(4, "big")
+    sec5[11:15] = np.array(reference_value, dtype=">f4").tobytes()
+    sec5[15:17] = _sign_magnitude(binary_scale_factor).to_bytes(2, "big")
+    sec5[17:19] = _sign_magnitude(decimal_scale_factor).to_bytes(2, "big")
+    sec5[19] = bits_per_value
+
+    if len(coded) != len(values):
+        bitmap = np.packbits(~missing).tobytes()
+        sec6 = (6 + len(bitmap)).to_bytes(4, "big") + bytes([6, 0]) + bitmap
+    else:
+        sec6 = (6).to_bytes(4, "big") + bytes([6, 255])
+
+    sec7 = (5 + len(data)).to_bytes(4, "big") + bytes([7])
+
+    parts = [header, sec5, sec6, sec7, data, b"7777"]
+    header[8:16] = sum(len(p) for p in parts).to_bytes(8, "big")
+    return b"".join(parts)
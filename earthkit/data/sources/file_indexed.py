@@ -28,6 +28,21 @@ def make_absolute(filename, root_dir, default):
     return absolute
 
 
+BACKENDS = ("sql", "arrow")
+
+
+def index_class(backend):
+    if backend == "sql":
+        return FieldListInFilesWithSqlIndex
+    if backend == "arrow":
+        from earthkit.data.readers.grib.index.arrow import (
+            FieldListInFilesWithArrowIndex,
+        )
+
+        return FieldListInFilesWithArrowIndex
+    raise ValueError(f"Invalid backend={backend}, must be one of {BACKENDS}")
+
+
 class FileIndexedSource(IndexedSource):
     DEFAULT_JSON_FILE = "earthkit.index"
     DEFAULT_DB_FILE = "earthkit.db"
@@ -38,6 +53,8 @@ class FileIndexedSource(IndexedSource):
         path,
         db_path=None,
         index_file=None,
+        refresh=False,
+        backend=None,
         _index=None,
         **kwargs,
     ):
@@ -48,6 +65,15 @@ class FileIndexedSource(IndexedSource):
         db_path: optional
             The actual used database file. Must be a SQL earthkit index file.
             If None, create one in the default location.
+        refresh: bool
+            When an existing database is used, index the files added or
+            modified since they were indexed. Later changes can be indexed by
+            calling ``refresh()`` on the fieldlist.
+        backend: str, None
+            The database used for the index: "sql" (SQLite) or "arrow" (a memory
+            mapped Arrow file, for large indexes that are not updated). When
+            None the SQLite database is used. The "arrow" backend requires
+            pyarrow and cannot be used with ``refresh=True``.
 
         If _index is not None, ignore all other arguments (for internal usage)
         """
@@ -57,6 +83,17 @@ class FileIndexedSource(IndexedSource):
 
         path = os.path.expanduser(path)
 
+        index_cls = self.INDEX_CLASS if backend is None else index_class(backend)
+        refreshable = index_cls.DBCLASS.REFRESHABLE
+        if refresh and not refreshable:
+            raise ValueError(
+                f"refresh=True is not supported by backend={backend}, "
+                "the index must be rebuilt"
+            )
+        default_db_file = os.path.splitext(self.DEFAULT_DB_FILE)[0] + (
+            index_cls.DBCLASS.EXTENSION
+        )
+
         self.path = path
         self.abspath = os.path.abspath(path)
 
@@ -64,16 +101,9 @@ class FileIndexedSource(IndexedSource):
             db_path = make_absolute(
                 db_path,
                 self.abspath,
-                default=self.DEFAULT_DB_FILE,
+                default=default_db_file,
             )
 
-        # Try to use db_path if it exists:
-        if os.path.exists(db_path):
-            LOG.info(f"Using index file {db_path}")
-            index = self.INDEX_CLASS.from_existing_db(db_path=db_path)
-            super().__init__(index, **kwargs)
-            return
-
         index_file = make_absolute(
             index_file,
             self.abspath,
@@ -81,20 +111,44 @@ class FileIndexedSource(IndexedSource):
         )
         assert db_path != index_file
 
+        ignore = [
+            self.DEFAULT_DB_FILE,
+            default_db_file,
+            self.DEFAULT_JSON_FILE,
+            db_path,
+            db_path + index_cls.AVAILABILITY_EXTENSION,
+            index_file,
+        ]
+        iterator = GribIndexingPathParserIterator(
+            path, ignore=ignore, relative_paths=False
+        )
+
+        # Try to use db_path if it exists:
+        if os.path.exists(db_path):
+            LOG.info(f"Using index file {db_path}")
+            index = index_cls.from_existing_db(
+                db_path=db_path, path_iterator=iterator if refreshable else None
+            )
+            if refresh:
+                index.refresh()
+            super().__init__(index, **kwargs)
+            return
+
         # Try to use index_file (json) if it exists:
         if os.path.exists(index_file):
             LOG.info(f"Using index file {index_file}")
             print(f"Using index file {index_file} (will happen only once).")
-            index = self.INDEX_CLASS.from_file(path=index_file)
+            index = index_cls.from_file(path=index_file)
             super().__init__(index, **kwargs)
             return
 
         # Create the db_path file in cache (or used the cached one)
         LOG.info(f"Did not find index files in {db_path} or {index_file}")
-        ignore = [self.DEFAULT_DB_FILE, self.DEFAULT_JSON_FILE, db_path, index_file]
-        index = self.INDEX_CLASS.from_iterator(
-            GribIndexingPathParserIterator(path, ignore=ignore, relative_paths=False),
+        index = index_cls.from_iterator(
+            iterator,
             cache_metadata={"directory": self.path},
         )
+        if refresh:
+            index.refresh()
 
         super().__init__(index, **kwargs)
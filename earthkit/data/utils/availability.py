@@ -103,6 +103,19 @@ class Availability:
 
         return cls(requests, intervals)
 
+    @classmethod
+    def load(cls, path):
+        """Read the factorised tree written by :meth:`save`."""
+        with open(path) as f:
+            return cls(Tree.from_dict(json.load(f)))
+
+    def save(self, path):
+        """Write the factorised tree to ``path`` as JSON."""
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._tree.as_dict(), f)
+        os.replace(tmp, path)
+
     def _repr_html_(self):
         return "<hr><pre>{}</pre><hr>".format(self.tree())
 
@@ -12,10 +12,9 @@
 
 import datetime
 import itertools
-from collections import defaultdict
 from copy import copy
-from functools import cmp_to_key
 
+import numpy as np
 from dateutil.parser import parse as parse_dates
 
 
@@ -207,6 +206,12 @@ def _as_interval(interval):
     return result
 
 
+def _from_isoformat(s):
+    if "T" in s:
+        return datetime.datetime.fromisoformat(s)
+    return datetime.date.fromisoformat(s)
+
+
 class Tree:
     def __init__(self, values=None, intervals=None):
         self._values = {} if values is None else values
@@ -271,6 +276,42 @@ class Tree:
 
         return sorted(result, key=lambda a: sorted(a.items()))
 
+    def as_dict(self):
+        r"""Return the tree as nested dicts and lists of strings and numbers,
+        which can be written as JSON. The intervals are written as lists of
+        their start and end dates in ISO format.
+        """
+
+        def _as_dict(tree):
+            values = {}
+            for k, v in tree._values.items():
+                if k in self._intervals:
+                    v = [[x.start.isoformat(), x.end.isoformat()] for x in v]
+                values[k] = list(v)
+            return {
+                "values": values,
+                "children": [_as_dict(c) for c in tree._children],
+            }
+
+        return dict(intervals=sorted(self._intervals), **_as_dict(self))
+
+    @classmethod
+    def from_dict(cls, d):
+        r"""Build a tree from the output of :meth:`as_dict`."""
+        intervals = set(d["intervals"])
+
+        def _from_dict(d):
+            values = {}
+            for k, v in d["values"].items():
+                if k in intervals:
+                    v = [Interval(_from_isoformat(s), _from_isoformat(e)) for s, e in v]
+                values[k] = tuple(v)
+            tree = cls(values, intervals)
+            tree._children = [_from_dict(c) for c in d["children"]]
+            return tree
+
+        return _from_dict(d)
+
     def visit(self, visitor, depth=0):
         visitor(self._values, depth)
         for c in self._children:
@@ -438,12 +479,52 @@ class Tree:
         return "".join(str(x) for x in text)
 
 
+def _combine(ids, codes, n):
+    """Return dense ids identifying the pairs of ``ids`` and ``codes``, where
+    the codes are in the range [0, n).
+    """
+    _, inverse = np.unique(ids * n + codes, return_inverse=True)
+    return inverse.reshape(-1)
+
+
+def _intern_sequences(starts, lengths, seq):
+    """Return dense ids such that two groups have the same id when they are the
+    same sequence of codes. The codes of group i are
+    ``seq[starts[i]:starts[i]+lengths[i]]``. The sequences are compared one
+    position at a time, only for the groups that are long enough.
+    """
+    n = int(seq.max()) + 1 if len(seq) else 1
+    ids = lengths.astype(np.int64)
+    by_length = np.argsort(-lengths, kind="stable")
+    active = len(lengths)
+    next_id = int(ids.max()) + 1 if len(ids) else 0
+    for k in range(int(lengths.max()) if len(lengths) else 0):
+        while active > 0 and lengths[by_length[active - 1]] <= k:
+            active -= 1
+        groups = by_length[:active]
+        inverse = _combine(ids[groups], seq[starts[groups] + k], n)
+        ids[groups] = inverse + next_id
+        next_id += int(inverse.max()) + 1
+    _, inverse = np.unique(ids, return_inverse=True)
+    return inverse.reshape(-1)
+
+
 class Column(object):
-    """Just what is says on the tin, a column of values."""
+    """Just what is says on the tin, a column of values.
+
+    The values are stored as integer codes into the list of the distinct
+    values of the column, equal values having the same code.
+    """
 
     def __init__(self, title, values):
         self.title = title
-        self.values = values
+        self.index = dict.fromkeys(values)
+        for i, v in enumerate(self.index):
+            self.index[v] = i
+        self.values = list(self.index)
+        self.codes = np.fromiter(
+            map(self.index.__getitem__, values), dtype=np.int64, count=len(values)
+        )
         self.prio = 0
         self.diff = -1
 
@@ -454,29 +535,46 @@ class Column(object):
             other.title,
         )
 
+    def code(self, v):
+        c = self.index.get(v)
+        if c is None:
+            c = self.index[v] = len(self.values)
+            self.values.append(v)
+        return c
+
     def value(self, i):
-        return self.values[i]
+        return self.values[self.codes[i]]
 
     def set_value(self, i, v):
-        self.values[i] = v
+        self.codes[i] = self.code(v)
+
+    def ranks(self, idx):
+        """
+        Return an array mapping the codes of the values at the row indexes
+        ``idx`` to their rank in the sorted values.
+        """
+        present = np.unique(self.codes[idx])
+        present = sorted(present.tolist(), key=self.values.__getitem__)
+        ranks = np.zeros(len(self.values), dtype=np.int64)
+        ranks[present] = np.arange(len(present))
+        return ranks
 
     def compute_differences(self, idx):
         """
         Number of unique values in this column for the requested
         row indexes.
 
-        @param idx list of row indexes
+        @param idx array of row indexes
         """
-        x = [self.values[i] for i in idx]
-        try:
-            self.diff = len(set(x))
-        except Exception:
-            print(type(x))
-            print(x[:10])
-            raise
+        self.diff = len(np.unique(self.codes[idx]))
 
     def __repr__(self):
-        return "Column(%s,%s,%s,%s)" % (self.title, self.values, self.prio, self.diff)
+        return "Column(%s,%s,%s,%s)" % (
+            self.title,
+            [self.values[c] for c in self.codes],
+            self.prio,
+            self.diff,
+        )
 
 
 class Table(object):
@@ -492,7 +590,7 @@ class Table(object):
             self.depth = 0
             self.cols = []
             self.colidx = []
-            self.rowidx = []
+            self.rowidx = np.arange(0)
 
     def get_elem(self, c, r):
         return self.cols[self.colidx[c]].value(self.rowidx[r])
@@ -510,10 +608,7 @@ class Table(object):
         self.colidx.append(len(self.colidx))
 
         if len(col) > len(self.rowidx):
-            self.rowidx = [i for i in range(len(col))]
-
-    def one_less(self, r, n):
-        return [self.get_elem(i, r) for i in range(len(self.colidx)) if i != n]
+            self.rowidx = np.arange(len(col))
 
     def factorise1(self):
         self.pop_singles()
@@ -523,25 +618,57 @@ class Table(object):
             self.factorise2(len(self.colidx) - i - 1)
 
     def factorise2(self, n):
-        remap = defaultdict(list)
-        gone = []
-
-        for i in range(len(self.rowidx)):
-            v = self.one_less(i, n)
-            s = remap[_as_tuple(v)]
-            if len(s) != 0:
-                gone.append(i)
-            elem = self.get_elem(n, i)
-            if elem not in s:
-                s.append(elem)
-
-        for g in reversed(gone):
-            del self.rowidx[g]
-
-        for i in range(len(self.rowidx)):
-            v = self.one_less(i, n)
-            s = remap[_as_tuple(v)]
-            self.set_elem(n, i, _as_tuple(s))
+        """
+        Merge the rows with the same values in all the columns but the column
+        ``n``. The merged row is the first one and its value in the column
+        ``n`` is the tuple of the values of the merged rows, in order.
+        """
+        if len(self.rowidx) == 0:
+            return
+
+        # the rows with the same values in the other columns form a group
+        groups = np.zeros(len(self.rowidx), dtype=np.int64)
+        for i, idx in enumerate(self.colidx):
+            if i != n:
+                column = self.cols[idx]
+                groups = _combine(groups, column.codes[self.rowidx], len(column.values))
+
+        column = self.cols[self.colidx[n]]
+        codes = column.codes[self.rowidx]
+
+        # the distinct values of each group in the order of the rows
+        _, first = np.unique(groups * len(column.values) + codes, return_index=True)
+        first = first[np.lexsort((first, groups[first]))]
+        grouped, starts, lengths = np.unique(
+            groups[first], return_index=True, return_counts=True
+        )
+        seq = codes[first]
+
+        # the groups with the same values get the same tuple
+        sequences = _intern_sequences(starts, lengths, seq)
+        _, representatives = np.unique(sequences, return_index=True)
+        tuples = np.array(
+            [
+                column.code(
+                    _as_tuple(
+                        [
+                            column.values[c]
+                            for c in seq[starts[g] : starts[g] + lengths[g]]
+                        ]
+                    )
+                )
+                for g in representatives
+            ],
+            dtype=np.int64,
+        )
+        new_codes = np.empty(int(grouped.max()) + 1, dtype=np.int64)
+        new_codes[grouped] = tuples[sequences]
+
+        # only the first row of each group is kept
+        _, keep = np.unique(groups, return_index=True)
+        keep.sort()
+        self.rowidx = self.rowidx[keep]
+        column.codes[self.rowidx] = new_codes[groups[keep]]
 
     def sort_columns(self):
         """
@@ -552,24 +679,18 @@ class Table(object):
 
         self.colidx.sort(key=lambda a: self.cols[a])
 
-    def compare_rows(self, a, b):
-        for idx in self.colidx:
-            sa = self.cols[idx].value(a)
-            sb = self.cols[idx].value(b)
-
-            if sa is None and sb is None:
-                continue
-
-            if sa < sb:
-                return -1
-
-            if sa > sb:
-                return 1
-
-        return 0
-
     def sort_rows(self):
-        self.rowidx.sort(key=cmp_to_key(self.compare_rows))
+        """
+        Sort the rows on the values of the columns, in the order of the
+        columns. The sort is stable.
+        """
+        if len(self.rowidx) < 2 or not self.colidx:
+            return
+        keys = []
+        for idx in reversed(self.colidx):
+            column = self.cols[idx]
+            keys.append(column.ranks(self.rowidx)[column.codes[self.rowidx]])
+        self.rowidx = self.rowidx[np.lexsort(keys)]
 
     def pop_singles(self):
         """
@@ -593,21 +714,16 @@ class Table(object):
         self.sort_columns()
         self.sort_rows()
 
-        prev = self.get_elem(0, 0)
-        j = 0
+        codes = self.cols[self.colidx[0]].codes[self.rowidx]
+        bounds = np.flatnonzero(codes[1:] != codes[:-1]) + 1
 
-        for i in range(1, len(self.rowidx)):
-            e = self.get_elem(0, i)
-            if prev != e:
+        if len(bounds) > 0:
+            j = 0
+            for i in bounds.tolist() + [len(self.rowidx)]:
                 table = Table(self, j, i)
                 self.tree._add_child(table.process())
                 j = i
-                prev = e
-
-        if j > 0:
-            table = Table(self, j, len(self.rowidx))
-            self.tree._add_child(table.process())
-            self.rowidx = []
+            self.rowidx = self.rowidx[:0]
 
     def process(self):
         self.factorise1()
@@ -616,45 +732,41 @@ class Table(object):
         return self.tree
 
 
-def _scan(r, cols, name, rest):
-    """Generate all possible combinations of values. Each set of values is
-    stored in a list and each value is repeated as many times so that if taking
-    one row in all value lists, I will get one unique combination of values
-    between all input keys.
+def _columns(req, names):
+    """Return the columns of the table of all the possible combinations of
+    values of each request. The value of a missing key is "-".
 
-    @param r    request as a dict
-    @param cols actual result of the _scan
-    @param name current request key we are processing
-    @param rest remaining request keys to process
+    @param req  list of requests as dicts
+    @param names the request keys, in the order of the columns
     """
-    n = 0
-    # print("Scan", name)
-    c = cols[name]
-    for value in r.get(name, ["-"]):
-        m = 1
-        if rest:
-            m = _scan(r, cols, rest[0], rest[1:])
-        for _ in range(m):
-            c.append(value)
-        n += m
-
-    return n
-
-
-def _as_requests(r):
-    s = {}
-    for k, v in r.items():
-        if not isinstance(v, (tuple, list)):
-            s[k] = [v]
-        else:
-            s[k] = v
-
-    return s
+    columns = [[r.get(name, "-") for r in req] for name in names]
+
+    # the requests with several values for a key
+    several = set()
+    for c in columns:
+        if any(issubclass(t, (tuple, list)) for t in set(map(type, c))):
+            several.update(i for i, v in enumerate(c) if isinstance(v, (tuple, list)))
+
+    if not several:
+        return columns
+
+    result = [[] for _ in names]
+    start = 0
+    for i in sorted(several):
+        for r, c in zip(result, columns):
+            r.extend(c[start:i])
+        values = [c[i] if isinstance(c[i], (tuple, list)) else [c[i]] for c in columns]
+        for r, v in zip(result, zip(*itertools.product(*values))):
+            r.extend(v)
+        start = i + 1
+    for r, c in zip(result, columns):
+        r.extend(c[start:])
+    return result
 
 
 def factorise(req, *, intervals=None):
     # Make a copy so we don't modify the original
-    safe = [dict(**r) for r in req]
+    safe = [dict(r) for r in req] if intervals else list(req)
     return _factorise(safe, intervals=intervals)
 
 
@@ -687,17 +799,10 @@ def _factorise(req, intervals=None):
                     splits.extend(interval.split(dates))
                 r[i] = splits
 
-    req = [_as_requests(r) for r in req]
-
-    names = list({name for r in req for name in r.keys()})
-
-    cols = defaultdict(list)
-    if names:
-        for r in req:
-            _scan(r, cols, names[0], names[1:])
+    names = list(set().union(*req))
 
     table = Table()
-    for n, c in cols.items():
+    for n, c in zip(names, _columns(req, names)):
         table.column(n, c)
 
     tree = table.process()
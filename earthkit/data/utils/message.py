@@ -7,16 +7,25 @@
 # nor does it submit to any jurisdiction.
 #
 
+import array
 import json
 import logging
 import os
+import struct
 import threading
 import time
+from collections import OrderedDict
 
 import eccodes
 import numpy as np
 
-from earthkit.data.core.caching import CACHE, auxiliary_cache_file
+from earthkit.data.core.caching import (
+    CACHE,
+    auxiliary_cache_file,
+    cache_file,
+    existing_auxiliary_cache_file,
+)
+from earthkit.data.core.settings import SETTINGS
 
 LOG = logging.getLogger(__name__)
 
@@ -31,14 +40,61 @@ except Exception:
     pass
 
 
+def sample_indices(count, samples):
+    r"""Return up to ``samples`` evenly spaced indices in ``range(count)``,
+    always including the first and the last one."""
+    if count <= samples:
+        return list(range(count))
+    return sorted(set(np.linspace(0, count - 1, samples).astype(int).tolist()))
+
+
+def messages_in_place(path, parts, marker=None):
+    r"""Check if the messages described by ``parts``, a list of (offset, length)
+    tuples, are still stored in ``path``. Only the ``marker`` the messages start
+    with and their "7777" end markers are checked.
+
+    It is a heuristic used to decide whether a file was only appended to: the
+    callers pass a sample of the indexed messages (see :func:`sample_indices`).
+    A file rewritten with messages of the same lengths at the same positions,
+    or changed only between the sampled messages, is not detected.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        for offset, length in parts:
+            if offset + length > size:
+                return False
+            if marker is not None:
+                f.seek(offset)
+                if f.read(len(marker)) != marker:
+                    return False
+            f.seek(offset + length - 4)
+            if f.read(4) != b"7777":
+                return False
+    return True
+
+
 class CodesMessagePositionIndex:
-    VERSION = 1
+    VERSION = 2
+    JSON_VERSION = 1
+    CACHE_MAGIC = b"EKMI"
+    # magic, version, number of messages, bit mask of the stored EXTRA_ARRAYS
+    CACHE_HEADER = struct.Struct("<4sIQQ")
+    CACHE_EXTENSION = ".idx"
+    # names of the additional int64 arrays (one value per message) stored in
+    # the cache file. They are accessed as attributes and loaded into "_<name>".
+    EXTRA_ARRAYS = ()
+    # the bytes a message starts with, used to check that the indexed messages
+    # are still in place when the file changes
+    MESSAGE_MARKER = None
+    # the number of indexed messages checked by _messages_in_place()
+    MESSAGES_IN_PLACE_SAMPLES = 16
 
     def __init__(self, path):
         self.path = path
         self.offsets = None
         self.lengths = None
         self._cache_file = None
+        self._stat = None
         self._load()
 
     def __len__(self):
@@ -47,60 +103,273 @@ class CodesMessagePositionIndex:
     def _get_message_positions(self, path):
         raise NotImplementedError
 
+    def _scan(self, path, start=0):
+        r"""Return the offsets and lengths of the messages in ``path`` starting
+        at or after ``start`` as two ``int64`` ndarrays. Subclasses can override
+        it with a bulk scanner, the default implementation collects the output of
+        :meth:`_get_message_positions`.
+        """
+        offsets = array.array("q")
+        lengths = array.array("q")
+
+        for offset, length in self._get_message_positions(path):
+            if offset >= start:
+                offsets.append(offset)
+                lengths.append(length)
+
+        return (
+            np.frombuffer(offsets, dtype=np.int64),
+            np.frombuffer(lengths, dtype=np.int64),
+        )
+
     def _build(self):
-        offsets = []
-        lengths = []
+        for name in self.EXTRA_ARRAYS:
+            setattr(self, "_" + name, None)
+        self.offsets, self.lengths = self._scan(self.path)
 
-        for offset, length in self._get_message_positions(self.path):
-            offsets.append(offset)
-            lengths.append(length)
+    def _extend(self, offsets, lengths):
+        r"""Add the messages located after the indexed ones. Subclasses have to
+        extend their :attr:`EXTRA_ARRAYS`.
+        """
+        self.offsets = np.concatenate([self.offsets, offsets])
+        self.lengths = np.concatenate([self.lengths, lengths])
 
-        self.offsets = offsets
-        self.lengths = lengths
+    def _file_stat(self):
+        st = os.stat(self.path)
+        return (st.st_size, st.st_mtime_ns)
 
     def _load(self):
+        self._stat = self._file_stat()
         if CACHE.policy.use_message_position_index_cache():
             self._cache_file = auxiliary_cache_file(
                 "message-index",
                 self.path,
-                content="null",
-                extension=".json",
+                extension=self.CACHE_EXTENSION,
             )
             if not self._load_cache():
-                self._build()
+                if not self._load_json_cache() and not self._load_previous_cache():
+                    self._build()
                 self._save_cache()
         else:
             self._build()
 
+    def _messages_in_place(self):
+        r"""Check if a sample of the indexed messages, including the first and
+        the last one, are still at the same position i.e. whether the file was
+        only appended to. See :func:`messages_in_place` for the limitations.
+        """
+        if len(self) == 0:
+            return True
+        parts = [
+            (int(self.offsets[i]), int(self.lengths[i]))
+            for i in sample_indices(len(self), self.MESSAGES_IN_PLACE_SAMPLES)
+        ]
+        return messages_in_place(self.path, parts, marker=self.MESSAGE_MARKER)
+
+    def _scan_appended(self, size):
+        r"""Index the messages appended to the file. Only the bytes after the
+        last indexed message are scanned. Returns False when the file was not
+        only appended to i.e. it did not grow past its indexed ``size`` or the
+        indexed messages are no longer in place.
+        """
+        if os.path.getsize(self.path) <= size or not self._messages_in_place():
+            return False
+
+        start = int(self.offsets[-1] + self.lengths[-1]) if len(self) else 0
+        offsets, lengths = self._scan(self.path, start=start)
+        if len(offsets) > 0:
+            self._extend(offsets, lengths)
+        return True
+
+    def refresh(self):
+        r"""Update the index when the file has changed since it was indexed.
+
+        When messages were only appended to the file only the new bytes are
+        scanned, otherwise the whole file is indexed again.
+
+        Returns
+        -------
+        bool
+            True when the file has changed.
+        """
+        stat = self._file_stat()
+        if stat == self._stat:
+            return False
+
+        LOG.debug(f"Refreshing message index of {self.path}")
+        size = self._stat[0]
+        self._stat = stat
+        if not self._scan_appended(size):
+            self._build()
+            # the handles and the open file may refer to the previous content
+            handle_pool.discard(self.path)
+            cache.discard(self.path)
+
+        if CACHE.policy.use_message_position_index_cache():
+            self._cache_file = auxiliary_cache_file(
+                "message-index",
+                self.path,
+                extension=self.CACHE_EXTENSION,
+            )
+            self._save_cache()
+        return True
+
+    def _latest_cache_file(self):
+        r"""Return the file storing the name of the last cache file written for
+        :attr:`path`. Unlike the cache file itself it does not depend on the
+        modification time of :attr:`path`.
+        """
+
+        def create(target, args):
+            with open(target, "w") as f:
+                json.dump({}, f)
+
+        return cache_file(
+            "message-index-latest",
+            create,
+            (self.path,),
+            extension=".json",
+        )
+
+    def _load_previous_cache(self):
+        r"""Load the cache file written for an earlier version of the file then
+        index the messages appended since then.
+        """
+        try:
+            with open(self._latest_cache_file()) as f:
+                previous = json.load(f)
+            previous, size = previous.get("cache_file"), previous.get("size")
+        except Exception:
+            LOG.exception("Cannot read latest cache file of %s", self.path)
+            return False
+
+        if (
+            previous is None
+            or previous == self._cache_file
+            or not os.path.exists(previous)
+        ):
+            return False
+
+        if self._load_cache(previous):
+            if self._scan_appended(size):
+                LOG.debug(f"Index of {self.path} updated from {previous}")
+                return True
+        return False
+
     def _save_cache(self):
+        r"""Write the index into the binary cache file.
+
+        The file contains a fixed size header (magic, version, number of messages,
+        stored extra arrays) followed by the offsets, the lengths and the
+        :attr:`EXTRA_ARRAYS` already computed as little-endian ``int64`` arrays.
+        The extra arrays are not computed here, see :meth:`_extra_array_computed`.
+        It is written into a temporary file and moved in place so that
+        processes already mapping the previous version are not affected.
+        """
         if CACHE.policy.use_message_position_index_cache():
+            tmp = f"{self._cache_file}.{os.getpid()}.tmp"
+            extras = [getattr(self, "_" + name) for name in self.EXTRA_ARRAYS]
+            mask = sum(1 << i for i, x in enumerate(extras) if x is not None)
             try:
-                with open(self._cache_file, "w") as f:
+                with open(tmp, "wb") as f:
+                    f.write(
+                        self.CACHE_HEADER.pack(
+                            self.CACHE_MAGIC, self.VERSION, len(self.offsets), mask
+                        )
+                    )
+                    f.write(np.ascontiguousarray(self.offsets, dtype="<i8").tobytes())
+                    f.write(np.ascontiguousarray(self.lengths, dtype="<i8").tobytes())
+                    for x in extras:
+                        if x is not None:
+                            f.write(np.ascontiguousarray(x, dtype="<i8").tobytes())
+                os.replace(tmp, self._cache_file)
+                with open(self._latest_cache_file(), "w") as f:
                     json.dump(
-                        dict(
-                            version=self.VERSION,
-                            offsets=self.offsets,
-                            lengths=self.lengths,
-                        ),
-                        f,
+                        {"cache_file": self._cache_file, "size": self._stat[0]}, f
                     )
             except Exception:
                 LOG.exception("Write to cache failed %s", self._cache_file)
-
-    def _load_cache(self):
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+
+    def _extra_array_computed(self):
+        r"""Called by subclasses when one of their :attr:`EXTRA_ARRAYS` was
+        computed on demand, to add it to the cache file."""
+        if self._cache_file is not None:
+            self._save_cache()
+
+    def _load_cache(self, path=None):
+        r"""Memory map the binary cache file (by default :attr:`_cache_file`).
+        Return False when the file is empty (i.e. it was just created) or not valid.
+        """
+        if path is None:
+            path = self._cache_file
         if CACHE.policy.use_message_position_index_cache():
             try:
-                with open(self._cache_file) as f:
+                with open(path, "rb") as f:
+                    header = f.read(self.CACHE_HEADER.size)
+                    size = os.fstat(f.fileno()).st_size
+
+                if len(header) < self.CACHE_HEADER.size:
+                    return False
+
+                magic, version, count, mask = self.CACHE_HEADER.unpack(header)
+                if magic != self.CACHE_MAGIC or version != self.VERSION:
+                    LOG.debug("Ignoring incompatible cache file %s", path)
+                    return False
+
+                extras = [
+                    name for i, name in enumerate(self.EXTRA_ARRAYS) if mask & (1 << i)
+                ]
+                n = 2 + len(extras)
+                if size != self.CACHE_HEADER.size + n * count * 8:
+                    LOG.warning("Ignoring truncated cache file %s", path)
+                    return False
+
+                if count == 0:
+                    data = np.zeros((n, 0), dtype=np.int64)
+                else:
+                    data = np.memmap(
+                        path,
+                        dtype="<i8",
+                        mode="r",
+                        offset=self.CACHE_HEADER.size,
+                        shape=(n, count),
+                    )
+                self.offsets = data[0]
+                self.lengths = data[1]
+                for name in self.EXTRA_ARRAYS:
+                    setattr(self, "_" + name, None)
+                for i, name in enumerate(extras, 2):
+                    setattr(self, "_" + name, data[i])
+                return True
+            except Exception:
+                LOG.exception("Load from cache failed %s", path)
+
+        return False
+
+    def _load_json_cache(self):
+        r"""Load the index from a cache file written in the JSON format used
+        by earlier versions. No new JSON cache file is created.
+        """
+        path = existing_auxiliary_cache_file(
+            "message-index", self.path, extension=".json"
+        )
+        if path is not None:
+            try:
+                with open(path) as f:
                     c = json.load(f)
                     if not isinstance(c, dict):
                         return False
 
-                    assert c["version"] == self.VERSION
-                    self.offsets = c["offsets"]
-                    self.lengths = c["lengths"]
+                    assert c["version"] == self.JSON_VERSION
+                    self.offsets = np.array(c["offsets"], dtype=np.int64)
+                    self.lengths = np.array(c["lengths"], dtype=np.int64)
                     return True
             except Exception:
-                LOG.exception("Load from cache failed %s", self._cache_file)
+                LOG.exception("Load from cache failed %s", path)
 
         return False
 
@@ -213,11 +482,24 @@ class CodesHandle(eccodes.Message):
                 return f.read(length)
 
 
-class ReaderLRUCache(dict):
-    def __init__(self, size):
-        self.readers = dict()
+class ReaderLRUCache(OrderedDict):
+    r"""Pool of :class:`CodesReader` objects with least recently used eviction.
+
+    The readers are keyed by path and process id. Both lookups and evictions are
+    O(1). The maximum size is taken from the ``reader-file-pool-size`` setting
+    unless ``size`` is specified.
+    """
+
+    def __init__(self, size=None):
+        super().__init__()
         self.lock = threading.Lock()
-        self.size = size
+        self._size = size
+
+    @property
+    def size(self):
+        if self._size is not None:
+            return self._size
+        return SETTINGS.get("reader-file-pool-size")
 
     def __getitem__(self, path_and_cls):
         path = path_and_cls[0]
@@ -225,24 +507,156 @@ class ReaderLRUCache(dict):
         key = (path, os.getpid())
         with self.lock:
             try:
-                return super().__getitem__(key)
+                c = super().__getitem__(key)
+                self.move_to_end(key)
+                return c
             except KeyError:
                 pass
 
-            c = self[key] = cls(path)
-            while len(self) >= self.size:
-                _, oldest = min((v.last, k) for k, v in self.items())
-                del self[oldest]
+            c = cls(path)
+            self[key] = c
+            size = self.size
+            while len(self) > size:
+                self.popitem(last=False)
 
             return c
 
+    def discard(self, path):
+        r"""Remove the reader of ``path`` so that the file is opened again."""
+        with self.lock:
+            self.pop((path, os.getpid()), None)
+
+
+cache = ReaderLRUCache()
 
-cache = ReaderLRUCache(32)  # TODO: Add to config
+
+class HandlePool:
+    r"""Global pool of the handles created from messages stored in files.
+
+    Fields only store the location of their message and get their handle from
+    the pool on demand. The least recently used handles are evicted when
+    either the number of handles exceeds the ``handle-pool-size`` setting or
+    their total size exceeds the ``handle-pool-memory-limit`` setting.
+    The size of a handle is estimated by the size of its encoded message.
+
+    Evicted handles are not released as long as they are referenced elsewhere.
+
+    ecCodes handles must not be used by several threads at the same time, so
+    each thread gets its own handles: a message read by two threads is stored
+    twice in the pool.
+    """
+
+    def __init__(self):
+        self._handles = OrderedDict()
+        self.lock = threading.Lock()
+        self.memory = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._handles)
+
+    def get(self, reader_cls, path, offset, length=None):
+        r"""Return the handle of the message at ``offset`` in ``path``.
+        When it is not in the pool it is created with ``reader_cls``.
+        """
+        key = (reader_cls, path, offset, threading.get_ident())
+        with self.lock:
+            item = self._handles.get(key)
+            if item is not None:
+                self._handles.move_to_end(key)
+                self.hits += 1
+                return item[0]
+            self.misses += 1
+
+        # the lock is not held while reading the message so that
+        # multiple threads can create handles concurrently
+        handle = reader_cls.from_cache(path).at_offset(offset, length)
+        size = (
+            length
+            if length is not None
+            else eccodes.codes_get_message_size(handle._handle)
+        )
+
+        with self.lock:
+            item = self._handles.get(key)
+            if item is not None:
+                # created by another thread in the meantime
+                self._handles.move_to_end(key)
+                return item[0]
+
+            self._handles[key] = (handle, size)
+            self.memory += size
+            self._evict()
+
+        return handle
+
+    def _evict(self):
+        max_size = SETTINGS.get("handle-pool-size")
+        max_memory = SETTINGS.get("handle-pool-memory-limit")
+        while len(self._handles) > max_size or (
+            max_memory is not None and self.memory > max_memory and self._handles
+        ):
+            _, (_, size) = self._handles.popitem(last=False)
+            self.memory -= size
+            self.evictions += 1
+
+    def discard(self, path):
+        r"""Remove the handles of the messages of ``path`` from the pool, e.g.
+        when the file was rewritten and the messages moved."""
+        with self.lock:
+            for key in [k for k in self._handles if k[1] == path]:
+                _, size = self._handles.pop(key)
+                self.memory -= size
+
+    def clear(self):
+        r"""Remove all the handles from the pool."""
+        with self.lock:
+            self._handles.clear()
+            self.memory = 0
+
+    def statistics(self):
+        r"""Return the pool statistics.
+
+        Returns
+        -------
+        dict
+            The number of hits, misses and evictions, the number of handles
+            currently in the pool and their estimated total size (in bytes).
+        """
+        with self.lock:
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                size=len(self._handles),
+                memory=self.memory,
+            )
+
+    def reset_statistics(self):
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+handle_pool = HandlePool()
 
 
 class CodesReader:
+    r"""Create handles from the messages of a GRIB/BUFR file.
+
+    When the length of the message is known the message is read with
+    ``os.pread`` and the handle is created from the buffer. This does not
+    change the file position so multiple threads can create handles from the
+    same file concurrently. Otherwise the handle is created from the shared
+    file object under a lock.
+    """
+
     PRODUCT_ID = None
     HANDLE_TYPE = None
+    HAS_PREAD = hasattr(os, "pread")
 
     def __init__(self, path):
         self.path = path
@@ -262,16 +676,38 @@ class CodesReader:
     def from_cache(cls, path):
         return cache[(path, cls)]
 
-    def at_offset(self, offset):
+    def at_offset(self, offset, length=None):
+        self.last = time.time()
+        if length is not None and self.HAS_PREAD:
+            data = self.read_message(offset, length)
+            handle = eccodes.codes_new_from_message(data)
+        else:
+            with self.lock:
+                self.file.seek(offset, 0)
+                handle = eccodes.codes_new_from_file(
+                    self.file,
+                    self.PRODUCT_ID,
+                )
+        assert handle is not None
+        return self.HANDLE_TYPE(handle, self.path, offset)
+
+    def read_message(self, offset, length):
+        r"""Read ``length`` bytes from ``offset`` without using the file position."""
+        data = os.pread(self.file.fileno(), length, offset)
+        if len(data) != length:
+            raise ValueError(
+                f"Could not read message at offset={offset} length={length}"
+                f" from {self.path}"
+            )
+        return data
+
+    def read(self, offset, count):
+        r"""Read at most ``count`` bytes from ``offset``."""
+        if self.HAS_PREAD:
+            return os.pread(self.file.fileno(), count, offset)
         with self.lock:
-            self.last = time.time()
             self.file.seek(offset, 0)
-            handle = eccodes.codes_new_from_file(
-                self.file,
-                self.PRODUCT_ID,
-            )
-            assert handle is not None
-            return self.HANDLE_TYPE(handle, self.path, offset)
+            return self.file.read(count)
 
     def __repr__(self):
         return f"{self.__class__.__name__}({self.path}"
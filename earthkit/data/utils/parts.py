@@ -6,11 +6,28 @@
 # granted to it by virtue of its status as an intergovernmental organisation
 # nor does it submit to any jurisdiction.
 
+import errno
+import logging
 import os
 from collections import defaultdict
 
 # from earthkit.data.utils import download_and_cache
 
+LOG = logging.getLogger(__name__)
+
+COPY_BUFFER_SIZE = 16 * 1024 * 1024
+
+# errors meaning that a kernel copy method cannot be used for the given files
+_UNSUPPORTED = {
+    errno.EBADF,
+    errno.EINVAL,
+    errno.ENOSYS,
+    errno.EOPNOTSUPP,
+    errno.ENOTSUP,
+    errno.EXDEV,
+    errno.ETXTBSY,
+}
+
 
 class Part:
     def __init__(self, path, offset, length):
@@ -56,3 +73,110 @@ class Part:
 
     def __repr__(self):
         return f"Part[{self.path},{self.offset},{self.length}]"
+
+
+def merge_parts(parts):
+    r"""Merge the consecutive (path, offset, length) tuples describing adjacent
+    byte ranges of the same file. The order of the parts is preserved.
+    """
+    result = []
+    for path, offset, length in parts:
+        if result:
+            p, o, n = result[-1]
+            if p == path and o + n == offset:
+                result[-1] = (p, o, n + length)
+                continue
+        result.append((path, offset, length))
+    return result
+
+
+def _fileno(f):
+    try:
+        return f.fileno()
+    except (AttributeError, OSError):
+        return None
+
+
+def _copy_file_range(src, dst, offset, length):
+    return os.copy_file_range(src, dst, length, offset)
+
+
+def _sendfile(src, dst, offset, length):
+    return os.sendfile(dst, src, offset, length)
+
+
+def _kernel_copy_methods():
+    methods = []
+    if hasattr(os, "copy_file_range"):
+        methods.append(_copy_file_range)
+    if hasattr(os, "sendfile"):
+        methods.append(_sendfile)
+    return methods
+
+
+def _read_error(path, offset, length):
+    return ValueError(f"{path}: cannot read {length} bytes at offset={offset}")
+
+
+def copy_parts(parts, f):
+    r"""Copy the byte ranges described by ``parts`` into the file object ``f``
+    without decoding them.
+
+    Adjacent ranges are merged and each source file is only opened once. When
+    ``f`` is backed by a file descriptor the data is copied in the kernel with
+    :func:`os.copy_file_range` or :func:`os.sendfile`, otherwise (or when
+    these are not supported for the given files) it is copied with large
+    buffered reads.
+
+    Parameters
+    ----------
+    parts: list
+        List of (path, offset, length) tuples.
+    f: file object
+        The target file object opened in binary mode.
+    """
+    dst = _fileno(f)
+    methods = []
+    if dst is not None:
+        f.flush()
+        methods = _kernel_copy_methods()
+
+    buf = None
+    sources = {}
+    try:
+        for path, offset, length in merge_parts(parts):
+            src = sources.get(path)
+            if src is None:
+                src = sources[path] = open(path, "rb")
+
+            while length > 0 and methods:
+                try:
+                    n = methods[0](src.fileno(), dst, offset, length)
+                except OSError as e:
+                    if e.errno not in _UNSUPPORTED:
+                        raise
+                    LOG.debug(f"Cannot use {methods[0].__name__}: {e}")
+                    methods.pop(0)
+                    continue
+                if n == 0:
+                    raise _read_error(path, offset, length)
+                offset += n
+                length -= n
+
+            if length > 0:
+                if buf is None or len(buf) < min(COPY_BUFFER_SIZE, length):
+                    buf = memoryview(bytearray(min(COPY_BUFFER_SIZE, length)))
+                src.seek(offset)
+                while length > 0:
+                    n = src.readinto(buf[: min(len(buf), length)])
+                    if not n:
+                        raise _read_error(path, offset, length)
+                    f.write(buf[:n])
+                    offset += n
+                    length -= n
+    finally:
+        for src in sources.values():
+            src.close()
+        # the position of f is cached by the buffered writer
+        if dst is not None and f.seekable():
+            f.seek(os.lseek(dst, 0, os.SEEK_CUR))
@@ -10,6 +10,7 @@
 #
 
 import os
+import sqlite3
 
 import pytest
 
@@ -328,6 +329,44 @@ def test_cache_management(policy):
             assert len(cache.entries()) == 0
 
 
+def test_cache_batched_accesses():
+    def touch(target, args):
+        with open(target, "w"):
+            pass
+
+    def accesses(db_path):
+        with sqlite3.connect(db_path) as db:
+            return [x[0] for x in db.execute("SELECT accesses FROM cache")]
+
+    with temp_directory() as tmp_dir_path:
+        with settings.temporary(
+            {
+                "cache-policy": "user",
+                "user-cache-directory": tmp_dir_path,
+                "cache-database-flush-interval": "1h",
+            }
+        ):
+            db_path = os.path.join(tmp_dir_path, "cache-2.db")
+            for _ in range(20):
+                path = cache_file("test_cache", touch, {"foo": 1}, extension=".test")
+
+            # the pending accesses are written before the database is read
+            (entry,) = cache.entries()
+            assert entry["path"] == path
+            assert entry["accesses"] == 20
+            assert entry["type"] == "file"
+            assert accesses(db_path) == [20]
+
+            # the accesses to a known entry are not written one by one
+            for _ in range(20):
+                assert path == cache_file(
+                    "test_cache", touch, {"foo": 1}, extension=".test"
+                )
+            assert accesses(db_path) == [20]
+            assert cache.entries()[0]["accesses"] == 40
+            assert accesses(db_path) == [40]
+
+
 if __name__ == "__main__":
     from earthkit.data.testing import main
 
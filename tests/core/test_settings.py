@@ -76,6 +76,8 @@ def test_settings_invalid():
         ("reader-type-check-bytes", 8, 8, None),
         ("reader-type-check-bytes", 1, 1, ValueError),
         ("reader-type-check-bytes", 4097, 4097, ValueError),
+        ("reader-file-pool-size", 4, 4, None),
+        ("reader-file-pool-size", 0, 0, ValueError),
     ],
 )
 def test_settings_set_numbers(param, set_value, stored_value, raise_error):
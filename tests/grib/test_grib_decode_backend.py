@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+# (C) Copyright 2020 ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+#
+
+import os
+import time
+
+import numpy as np
+import pytest
+
+from earthkit.data import from_source, settings
+from earthkit.data.core.temporary import temp_file
+from earthkit.data.testing import earthkit_examples_file, earthkit_test_data_file
+
+
+@pytest.fixture
+def processes():
+    with settings.temporary("number-of-decode-processes", 2):
+        yield
+
+
+def test_grib_decode_backend_to_numpy(processes):
+    ds = from_source("file", earthkit_examples_file("tuv_pl.grib"))
+    ref = ds.to_numpy(decode_backend="thread")
+
+    v = ds.to_numpy(decode_backend="process")
+    assert v.shape == (18, 7, 12)
+    assert np.array_equal(v, ref)
+
+    v = ds.to_numpy(decode_backend="process", flatten=True, dtype=np.float32)
+    assert v.shape == (18, 84)
+    assert v.dtype == np.float32
+    assert np.allclose(v, ref.reshape(18, 84))
+
+    # views keep the shared memory alive
+    v = ds.to_numpy(decode_backend="process")[3:5]
+    assert np.array_equal(v, ref[3:5])
+
+    out = np.zeros((18, 7, 12))
+    v = ds.to_numpy(decode_backend="process", out=out)
+    assert v is out
+    assert np.array_equal(out, ref)
+
+    with pytest.raises(ValueError):
+        ds.to_numpy(decode_backend="process", out=np.zeros((18, 84)))
+
+
+def test_grib_decode_backend_out_blocks(processes, monkeypatch):
+    from earthkit.data.readers.grib import parallel
+
+    ds = from_source("file", earthkit_examples_file("tuv_pl.grib"))
+    ref = ds.to_numpy(decode_backend="thread")
+
+    # the fields are copied into out by blocks of 2 fields
+    monkeypatch.setattr(parallel, "OUT_BLOCK_SIZE", ref[0].nbytes * 2)
+    out = np.zeros((18, 7, 12), dtype=np.float32)
+    assert ds.to_numpy(decode_backend="process", out=out) is out
+    assert np.allclose(out, ref)
+
+
+def test_grib_decode_backend_setting(processes):
+    ds = from_source("file", earthkit_examples_file("test6.grib"))
+    ref = ds.to_numpy()
+
+    with settings.temporary("decode-backend", "process"):
+        assert np.array_equal(ds.to_numpy(), ref)
+        assert np.array_equal(ds.values, ref.reshape(6, 84))
+
+        # a selection
+        r = ds.sel(param="t")
+        assert np.array_equal(r.to_numpy(), ref[[0, 3]])
+
+    with pytest.raises(ValueError):
+        ds.to_numpy(decode_backend="bad")
+
+
+def test_grib_decode_backend_data(processes):
+    ds = from_source("file", earthkit_examples_file("test.grib"))
+    ref = ds.data()
+
+    d = ds.data(decode_backend="process")
+    assert d.shape == ref.shape
+    assert np.array_equal(d, ref)
+
+    d = ds.data(keys="value", decode_backend="process")
+    assert np.array_equal(d, ref[2:])
+
+
+def test_grib_decode_backend_metadata(processes):
+    ds = from_source("file", earthkit_examples_file("tuv_pl.grib"))
+    ref = ds.metadata(["param", "level"])
+
+    assert ds.metadata(["param", "level"], decode_backend="process") == ref
+    assert ds.metadata("param", decode_backend="process") == ds.metadata("param")
+
+    with pytest.raises(KeyError):
+        ds.metadata("badkey", decode_backend="process")
+
+
+def test_grib_decode_backend_to_fieldlist(processes):
+    ds = from_source("file", earthkit_examples_file("test6.grib"))
+    r = ds.to_fieldlist("numpy", decode_backend="process")
+    assert len(r) == 6
+    assert np.array_equal(r.to_numpy(), ds.to_numpy())
+    assert r.metadata("param") == ds.metadata("param")
+
+
+def test_grib_decode_backend_fallback():
+    # fields in memory cannot be shipped to the workers
+    ds = from_source("file", earthkit_examples_file("test6.grib"))
+    r = ds.to_fieldlist("numpy")
+    with settings.temporary("decode-backend", "process"):
+        assert np.array_equal(r.to_numpy(), ds.to_numpy(decode_backend="thread"))
+
+    # the option is ignored by the fieldlists without a bulk decoder
+    columns = r.metadata(["param"], output="columns", decode_backend="process")
+    assert columns["param"].tolist() == ds.metadata("param")
+
+
+@pytest.mark.long_test
+def test_grib_decode_backend_benchmark():
+    with open(earthkit_test_data_file("ml_data.grib"), "rb") as f:
+        data = f.read()
+
+    with temp_file() as tmp:
+        with open(tmp, "wb") as f:
+            for _ in range(50):
+                f.write(data)
+
+        ds = from_source("file", tmp)
+        times = {}
+        values = {}
+        s = {
+            "number-of-decode-threads": 1,
+            "number-of-decode-processes": 4,
+            "handle-pool-size": 0,
+        }
+        with settings.temporary(s):
+            for backend in ("thread", "process"):
+                t0 = time.perf_counter()
+                values[backend] = ds.to_numpy(decode_backend=backend)
+                times[backend] = time.perf_counter() - t0
+
+        assert values["thread"].shape[0] == len(ds)
+        assert np.array_equal(values["process"], values["thread"])
+
+    if (os.cpu_count() or 1) < 4:
+        pytest.skip("the speed-up of the processes needs 4 CPUs")
+
+    # 4 processes decode faster than a single thread
+    assert 1.5 * times["process"] < times["thread"], times
+
+
+if __name__ == "__main__":
+    from earthkit.data.testing import main
+
+    main(__file__)
@@ -15,7 +15,10 @@ import sys
 import numpy as np
 import pytest
 
-from earthkit.data.utils import projections
+from earthkit.data import from_source, settings
+from earthkit.data.core.geography import geometry_cache
+from earthkit.data.testing import earthkit_examples_file, earthkit_test_data_file
+from earthkit.data.utils import message, projections
 
 here = os.path.dirname(__file__)
 sys.path.insert(0, here)
@@ -214,6 +217,148 @@ def test_grib_projection_mercator(mode):
     assert projection.globe == dict()
 
 
+@pytest.fixture
+def geo_cache():
+    geometry_cache.clear()
+    geometry_cache.reset_statistics()
+    yield geometry_cache
+    geometry_cache.clear()
+    geometry_cache.reset_statistics()
+
+
+def test_grib_geometry_cache_shared(geo_cache):
+    ds = from_source("file", earthkit_examples_file("tuv_pl.grib"))
+
+    lat = ds[0].to_latlon()["lat"]
+    s = geo_cache.statistics()
+    assert s["misses"] == 2
+    assert s["size"] == 2
+    assert s["memory"] == 2 * 84 * 8
+
+    # all the fields are on the same grid
+    for f in ds:
+        r = f.to_latlon()
+        assert np.shares_memory(r["lat"], lat)
+    assert geo_cache.statistics()["misses"] == 2
+    assert geo_cache.statistics()["hits"] == 2 * len(ds)
+
+    assert not lat.flags.writeable
+    with pytest.raises(ValueError):
+        lat[0, 0] = 0
+
+    # different dtypes are cached separately
+    lat32 = ds[0].to_latlon(dtype=np.float32)["lat"]
+    assert lat32.dtype == np.float32
+    assert np.allclose(lat32, lat)
+    assert geo_cache.statistics()["size"] == 4
+
+    r = ds.to_latlon()
+    assert np.array_equal(r["lat"], lat)
+
+
+def test_grib_geometry_cache_grids(geo_cache):
+    ds1 = from_source("file", earthkit_examples_file("test.grib"))
+    ds2 = from_source("file", earthkit_examples_file("tuv_pl.grib"))
+
+    lat1 = ds1[0].to_latlon()["lat"]
+    lat2 = ds2[0].to_latlon()["lat"]
+    assert lat1.shape != lat2.shape
+    assert geo_cache.statistics()["size"] == 4
+    assert np.array_equal(ds1[1].to_latlon()["lat"], lat1)
+
+
+def test_grib_geometry_cache_memory_limit(geo_cache):
+    ds1 = from_source("file", earthkit_examples_file("test.grib"))
+    ds2 = from_source("file", earthkit_examples_file("tuv_pl.grib"))
+
+    with settings.temporary("grid-geometry-cache-memory-limit", 2 * 84 * 8):
+        ds2[0].to_latlon()
+        assert geo_cache.statistics()["size"] == 2
+
+        # the arrays of test.grib are too large to be cached, they are
+        # read-only all the same
+        lat = ds1[0].to_latlon()["lat"]
+        assert not lat.flags.writeable
+        assert geo_cache.statistics()["size"] == 2
+
+        ds2[0].to_latlon(dtype=np.float32)
+        s = geo_cache.statistics()
+        assert s["size"] == 3
+        assert s["evictions"] == 1
+        assert s["memory"] == 84 * 8 + 2 * 84 * 4
+
+    geo_cache.clear()
+    with settings.temporary("grid-geometry-cache-memory-limit", 0):
+        ds2[0].to_latlon()
+        assert len(geo_cache) == 0
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        earthkit_examples_file("test.grib"),
+        earthkit_examples_file("tuv_pl.grib"),
+        earthkit_test_data_file("mercator.grib"),
+        earthkit_test_data_file("ml_data.grib"),
+    ],
+)
+def test_grib_grid_hash(path):
+    ds = from_source("file", path)
+    md5 = [f.handle.get("md5GridSection") for f in ds]
+    grid = [f.grid_hash for f in ds]
+    assert [f.handle.grid_hash() for f in ds] == grid
+    assert len(set(grid)) == len(set(md5))
+    assert len(set(zip(md5, grid))) == len(set(md5))
+
+
+def test_grib_grid_hash_earth_shape():
+    for path in (
+        earthkit_examples_file("test.grib"),
+        earthkit_test_data_file("mercator.grib"),
+    ):
+        h = from_source("file", path)[0].handle
+        c = h.clone()
+        c.set_long("shapeOfTheEarth", 6)
+        assert c.grid_hash() == h.grid_hash()
+
+        c = h.clone()
+        c.set_long("Nj", h.get("Nj") - 1)
+        assert c.grid_hash() != h.grid_hash()
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        earthkit_examples_file("tuv_pl.grib"),
+        earthkit_test_data_file("mercator.grib"),
+        earthkit_test_data_file("ml_data.grib"),
+    ],
+)
+def test_grib_md5_grid_section(path):
+    h = from_source("file", path)[0].handle
+    shape = h.get("shapeOfTheEarth")
+
+    # the reference is computed by ecCodes on a copy of the handle
+    c = h.clone()
+    c.set_long("shapeOfTheEarth", 255)
+    ref = c.get_string("md5GridSection")
+
+    assert h.get("md5GridSection") == ref
+    assert h.get("shapeOfTheEarth") == shape
+
+
+def test_grib_grid_hash_no_handle():
+    pool = message.handle_pool
+    pool.clear()
+    ds1 = from_source("file", earthkit_examples_file("test.grib"))
+    ds2 = from_source("file", earthkit_examples_file("test6.grib"))
+    ds = ds1 + ds2
+
+    assert not ds._is_shared_grid()
+    assert ds2._is_shared_grid()
+    assert len(pool) == 0
+
+
 if __name__ == "__main__":
     from earthkit.data.testing import main
 
@@ -16,7 +16,7 @@ import sys
 import numpy as np
 import pytest
 
-from earthkit.data import from_source
+from earthkit.data import from_source, settings
 from earthkit.data.testing import earthkit_examples_file
 
 here = os.path.dirname(__file__)
@@ -525,6 +525,89 @@ def test_message(mode):
     assert v[:4] == b"GRIB"
 
 
+@pytest.mark.parametrize("mode", ["file", "numpy_fs"])
+def test_grib_metadata_columns(mode):
+    ds = load_file_or_numpy_fs("tuv_pl.grib", mode)
+
+    r = ds.metadata(["param", "level", "valid_datetime"], output="columns")
+    assert list(r.keys()) == ["param", "level", "valid_datetime"]
+    assert r["param"].dtype == object
+    assert r["param"].tolist() == ds.metadata("param")
+    assert r["level"].dtype == np.int64
+    assert r["level"].tolist() == ds.metadata("level")
+    assert r["valid_datetime"].dtype == np.dtype("datetime64[us]")
+    assert r["valid_datetime"][0] == np.datetime64("2018-08-01T12:00")
+
+    # types and defaults
+    r = ds.metadata(
+        "level", "nonExistentKey", astype=(float, None), default=None, output="columns"
+    )
+    assert r["level"].dtype == np.float64
+    assert r["nonExistentKey"].dtype == np.float64
+    assert np.all(np.isnan(r["nonExistentKey"]))
+
+    # namespace
+    r = ds.metadata("levelist", namespace="mars", output="columns")
+    assert r["levelist"].tolist() == ds.metadata("level")
+
+    with pytest.raises(KeyError):
+        ds.metadata("nonExistentKey", output="columns")
+
+    with pytest.raises(ValueError):
+        ds.metadata(output="columns")
+
+    with pytest.raises(ValueError):
+        ds.metadata("level", output="rows")
+
+
+def test_grib_metadata_columns_pandas():
+    ds = from_source("file", earthkit_examples_file("test6.grib"))
+    df = ds.metadata(["param", "level"], output="pandas")
+    assert df.shape == (6, 2)
+    assert list(df.columns) == ["param", "level"]
+    assert df["level"].dtype == np.int64
+    assert df["param"].tolist() == ["t", "u", "v", "t", "u", "v"]
+
+
+def test_grib_metadata_columns_process():
+    ds = from_source("file", earthkit_examples_file("tuv_pl.grib"))
+    ref = ds.metadata(["param", "level"], output="columns")
+    r = ds.metadata(["param", "level"], output="columns", decode_backend="process")
+    assert r["param"].tolist() == ref["param"].tolist()
+    assert r["level"].tolist() == ref["level"].tolist()
+
+
+@pytest.mark.long_test
+def test_grib_metadata_columns_benchmark():
+    import time
+
+    from earthkit.data.core.temporary import temp_file
+    from earthkit.data.testing import earthkit_test_data_file
+
+    with open(earthkit_test_data_file("ml_data.grib"), "rb") as f:
+        data = f.read()
+
+    keys = ["param", "level", "date", "time", "step", "gridType"]
+    with temp_file() as tmp:
+        with open(tmp, "wb") as f:
+            for _ in range(100):
+                f.write(data)
+
+        ds = from_source("file", tmp)
+        with settings.temporary("handle-pool-size", 0):
+            t0 = time.perf_counter()
+            ref = ds.metadata(keys)
+            t1 = time.perf_counter()
+            r = ds.metadata(keys, output="columns")
+            t2 = time.perf_counter()
+
+        for i, k in enumerate(keys):
+            assert r[k].tolist() == [x[i] for x in ref]
+
+        # the columns are about 3 times faster than the list of tuples
+        assert 2 * (t2 - t1) < t1 - t0, (t1 - t0, t2 - t1)
+
+
 if __name__ == "__main__":
     from earthkit.data.testing import main
 
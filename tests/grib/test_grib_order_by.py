@@ -10,12 +10,17 @@
 #
 
 import datetime
+import functools
 import os
 import sys
+import time
 
 import pytest
 
 from earthkit.data import from_source
+from earthkit.data.core.index import Order
+from earthkit.data.core.order import build_remapping
+from earthkit.data.testing import earthkit_examples_file, earthkit_test_data_file
 
 here = os.path.dirname(__file__)
 sys.path.insert(0, here)
@@ -192,3 +197,95 @@ def test_grib_order_by_valid_datetime(mode):
     ]
 
     assert g.metadata("valid_datetime") == ref
+
+
+def _order_by_compare(ds, kwargs, remapping=None):
+    # the reference implementation comparing the fields one pair at a time
+    kwargs = ds._normalize_kwargs_names(**kwargs)
+    order = Order(kwargs, remapping=build_remapping(remapping))
+
+    def cmp(i, j):
+        return order.compare_elements(ds[i], ds[j])
+
+    return sorted(range(len(ds)), key=functools.cmp_to_key(cmp))
+
+
+@pytest.mark.parametrize(
+    "params,remapping",
+    [
+        (dict(param="descending", step="ascending"), None),
+        (dict(param=["v", "t", "u"], date="descending"), None),
+        (dict(param=_CustomOrder(), levelist="descending"), None),
+        (dict(param_level="descending"), {"param_level": "{param}{levelist}"}),
+        (
+            dict(param_level=["t1000", "u850"], param="descending"),
+            {"param_level": "{param}{levelist}"},
+        ),
+    ],
+)
+def test_grib_order_by_same_as_compare(params, remapping):
+    ds = from_source("file", earthkit_examples_file("test6.grib"))
+    ds += from_source("file", earthkit_examples_file("tuv_pl.grib"))
+    if remapping is not None and isinstance(params["param_level"], list):
+        ds = ds.sel(param_level=params["param_level"], remapping=remapping)
+
+    ref = _order_by_compare(ds, params, remapping=remapping)
+    r = ds.order_by(params, remapping=remapping)
+    assert [f.metadata("param") for f in r] == [ds[i].metadata("param") for i in ref]
+    assert r.metadata(["param", "levelist"], default=None) == [
+        ds[i].metadata(["param", "levelist"], default=None) for i in ref
+    ]
+
+
+def test_grib_order_by_not_comparable():
+    ds = from_source("file", earthkit_examples_file("test.grib"))
+    ds += from_source("file", earthkit_examples_file("test6.grib"))
+
+    # levelist is None for the surface fields
+    with pytest.raises(TypeError):
+        ds.order_by("levelist")
+
+
+def test_grib_order_by_metadata_extracted_once(monkeypatch):
+    from earthkit.data.core.fieldlist import Field
+
+    ds = from_source("file", earthkit_examples_file("tuv_pl.grib"))
+
+    calls = []
+    ori = Field._metadata_row
+
+    def _row(self, *args, **kwargs):
+        calls.append(1)
+        return ori(self, *args, **kwargs)
+
+    monkeypatch.setattr(Field, "_metadata_row", _row)
+
+    r = ds.order_by(levelist="ascending", param=["v", "t", "u"])
+    assert r.metadata("param")[:3] == ["v", "t", "u"]
+    assert r.metadata("levelist")[:3] == [300, 300, 300]
+    n = len(calls)
+    assert n == len(ds)
+
+    # the columns are reused by the next ordering
+    ds.order_by(param="descending", levelist="descending")
+    assert len(calls) == n
+
+
+@pytest.mark.long_test
+def test_grib_order_by_benchmark():
+    ds = from_source("file", earthkit_test_data_file("ml_data.grib"))
+    ds = ds.from_multi(list(range(len(ds))) * 10)
+    params = dict(param="descending", levelist="ascending", step="ascending")
+
+    t0 = time.perf_counter()
+    ref = _order_by_compare(ds, params)
+    t_ref = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    r = ds.order_by(params)
+    t = time.perf_counter() - t0
+    assert r._indices == ref
+
+    # the metadata is extracted once instead of for each comparison,
+    # which makes the ordering about 5 times faster
+    assert 2 * t < t_ref, (t_ref, t)
@@ -13,14 +13,16 @@
 import os
 import sys
 import tempfile
+import time
 
 import numpy as np
 import pytest
 
 import earthkit.data
-from earthkit.data import from_source
-from earthkit.data.core.temporary import temp_file
-from earthkit.data.testing import earthkit_examples_file
+from earthkit.data import from_source, settings
+from earthkit.data.core.temporary import temp_directory, temp_file
+from earthkit.data.readers.grib import simple_packing
+from earthkit.data.testing import earthkit_examples_file, earthkit_test_data_file
 
 EPSILON = 1e-4
 
@@ -34,6 +36,119 @@ def test_grib_save_when_loaded_from_file():
         assert len(fs) == len(fs_saved)
 
 
+def _messages(ds):
+    return b"".join(f.message() for f in ds)
+
+
+@pytest.fixture
+def write_calls(monkeypatch):
+    from earthkit.data.readers.grib.codes import GribField
+
+    calls = []
+    write = GribField.write
+
+    def _write(self, f):
+        calls.append(type(self).__name__)
+        return write(self, f)
+
+    monkeypatch.setattr(GribField, "write", _write)
+    return calls
+
+
+@pytest.mark.parametrize(
+    "subset",
+    [{}, {"param": "t"}, {"level": 850}, {"param": ["v", "u"], "level": 1000}],
+)
+def test_grib_save_raw_bytes(write_calls, subset):
+    ds = from_source("file", earthkit_examples_file("test6.grib"))
+    ds = ds.sel(**subset) if subset else ds
+    ref = _messages(ds)
+    with temp_file() as tmp:
+        ds.save(tmp)
+        with open(tmp, "rb") as f:
+            assert f.read() == ref
+
+        # append
+        ds.save(tmp, append=True)
+        with open(tmp, "rb") as f:
+            assert f.read() == ref + ref
+
+    # no handles are used to write the fields
+    assert write_calls == []
+
+
+def test_grib_save_raw_bytes_mixed(write_calls):
+    ds1 = from_source("file", earthkit_examples_file("test6.grib"))
+    with open(earthkit_examples_file("test.grib"), "rb") as f:
+        ds2 = from_source("memory", f.read()).sel(param=["2t", "msl"])
+    ds = ds1[4:] + ds2 + ds1[:2] + ds1.order_by(level="ascending")
+
+    ref = _messages(ds)
+    with temp_file() as tmp:
+        with open(tmp, "wb") as f:
+            f.write(b"abc")
+            ds.write(f)
+            assert f.tell() == len(ref) + 3
+            f.write(b"def")
+        with open(tmp, "rb") as f:
+            assert f.read() == b"abc" + ref + b"def"
+
+    assert write_calls == ["GribFieldInMemory"] * len(ds2)
+
+
+@pytest.mark.parametrize("kernel_copy", [True, False])
+def test_grib_save_raw_bytes_buffered(monkeypatch, kernel_copy):
+    import io
+
+    from earthkit.data.utils import parts
+
+    if not kernel_copy:
+        monkeypatch.setattr(parts, "_kernel_copy_methods", lambda: [])
+    monkeypatch.setattr(parts, "COPY_BUFFER_SIZE", 1000)
+
+    ds = from_source("file", earthkit_examples_file("test6.grib"))[::2]
+    ref = _messages(ds)
+
+    f = io.BytesIO()
+    ds.write(f)
+    assert f.getvalue() == ref
+
+    with temp_file() as tmp:
+        ds.save(tmp)
+        with open(tmp, "rb") as f:
+            assert f.read() == ref
+
+
+def test_grib_save_merge_parts():
+    from earthkit.data.utils.parts import merge_parts
+
+    parts = [("a", 0, 10), ("a", 10, 5), ("b", 15, 5), ("a", 15, 5), ("a", 30, 2)]
+    assert merge_parts(parts) == [
+        ("a", 0, 15),
+        ("b", 15, 5),
+        ("a", 15, 5),
+        ("a", 30, 2),
+    ]
+    assert merge_parts([]) == []
+
+
+def test_grib_save_raw_bytes_truncated():
+    with temp_directory() as tmp:
+        path = os.path.join(tmp, "a.grib")
+        with open(earthkit_examples_file("test6.grib"), "rb") as f:
+            data = f.read()
+        with open(path, "wb") as f:
+            f.write(data)
+
+        ds = from_source("file", path)
+        assert len(ds) == 6
+        with open(path, "wb") as f:
+            f.write(data[: ds[-1]._offset + ds[-1]._length - 10])
+
+        with pytest.raises(ValueError):
+            ds.save(os.path.join(tmp, "b.grib"))
+
+
 @pytest.mark.skipif(
     sys.version_info < (3, 10),
     reason="ignore_cleanup_errors requires Python 3.10 or later",
@@ -189,6 +304,499 @@ def test_grib_output_tp():
         assert np.allclose(ds[0].to_numpy(), data, rtol=EPSILON, atol=EPSILON)
 
 
+def _write(path, data, encoder, output_kwargs={}, **kwargs):
+    with settings.temporary("use-numpy-grib-encoder", encoder == "numpy"):
+        f = earthkit.data.new_grib_output(path, date=20010101, **output_kwargs)
+        f.write(data, **kwargs)
+        f.close()
+    return from_source("file", path)[0]
+
+
+@pytest.fixture
+def encode_calls(monkeypatch):
+    calls = []
+    encode_message = simple_packing.encode_message
+
+    def _encode_message(*args, **kwargs):
+        calls.append(1)
+        return encode_message(*args, **kwargs)
+
+    monkeypatch.setattr(simple_packing, "encode_message", _encode_message)
+    return calls
+
+
+@pytest.mark.parametrize("shape", [(181, 360), (40320,), (108160,)])
+@pytest.mark.parametrize("kwargs", [{}, {"param": "t", "level": 850, "step": 6}])
+def test_grib_output_numpy_encoder(encode_calls, shape, kwargs):
+    data = np.random.default_rng(0).uniform(200, 320, shape)
+    kwargs = {"param": "2t", **kwargs}
+    keys = ["param", "level", "step", "gridType", "numberOfDataPoints"]
+    keys += ["bitsPerValue", "decimalScaleFactor", "referenceValue"]
+
+    with temp_directory() as tmp:
+        ref = _write(os.path.join(tmp, "a.grib"), data, "eccodes", **kwargs)
+        assert encode_calls == []
+        f = _write(os.path.join(tmp, "b.grib"), data, "numpy", **kwargs)
+        assert encode_calls == [1]
+
+        assert f.metadata(keys) == ref.metadata(keys)
+        assert f.shape == ref.shape
+        assert f._length == ref._length
+        assert np.allclose(f.to_numpy(), data, rtol=EPSILON, atol=EPSILON)
+        assert np.allclose(f.to_numpy(), ref.to_numpy(), rtol=EPSILON, atol=EPSILON)
+
+
+def test_grib_output_numpy_encoder_missing(encode_calls):
+    data = np.random.default_rng(0).uniform(200, 320, (181, 360))
+    data[10:20, 50:90] = np.nan
+
+    with temp_directory() as tmp:
+        ref = _write(
+            os.path.join(tmp, "a.grib"), data, "eccodes", param="2t", check_nans=True
+        )
+        f = _write(
+            os.path.join(tmp, "b.grib"), data, "numpy", param="2t", check_nans=True
+        )
+        assert encode_calls == [1]
+        assert f.metadata("bitmapPresent") == 1
+        v = f.to_numpy()
+        assert np.array_equal(np.isnan(v), np.isnan(data))
+        assert np.allclose(v, data, equal_nan=True, rtol=EPSILON, atol=EPSILON)
+        assert np.array_equal(np.isnan(v), np.isnan(ref.to_numpy()))
+
+        # without check_nans the values are passed to ecCodes
+        encode_calls.clear()
+        _write(os.path.join(tmp, "c.grib"), data, "numpy", param="2t")
+        assert encode_calls == []
+
+
+def test_grib_output_numpy_encoder_constant():
+    data = np.full((181, 360), 273.15)
+    with temp_file() as tmp:
+        f = _write(tmp, data, "numpy", param="2t")
+        assert f.metadata("bitsPerValue") == 0
+        assert np.allclose(f.to_numpy(), data)
+
+
+@pytest.mark.parametrize("precision", [None, 0.01])
+def test_grib_output_numpy_encoder_all_missing(encode_calls, precision):
+    data = np.full((181, 360), np.nan)
+    with temp_file() as tmp:
+        f = _write(tmp, data, "numpy", param="2t", check_nans=True, precision=precision)
+        # the field is encoded by ecCodes
+        assert encode_calls == [1]
+        assert f.metadata("bitmapPresent") == 1
+        assert np.isnan(f.to_numpy()).all()
+
+
+def test_grib_output_numpy_encoder_template(encode_calls):
+    ds = from_source("file", earthkit_test_data_file("test_icon.grib"))
+    data = ds[0].to_numpy() + 1
+
+    with temp_file() as tmp:
+        with settings.temporary("use-numpy-grib-encoder", True):
+            f = earthkit.data.new_grib_output(tmp, template=ds[0])
+            f.write(data, step=12, bitsPerValue=24)
+            f.close()
+
+        assert encode_calls == [1]
+        r = from_source("file", tmp)[0]
+        assert r.metadata("step") == 12
+        assert r.metadata("bitsPerValue") == 24
+        assert r.metadata("param") == ds[0].metadata("param")
+        assert np.allclose(r.to_numpy(), data, rtol=1e-5)
+
+
+def test_grib_output_numpy_encoder_fallback(encode_calls):
+    data = np.random.default_rng(0).uniform(200, 320, (181, 360))
+    with temp_file() as tmp:
+        f = _write(tmp, data, "numpy", param="tp", step=48, edition=1)
+        assert encode_calls == []
+        assert f.metadata("edition") == 1
+        assert np.allclose(f.to_numpy(), data, rtol=EPSILON, atol=EPSILON)
+
+
+@pytest.mark.parametrize("encoder", ["eccodes", "numpy"])
+@pytest.mark.parametrize("precision", [0.5, 0.01])
+def test_grib_output_precision(encoder, precision):
+    data = np.random.default_rng(0).uniform(200, 320, (181, 360))
+    with temp_directory() as tmp:
+        f = _write(os.path.join(tmp, "a.grib"), data, encoder, param="2t")
+        assert f.metadata("bitsPerValue") == 16
+
+        f = _write(
+            os.path.join(tmp, "b.grib"),
+            data,
+            encoder,
+            param="2t",
+            precision=precision,
+        )
+        bits = f.metadata("bitsPerValue")
+        assert bits < 16
+        assert np.abs(f.to_numpy() - data).max() <= precision
+
+        f = _write(
+            os.path.join(tmp, "c.grib"),
+            data,
+            encoder,
+            output_kwargs=dict(precision=precision),
+            param="2t",
+        )
+        assert f.metadata("bitsPerValue") == bits
+
+
+@pytest.mark.parametrize("encoder", ["eccodes", "numpy"])
+@pytest.mark.parametrize("edition", [1, 2])
+@pytest.mark.parametrize("precision", [0.0002, 0.006])
+@pytest.mark.parametrize("offset", [-1, 0, 1])
+def test_grib_output_precision_power_of_two(encoder, edition, precision, offset):
+    # a range of 2 * precision * 2**k needs k + 1 bits, or more when the minimum
+    # is not representable as a reference value (e.g. IBM floats in GRIB1)
+    v_min = -82333.64468694762
+    value_range = 2 * precision * 2**4 * (1 + offset * 1e-9)
+    data = np.random.default_rng(0).uniform(v_min, v_min + value_range, (181, 360))
+    data.flat[:2] = v_min, v_min + value_range
+    with temp_file() as tmp:
+        f = _write(tmp, data, encoder, param="2t", edition=edition, precision=precision)
+        assert np.abs(f.to_numpy() - data).max() <= precision
+
+
+def test_grib_output_precision_decimal_scale_factor():
+    data = np.random.default_rng(0).uniform(200, 320, (181, 360))
+    with temp_file() as tmp:
+        f = _write(tmp, data, "numpy", param="2t", decimalScaleFactor=-1, precision=0.5)
+        assert np.abs(f.to_numpy() - data).max() <= 0.5
+
+        # ecCodes ignores bitsPerValue with a non-zero decimalScaleFactor
+        with pytest.raises(ValueError, match="decimalScaleFactor"):
+            _write(
+                tmp, data, "eccodes", param="2t", decimalScaleFactor=-1, precision=0.5
+            )
+
+
+@pytest.mark.long_test
+def test_grib_output_numpy_encoder_benchmark():
+    rng = np.random.default_rng(0)
+    data = [rng.uniform(200, 320, (721, 1440)) for _ in range(10)]
+
+    times = {}
+    with temp_directory() as tmp:
+        for encoder in ("eccodes", "numpy"):
+            path = os.path.join(tmp, f"{encoder}.grib")
+            with settings.temporary("use-numpy-grib-encoder", encoder == "numpy"):
+                t0 = time.perf_counter()
+                f = earthkit.data.new_grib_output(path, date=20010101)
+                for i, v in enumerate(data):
+                    f.write(v, param="2t", step=i)
+                f.close()
+                times[encoder] = time.perf_counter() - t0
+
+        ref = from_source("file", os.path.join(tmp, "eccodes.grib"))
+        ds = from_source("file", os.path.join(tmp, "numpy.grib"))
+        assert len(ds) == len(ref)
+        assert np.allclose(ds.to_numpy(), ref.to_numpy(), atol=EPSILON * 100)
+
+    # the NumPy encoder is about 5 times faster than ecCodes
+    assert 2 * times["numpy"] < times["eccodes"], times
+
+
+def test_grib_output_template_cache(monkeypatch):
+    from earthkit.data.readers.grib.codes import GribCodesHandle
+
+    samples = []
+    from_sample = GribCodesHandle.from_sample.__func__
+
+    def _from_sample(cls, name):
+        samples.append(name)
+        return from_sample(cls, name)
+
+    monkeypatch.setattr(GribCodesHandle, "from_sample", classmethod(_from_sample))
+
+    with temp_file() as tmp:
+        f = earthkit.data.new_grib_output(tmp, date=20010101)
+        for step in (0, 6, 12):
+            f.write(np.random.random((181, 360)), param="2t", step=step)
+        f.write(np.random.random((181, 360)), param="t", level=850)
+        f.write(np.random.random((91, 180)), param="2t")
+        f.write(np.random.random((91, 180)), param="2t", bitsPerValue=12)
+        f.close()
+
+        assert samples == [
+            "regular_ll_sfc_grib2",
+            "regular_ll_pl_grib2",
+            "regular_ll_sfc_grib2",
+            "regular_ll_sfc_grib2",
+        ]
+
+        ds = from_source("file", tmp)
+        assert ds.metadata("step") == [0, 6, 12, 0, 0, 0]
+        assert [f.metadata("levelist", default=None) for f in ds] == [
+            None,
+            None,
+            None,
+            850,
+            None,
+            None,
+        ]
+        assert ds.metadata("Ni") == [360] * 4 + [180] * 2
+        assert ds.metadata("bitsPerValue") == [16] * 5 + [12]
+
+
+def test_grib_output_template_cache_size(monkeypatch):
+    from earthkit.data.readers.grib.output import GribOutput
+
+    monkeypatch.setattr(GribOutput, "TEMPLATE_CACHE_SIZE", 2)
+    with temp_file() as tmp:
+        f = earthkit.data.new_grib_output(tmp, date=20010101)
+        for shape in ((181, 360), (91, 180), (181, 360)):
+            f.write(np.random.random(shape), param="2t")
+        templates = f._templates.cache
+        assert len(templates) == 2
+        f.close()
+
+        ds = from_source("file", tmp)
+        assert ds.metadata("Ni") == [360, 180, 360]
+
+
+def test_grib_output_template_cache_threads():
+    from concurrent.futures import ThreadPoolExecutor
+
+    with temp_file() as tmp:
+        f = earthkit.data.new_grib_output(tmp, date=20010101)
+        t = f._cached_template("key", object)
+        assert f._cached_template("key", object) is t
+
+        # the templates are not shared between threads
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            other = executor.submit(f._cached_template, "key", object).result()
+        assert other is not t
+        f.close()
+
+
+def test_grib_output_set_multiple(monkeypatch):
+    from earthkit.data.readers.grib.codes import GribCodesHandle
+
+    calls = []
+    monkeypatch.setattr(
+        GribCodesHandle, "set", lambda self, k, v: calls.append(k), raising=True
+    )
+
+    with temp_file() as tmp:
+        f = earthkit.data.new_grib_output(tmp, date=20010101)
+        f.write(np.random.random((181, 360)), param="2t", type="fc", step=24)
+        f.close()
+
+        # only the values which cannot be passed to set_multiple are set one by one
+        assert calls == []
+        ds = from_source("file", tmp)
+        assert ds[0].metadata(["param", "type", "step"]) == ["2t", "fc", 24]
+
+        f = earthkit.data.new_grib_output(tmp, date=20010101)
+        f.write(np.random.random((40320,)), param="2t")
+        f.close()
+        assert calls == ["pl"]
+
+
+@pytest.mark.parametrize("encoder", ["eccodes", "numpy"])
+@pytest.mark.parametrize("nthreads", [1, 4])
+def test_grib_output_write_many(encoder, nthreads):
+    rng = np.random.default_rng(0)
+    data = rng.uniform(200, 320, (12, 91, 180))
+    metadata = [dict(number=i % 3, step=6 * (i // 3)) for i in range(len(data))]
+    kwargs = {"param": "2t", "class": "od", "type": "pf", "stream": "enfo"}
+
+    with temp_directory() as tmp:
+        ref_path = os.path.join(tmp, "ref.grib")
+        path = os.path.join(tmp, "a.grib")
+        with settings.temporary(
+            {
+                "use-numpy-grib-encoder": encoder == "numpy",
+                "number-of-encode-threads": nthreads,
+            }
+        ):
+            f = earthkit.data.new_grib_output(ref_path, date=20010101)
+            for v, md in zip(data, metadata):
+                f.write(v, metadata=md, **kwargs)
+            f.close()
+
+            f = earthkit.data.new_grib_output(path, date=20010101)
+            f.write_many(data, metadata, **kwargs)
+            f.close()
+
+        with open(ref_path, "rb") as f1, open(path, "rb") as f2:
+            assert f1.read() == f2.read()
+
+        ds = from_source("file", path)
+        assert ds.metadata("number") == [md["number"] for md in metadata]
+        assert ds.metadata("step") == [md["step"] for md in metadata]
+        assert np.allclose(ds.to_numpy(), data, rtol=EPSILON, atol=EPSILON)
+
+
+def test_grib_output_write_many_bad():
+    with temp_file() as tmp:
+        f = earthkit.data.new_grib_output(tmp, date=20010101)
+        with pytest.raises(ValueError):
+            f.write_many(np.zeros((2, 91, 180)), [dict(param="2t")])
+
+        # errors in the workers are raised
+        with settings.temporary("number-of-encode-threads", 2):
+            with pytest.raises(ValueError):
+                f.write_many(np.zeros((2, 2, 91, 180)), [dict(param="2t")] * 2)
+        f.close()
+
+
+@pytest.mark.long_test
+def test_grib_output_write_many_benchmark():
+    rng = np.random.default_rng(0)
+    data = rng.uniform(200, 320, (50, 40320)).astype(np.float32)
+    kwargs = {"param": "2t", "class": "od", "type": "pf", "stream": "enfo"}
+    steps = range(0, 120, 6)
+
+    times = {}
+    with temp_directory() as tmp:
+        for name, nthreads in (("write", 1), ("write_many", 1), ("write_many", 4)):
+            path = os.path.join(tmp, f"{name}_{nthreads}.grib")
+            with settings.temporary("number-of-encode-threads", nthreads):
+                t0 = time.perf_counter()
+                f = earthkit.data.new_grib_output(path, date=20010101)
+                for step in steps:
+                    md = [dict(number=i, step=step) for i in range(len(data))]
+                    if name == "write":
+                        for v, m in zip(data, md):
+                            f.write(v, metadata=m, **kwargs)
+                    else:
+                        f.write_many(data, md, **kwargs)
+                f.close()
+                times[(name, nthreads)] = time.perf_counter() - t0
+
+        # the fields are written in the same order by all the methods
+        with open(os.path.join(tmp, "write_1.grib"), "rb") as f:
+            ref = f.read()
+        for name in ("write_many_1.grib", "write_many_4.grib"):
+            with open(os.path.join(tmp, name), "rb") as f:
+                assert f.read() == ref
+
+    if (os.cpu_count() or 1) < 4:
+        pytest.skip("the speed-up of the threads needs 4 CPUs")
+
+    # the fields are encoded concurrently
+    assert 1.5 * times[("write_many", 4)] < times[("write_many", 1)], times
+
+
+def _split_write(tmp, steps, params=("2t", "msl")):
+    data = np.random.default_rng(0).uniform(200, 320, (91, 180))
+    f = earthkit.data.new_grib_output(
+        os.path.join(tmp, "{shortName}_{step}.grib"), split_output=True, date=20010101
+    )
+    for step in steps:
+        for param in params:
+            f.write(data + step, param=param, step=step)
+    return f, data
+
+
+@pytest.mark.parametrize("background", [False, True])
+def test_grib_output_split_file_pool(background):
+    steps = [0, 6, 12, 18, 0, 12, 6, 18, 0]
+    with temp_directory() as tmp:
+        # the file is truncated when first opened
+        with open(os.path.join(tmp, "2t_0.grib"), "wb") as f:
+            f.write(b"garbage")
+
+        with settings.temporary(
+            {
+                "grib-output-file-pool-size": 3,
+                "grib-output-background-writer": background,
+            }
+        ):
+            f, data = _split_write(tmp, steps)
+            if not background:
+                assert len(f._files) <= 3
+            f.close()
+
+        assert len(f._files) == 0
+        assert sorted(os.listdir(tmp)) == sorted(
+            f"{p}_{s}.grib" for p in ("2t", "msl") for s in (0, 6, 12, 18)
+        )
+        for step in (0, 6, 12, 18):
+            for param in ("2t", "msl"):
+                ds = from_source("file", os.path.join(tmp, f"{param}_{step}.grib"))
+                assert len(ds) == steps.count(step)
+                assert ds.metadata("shortName") == [param] * len(ds)
+                assert ds.metadata("step") == [step] * len(ds)
+                assert np.allclose(ds.to_numpy(), data + step, rtol=EPSILON)
+
+
+def test_grib_output_file_pool_lru():
+    from earthkit.data.readers.grib.output import OutputFiles
+
+    with temp_directory() as tmp:
+        files = OutputFiles(size=2, buffer_size=1024)
+        paths = [os.path.join(tmp, f"{i}.bin") for i in range(3)]
+        files.write(paths[0], b"a")
+        files.write(paths[1], b"b")
+        # a hit makes the file the most recently used one
+        files.write(paths[0], b"c")
+        files.write(paths[2], b"d")
+        assert len(files) == 2
+        assert paths[1] not in files
+        assert paths[0] in files
+
+        files.write(paths[1], b"e")
+        files.close()
+        assert len(files) == 0
+
+        for p, ref in zip(paths, (b"ac", b"be", b"d")):
+            with open(p, "rb") as f:
+                assert f.read() == ref
+
+
+def test_grib_output_background_writer_error():
+    with temp_directory() as tmp:
+        path = os.path.join(tmp, "missing", "a.grib")
+        with settings.temporary("grib-output-background-writer", True):
+            f = earthkit.data.new_grib_output(path, date=20010101)
+            f.write(np.random.random((91, 180)), param="2t")
+            with pytest.raises(FileNotFoundError):
+                f.close()
+
+
+@pytest.mark.parametrize("background", [False, True])
+def test_grib_output_not_closed(background):
+    import gc
+
+    with temp_directory() as tmp:
+        with settings.temporary("grib-output-background-writer", background):
+            path = os.path.join(tmp, "a.grib")
+            f = earthkit.data.new_grib_output(path, date=20010101)
+            for step in range(0, 24, 6):
+                f.write(np.random.random((91, 180)), param="2t", step=step)
+
+            # the pending messages are written when the output is deleted
+            del f
+            gc.collect()
+            assert from_source("file", path).metadata("step") == [0, 6, 12, 18]
+
+
+@pytest.mark.parametrize("background", [False, True])
+def test_grib_output_f(background):
+    data = np.random.random((91, 180))
+    with temp_directory() as tmp:
+        with settings.temporary("grib-output-background-writer", background):
+            path = os.path.join(tmp, "a.grib")
+            f = earthkit.data.new_grib_output(path, date=20010101)
+            handle, _ = f.write(data, param="2t", step=0)
+
+            # the messages written to f() are in order with the fields
+            out, p = f.f(handle)
+            assert p == path
+            handle.set_long("step", 6)
+            handle.write(out)
+            f.write(data, param="2t", step=12)
+            f.close()
+
+        assert from_source("file", path).metadata("step") == [0, 6, 12]
+
+
 if __name__ == "__main__":
     from earthkit.data.testing import main
 
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+
+# (C) Copyright 2020 ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+#
+
+import json
+import logging
+import os
+import shutil
+import time
+
+import numpy as np
+import pytest
+
+from earthkit.data import from_source, settings
+from earthkit.data.core.caching import auxiliary_cache_file
+from earthkit.data.core.temporary import temp_directory, temp_file
+from earthkit.data.readers.grib.codes import (
+    GribCodesMessagePositionIndex,
+    GribCodesReader,
+)
+from earthkit.data.testing import earthkit_examples_file, earthkit_test_data_file
+from earthkit.data.utils.message import handle_pool
+
+LOG = logging.getLogger(__name__)
+
+
+def _legacy_scan(path):
+    index = GribCodesMessagePositionIndex.__new__(GribCodesMessagePositionIndex)
+    r = list(index._get_message_positions(path))
+    return [x[0] for x in r], [x[1] for x in r]
+
+
+def _scan(path):
+    index = GribCodesMessagePositionIndex.__new__(GribCodesMessagePositionIndex)
+    return index._scan(path)
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        earthkit_examples_file("test.grib"),
+        earthkit_examples_file("test6.grib"),
+        earthkit_examples_file("tuv_pl.grib"),
+        earthkit_test_data_file("test_single.grib"),
+        earthkit_test_data_file("ml_data.grib"),
+        earthkit_test_data_file("t_time_series.grib"),
+    ],
+)
+def test_grib_positions_scan(path):
+    offsets, lengths = _scan(path)
+    ref_offsets, ref_lengths = _legacy_scan(path)
+
+    assert offsets.dtype == np.int64
+    assert lengths.dtype == np.int64
+    assert offsets.tolist() == ref_offsets
+    assert lengths.tolist() == ref_lengths
+
+
+def test_grib_positions_scan_garbage():
+    with open(earthkit_examples_file("test6.grib"), "rb") as f:
+        data = f.read()
+
+    _, ref_lengths = _scan(earthkit_examples_file("test6.grib"))
+
+    with temp_file() as tmp:
+        # garbage, including a fake marker, before, between and after the messages
+        with open(tmp, "wb") as f:
+            f.write(b"xxGRIBxxxxxxxxxxxxxxxxxxxx")
+            f.write(data)
+            f.write(b"yyyyyy")
+            f.write(data)
+            f.write(b"GRI")
+
+        offsets, lengths = _scan(tmp)
+        assert len(offsets) == 12
+        assert lengths.tolist() == ref_lengths.tolist() * 2
+        assert offsets[0] == 26
+        assert offsets[6] == 26 + len(data) + 6
+
+
+def test_grib_positions_scan_empty():
+    with temp_file() as tmp:
+        with open(tmp, "wb"):
+            pass
+        offsets, lengths = _scan(tmp)
+        assert len(offsets) == 0
+        assert len(lengths) == 0
+
+
+@pytest.mark.cache
+def test_grib_positions_binary_cache():
+    s = {"cache-policy": "temporary", "use-message-position-index-cache": True}
+    with settings.temporary(s):
+        with temp_directory() as tmp_dir:
+            path = os.path.join(tmp_dir, "test.grib")
+            shutil.copyfile(earthkit_examples_file("tuv_pl.grib"), path)
+
+            r1 = GribCodesMessagePositionIndex(path)
+            assert len(r1) == 18
+            assert os.path.getsize(r1._cache_file) > 0
+
+            r2 = GribCodesMessagePositionIndex(path)
+            assert r2._cache_file == r1._cache_file
+            assert isinstance(r2.offsets, np.memmap)
+            assert r2.offsets.tolist() == r1.offsets.tolist()
+            assert r2.lengths.tolist() == r1.lengths.tolist()
+
+            # the grid identities are only stored once computed
+            assert not r1.has_grid_hashes
+            assert not r2.has_grid_hashes
+            hashes = r1.grid_hashes.tolist()
+            r2 = GribCodesMessagePositionIndex(path)
+            assert r2.has_grid_hashes
+            assert isinstance(r2.grid_hashes, np.memmap)
+            assert r2.grid_hashes.tolist() == hashes
+            assert len(set(hashes)) == 1
+
+            # modifying the file invalidates the cache
+            with open(path, "ab") as f:
+                with open(earthkit_examples_file("test.grib"), "rb") as g:
+                    f.write(g.read())
+
+            r3 = GribCodesMessagePositionIndex(path)
+            assert r3._cache_file != r1._cache_file
+            assert len(r3) == 20
+
+
+@pytest.mark.cache
+def test_grib_positions_json_cache():
+    s = {"cache-policy": "temporary", "use-message-position-index-cache": True}
+    with settings.temporary(s):
+        with temp_directory() as tmp_dir:
+            path = os.path.join(tmp_dir, "test.grib")
+            shutil.copyfile(earthkit_examples_file("test6.grib"), path)
+
+            # cache written by an earlier version
+            json_file = auxiliary_cache_file(
+                "message-index", path, content="null", extension=".json"
+            )
+            with open(json_file, "w") as f:
+                json.dump(dict(version=1, offsets=[0, 5], lengths=[5, 7]), f)
+
+            r = GribCodesMessagePositionIndex(path)
+            assert r.offsets.tolist() == [0, 5]
+            assert r.lengths.tolist() == [5, 7]
+
+            # converted into the binary format
+            r = GribCodesMessagePositionIndex(path)
+            assert isinstance(r.offsets, np.memmap)
+            assert r.offsets.tolist() == [0, 5]
+
+
+def test_grib_positions_grid_hashes():
+    path = earthkit_examples_file("test.grib")
+    r = GribCodesMessagePositionIndex(path)
+    assert r.grid_hashes.dtype == np.int64
+    ds = from_source("file", path)
+    assert r.grid_hashes.tolist() == [f.grid_hash for f in ds]
+
+
+@pytest.mark.cache
+def test_grib_positions_cache_grid_hashes():
+    s = {"cache-policy": "temporary", "use-message-position-index-cache": True}
+    with settings.temporary(s):
+        with temp_directory() as tmp_dir:
+            path = os.path.join(tmp_dir, "test.grib")
+            shutil.copyfile(earthkit_examples_file("test6.grib"), path)
+
+            ref = from_source("file", path)[0].grid_hash
+            GribCodesMessagePositionIndex(path).grid_hashes
+
+            # the fields take the grid identity from the cache file
+            ds = from_source("file", path)
+            assert ds[0]._grid_hash == ref
+            assert ds[0].grid_hash == ref
+
+
+def _append(path, src):
+    with open(path, "ab") as f:
+        with open(src, "rb") as g:
+            f.write(g.read())
+
+
+@pytest.fixture
+def scan_starts(monkeypatch):
+    starts = []
+    scan = GribCodesMessagePositionIndex._scan
+
+    def _scan(self, path, start=0):
+        starts.append(start)
+        return scan(self, path, start=start)
+
+    monkeypatch.setattr(GribCodesMessagePositionIndex, "_scan", _scan)
+    return starts
+
+
+@pytest.mark.cache
+def test_grib_positions_cache_appended(scan_starts):
+    s = {"cache-policy": "temporary", "use-message-position-index-cache": True}
+    with settings.temporary(s):
+        with temp_directory() as tmp_dir:
+            path = os.path.join(tmp_dir, "test.grib")
+            shutil.copyfile(earthkit_examples_file("tuv_pl.grib"), path)
+
+            r1 = GribCodesMessagePositionIndex(path)
+            assert len(r1) == 18
+            r1.grid_hashes
+            end = int(r1.offsets[-1] + r1.lengths[-1])
+
+            _append(path, earthkit_examples_file("test.grib"))
+            scan_starts.clear()
+
+            # only the appended bytes are scanned
+            r2 = GribCodesMessagePositionIndex(path)
+            assert scan_starts == [end]
+            assert r2._cache_file != r1._cache_file
+            assert len(r2) == 20
+            offsets, lengths = _scan(path)
+            assert r2.offsets.tolist() == offsets.tolist()
+            assert r2.lengths.tolist() == lengths.tolist()
+            assert r2.grid_hashes.tolist() == [
+                f.grid_hash for f in from_source("file", path)
+            ]
+
+            # stored in the cache
+            scan_starts.clear()
+            r3 = GribCodesMessagePositionIndex(path)
+            assert scan_starts == []
+            assert r3.offsets.tolist() == offsets.tolist()
+            assert r3.grid_hashes.tolist() == r2.grid_hashes.tolist()
+
+            # the file is rewritten
+            shutil.copyfile(earthkit_examples_file("test6.grib"), path)
+            scan_starts.clear()
+            r4 = GribCodesMessagePositionIndex(path)
+            assert scan_starts == [0]
+            assert len(r4) == 6
+
+
+def test_grib_positions_refresh(scan_starts):
+    with temp_directory() as tmp_dir:
+        path = os.path.join(tmp_dir, "test.grib")
+        shutil.copyfile(earthkit_examples_file("test.grib"), path)
+
+        r = GribCodesMessagePositionIndex(path)
+        assert len(r) == 2
+        assert not r.refresh()
+
+        end = int(r.offsets[-1] + r.lengths[-1])
+        _append(path, earthkit_examples_file("test6.grib"))
+        scan_starts.clear()
+        assert r.refresh()
+        assert scan_starts == [end]
+        assert len(r) == 8
+        assert r.offsets.tolist() == _scan(path)[0].tolist()
+        assert not r.refresh()
+
+        # the first messages are overwritten
+        with open(earthkit_examples_file("test.grib"), "rb") as f:
+            data = f.read()
+        with open(path, "r+b") as f:
+            f.write(b"\0" * len(data))
+        os.utime(path, ns=(0, 0))
+        scan_starts.clear()
+        assert r.refresh()
+        assert scan_starts == [0]
+        assert len(r) == 6
+
+
+def test_grib_positions_refresh_sampled(scan_starts):
+    with temp_directory() as tmp_dir:
+        path = os.path.join(tmp_dir, "test.grib")
+        shutil.copyfile(earthkit_examples_file("test6.grib"), path)
+
+        r = GribCodesMessagePositionIndex(path)
+        handle_pool.get(GribCodesReader, path, int(r.offsets[3]), int(r.lengths[3]))
+        assert any(k[1] == path for k in handle_pool._handles)
+
+        # a message in the middle is overwritten then the file is appended to
+        with open(path, "r+b") as f:
+            f.seek(int(r.offsets[3]))
+            f.write(b"\0" * int(r.lengths[3]))
+        _append(path, earthkit_examples_file("test.grib"))
+        scan_starts.clear()
+        assert r.refresh()
+        assert scan_starts == [0]
+        assert len(r) == 7
+
+        # the handles of the previous content are discarded
+        assert not any(k[1] == path for k in handle_pool._handles)
+
+
+def test_grib_positions_fieldlist_refresh():
+    with temp_directory() as tmp_dir:
+        path = os.path.join(tmp_dir, "test.grib")
+        shutil.copyfile(earthkit_examples_file("test.grib"), path)
+
+        ds = from_source("file", path)
+        assert ds.metadata("param") == ["2t", "msl"]
+        assert ds.refresh() == 0
+
+        _append(path, earthkit_examples_file("test6.grib"))
+        assert ds.refresh() == 6
+        assert len(ds) == 8
+        assert ds.metadata("param") == ["2t", "msl", "t", "u", "v", "t", "u", "v"]
+        assert ds.sel(param="t").metadata("level") == [1000, 850]
+
+
+@pytest.mark.long_test
+def test_grib_positions_scan_benchmark():
+    with open(earthkit_test_data_file("ml_data.grib"), "rb") as f:
+        data = f.read()
+
+    # build a multi-GB file
+    target = 2 * 1024**3
+    chunk = data * max(1, (64 * 1024**2) // len(data))
+
+    with temp_file() as tmp:
+        with open(tmp, "wb") as f:
+            size = 0
+            while size < target:
+                f.write(chunk)
+                size += len(chunk)
+
+        t0 = time.perf_counter()
+        offsets, lengths = _scan(tmp)
+        t1 = time.perf_counter()
+        ref_offsets, ref_lengths = _legacy_scan(tmp)
+        t2 = time.perf_counter()
+
+        assert offsets.tolist() == ref_offsets
+        assert lengths.tolist() == ref_lengths
+
+        # the memory mapped scan is about 3 times faster than reading the
+        # message headers with ecCodes
+        assert 2 * (t1 - t0) < t2 - t1, (t1 - t0, t2 - t1)
+
+
+if __name__ == "__main__":
+    from earthkit.data.testing import main
+
+    main(__file__)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+# (C) Copyright 2020 ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+#
+
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from earthkit.data import from_source, settings
+from earthkit.data.core.temporary import temp_directory, temp_file
+from earthkit.data.readers.grib.codes import GribCodesReader, GribField
+from earthkit.data.testing import earthkit_examples_file, earthkit_test_data_file
+from earthkit.data.utils import message
+from earthkit.data.utils.message import ReaderLRUCache
+
+
+def _read(f):
+    # use a new field so that the handle is always created from the file
+    field = GribField(f.path, f._offset, f._length)
+    return field.handle.get("shortName"), field.values
+
+
+def test_grib_reader_at_offset_with_length():
+    ds = from_source("file", earthkit_examples_file("tuv_pl.grib"))
+    reader = GribCodesReader.from_cache(ds.path)
+
+    for f in ds:
+        h1 = reader.at_offset(f._offset)
+        h2 = reader.at_offset(f._offset, f._length)
+        assert h2.offset == f._offset
+        assert h1.get("shortName") == h2.get("shortName")
+        assert np.array_equal(h1.get_values(), h2.get_values())
+
+
+def test_grib_reader_at_offset_bad_length():
+    ds = from_source("file", earthkit_examples_file("test.grib"))
+    reader = GribCodesReader.from_cache(ds.path)
+    size = os.path.getsize(ds.path)
+
+    with pytest.raises(ValueError):
+        reader.at_offset(ds[1]._offset, size)
+
+
+def test_grib_reader_threads():
+    ds = from_source("file", earthkit_examples_file("tuv_pl.grib"))
+    ref = [(f.handle.get("shortName"), f.values) for f in ds]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for _ in range(4):
+            r = list(executor.map(_read, ds))
+            assert len(r) == len(ref)
+            for (name, v), (ref_name, ref_v) in zip(r, ref):
+                assert name == ref_name
+                assert np.array_equal(v, ref_v)
+
+
+def test_grib_reader_pool_lru():
+    pool = ReaderLRUCache(2)
+    with temp_directory() as tmp_dir:
+        paths = []
+        for i in range(3):
+            p = os.path.join(tmp_dir, f"{i}.grib")
+            shutil.copyfile(earthkit_examples_file("test.grib"), p)
+            paths.append(p)
+
+        r0 = pool[(paths[0], GribCodesReader)]
+        pool[(paths[1], GribCodesReader)]
+        assert len(pool) == 2
+
+        # a hit makes the reader the most recently used one
+        assert pool[(paths[0], GribCodesReader)] is r0
+
+        pool[(paths[2], GribCodesReader)]
+        assert len(pool) == 2
+        keys = [k[0] for k in pool.keys()]
+        assert keys == [paths[0], paths[2]]
+
+
+def test_grib_reader_pool_size_setting():
+    pool = ReaderLRUCache()
+    with settings.temporary("reader-file-pool-size", 1):
+        assert pool.size == 1
+        with temp_directory() as tmp_dir:
+            for i in range(3):
+                p = os.path.join(tmp_dir, f"{i}.grib")
+                shutil.copyfile(earthkit_examples_file("test.grib"), p)
+                pool[(p, GribCodesReader)]
+                assert len(pool) == 1
+
+
+@pytest.fixture
+def handle_pool():
+    pool = message.handle_pool
+    pool.clear()
+    pool.reset_statistics()
+    yield pool
+    pool.clear()
+    pool.reset_statistics()
+
+
+def test_grib_handle_pool_stats(handle_pool):
+    ds = from_source("file", earthkit_examples_file("test6.grib"))
+
+    assert ds[0].metadata("param") == "t"
+    s = handle_pool.statistics()
+    assert s["misses"] == 1
+    assert s["size"] == 1
+    assert s["memory"] == ds[0]._length
+
+    # the field does not store the handle
+    f = ds[0]
+    assert f._handle is None
+    h = f.handle
+    assert f._handle is None
+    assert f.handle is h
+    assert handle_pool.statistics()["hits"] >= 1
+
+
+def test_grib_handle_pool_size(handle_pool):
+    ds = from_source("file", earthkit_examples_file("tuv_pl.grib"))
+    with settings.temporary("handle-pool-size", 4):
+        md = [f.metadata() for f in ds]
+        geo = [m.geography for m in md]
+        ref = ["t", "u", "v"] * 6
+        assert [m["param"] for m in md] == ref
+        assert len(handle_pool) == 4
+        assert handle_pool.statistics()["evictions"] == 14
+
+        # the metadata and the geography can still be used after the eviction
+        assert [m["param"] for m in md] == ref
+        assert geo[0].shape() == (7, 12)
+        assert len(handle_pool) == 4
+
+    handle_pool.clear()
+    with settings.temporary("handle-pool-size", 0):
+        assert ds[0].metadata("param") == "t"
+        assert len(handle_pool) == 0
+
+
+def test_grib_handle_pool_memory_limit(handle_pool):
+    ds = from_source("file", earthkit_examples_file("tuv_pl.grib"))
+    length = ds[0]._length
+    with settings.temporary("handle-pool-memory-limit", 3 * length):
+        for f in ds:
+            f.metadata("param")
+        s = handle_pool.statistics()
+        assert s["size"] == 3
+        assert s["memory"] == 3 * length
+
+
+def test_grib_handle_pool_threads(handle_pool):
+    ds = from_source("file", earthkit_examples_file("test.grib"))
+    h = ds[0].handle
+    assert ds[0].handle is h
+
+    # the handles are not shared between threads
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        other = executor.submit(lambda: ds[0].handle).result()
+    assert other is not h
+    assert len(handle_pool) == 2
+    assert ds[0].handle is h
+
+
+@pytest.mark.long_test
+def test_grib_reader_threads_benchmark():
+    with open(earthkit_test_data_file("ml_data.grib"), "rb") as f:
+        data = f.read()
+
+    with temp_file() as tmp:
+        with open(tmp, "wb") as f:
+            for _ in range(20):
+                f.write(data)
+
+        ds = from_source("file", tmp)
+        fields = list(ds)
+
+        times = {}
+        with settings.temporary("handle-pool-size", 0):
+            ref = [_read(f) for f in fields]
+            for n in (1, 4):
+                t0 = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=n) as executor:
+                    r = list(executor.map(_read, fields))
+                times[n] = time.perf_counter() - t0
+                assert [x[0] for x in r] == [x[0] for x in ref]
+                assert all(np.array_equal(x[1], y[1]) for x, y in zip(r, ref))
+
+    if (os.cpu_count() or 1) < 4:
+        pytest.skip("the speed-up of the threads needs 4 CPUs")
+
+    # the messages are read and decoded concurrently
+    assert 1.5 * times[4] < times[1], times
+
+
+if __name__ == "__main__":
+    from earthkit.data.testing import main
+
+    main(__file__)
@@ -17,6 +17,7 @@ import numpy as np
 import pytest
 
 from earthkit.data import from_source
+from earthkit.data.testing import earthkit_examples_file
 
 here = os.path.dirname(__file__)
 sys.path.insert(0, here)
@@ -316,6 +317,89 @@ def test_grib_isel_slice_multi_file(mode):
     ]
 
 
+def _count_metadata_calls(monkeypatch):
+    from earthkit.data.core.fieldlist import Field
+
+    calls = []
+    ori = Field._metadata_row
+
+    def _row(self, *args, **kwargs):
+        calls.append(1)
+        return ori(self, *args, **kwargs)
+
+    monkeypatch.setattr(Field, "_metadata_row", _row)
+    return calls
+
+
+def test_grib_sel_column_index_reused(monkeypatch):
+    ds = from_source("file", earthkit_examples_file("tuv_pl.grib"))
+    calls = _count_metadata_calls(monkeypatch)
+
+    r = ds.sel(param="t")
+    assert len(r) == 6
+    assert len(calls) == 18
+
+    # the default index keys were extracted in the first pass
+    r = ds.sel(param="u", level=slice(500, 850))
+    assert r.metadata(["param", "level"]) == [["u", 850], ["u", 700], ["u", 500]]
+    assert len(calls) == 18
+
+    # a mask index slices the columns of its parent
+    r1 = r.sel(level=700)
+    assert r1.metadata(["param", "level"]) == [["u", 700]]
+    assert len(calls) == 18
+
+    # the index values come from the same columns
+    assert ds.index("levelist") == [300, 400, 500, 700, 850, 1000]
+    assert len(calls) == 18
+
+    # a new key is extracted only once
+    ds.sel(shortName="v")
+    ds.sel(shortName=["t", "v"])
+    assert len(calls) == 36
+
+
+def test_grib_sel_column_index_multi(monkeypatch):
+    ds1 = from_source("file", earthkit_examples_file("test.grib"))
+    ds2 = from_source("file", earthkit_examples_file("test6.grib"))
+    ds = ds1 + ds2
+
+    calls = _count_metadata_calls(monkeypatch)
+    assert ds.sel(param="msl").metadata("param") == ["msl"]
+    assert len(calls) == 8
+    r = ds.sel(param=["t", "u"], level=850)
+    assert r.metadata(["param", "level"]) == [["t", 850], ["u", 850]]
+    assert len(calls) == 8
+
+
+def test_grib_sel_column_index_remapping():
+    ds = from_source("file", earthkit_examples_file("tuv_pl.grib"))
+    r = ds.sel(
+        param_level=["t850", "u1000"], remapping={"param_level": "{param}{levelist}"}
+    )
+    assert r.metadata(["param", "level"]) == [["u", 1000], ["t", 850]]
+
+
+def test_grib_sel_column_index_callable():
+    ds = from_source("file", earthkit_examples_file("tuv_pl.grib"))
+    r = ds.sel(level=lambda x: x > 700, param="v")
+    assert r.metadata("level") == [1000, 850]
+
+    # values of another type than the metadata cannot match
+    assert len(ds.sel(level="700")) == 0
+
+
+@pytest.mark.parametrize("slc", [slice(1, 3), slice(None, 2.5), slice(2, None)])
+def test_grib_sel_column_index_slice_nan(slc):
+    from earthkit.data.core.index import Selection
+
+    action = Selection(dict(x=slc)).actions["x"]
+    values = [0.5, 1.0, 2.0, np.nan, 3.0, 4.0]
+    mask = action.mask(values, np.array(values))
+    assert mask.tolist() == [action(x) for x in values]
+    assert mask[3]
+
+
 if __name__ == "__main__":
     from earthkit.data.testing import main
 
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+
+# (C) Copyright 2020 ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+#
+
+import glob
+import os
+import time
+
+import numpy as np
+import pytest
+
+from earthkit.data import from_source, settings
+from earthkit.data.core.temporary import temp_file
+from earthkit.data.readers.grib import simple_packing
+from earthkit.data.readers.grib.codes import GribCodesHandle, GribField
+from earthkit.data.testing import earthkit_examples_file, earthkit_test_data_file
+
+
+def _corpus():
+    files = []
+    for f in (earthkit_examples_file(""), earthkit_test_data_file("")):
+        files.extend(glob.glob(os.path.join(f, "*.grib*")))
+    return sorted(files)
+
+
+def _eccodes_values(h, dtype=None):
+    with settings.temporary("use-numpy-grib-decoder", False):
+        return h.get_values(dtype=dtype)
+
+
+def _unpack_bits_ref(data, bits_per_value, count):
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+    bits = bits[: count * bits_per_value].reshape(count, bits_per_value)
+    return bits.astype(np.uint64) @ (
+        np.uint64(1) << np.arange(bits_per_value - 1, -1, -1, dtype=np.uint64)
+    )
+
+
+@pytest.mark.parametrize("bits_per_value", [1, 3, 8, 12, 16, 24, 25, 26, 32, 48, 57])
+@pytest.mark.parametrize("count", [1, 7, 8, 1001])
+def test_grib_simple_packing_unpack_bits(bits_per_value, count):
+    rng = np.random.default_rng(bits_per_value)
+    data = rng.integers(0, 256, (count * bits_per_value + 7) // 8, dtype=np.uint8)
+    v = simple_packing.unpack_bits(data.tobytes(), bits_per_value, count)
+    assert v.shape == (count,)
+    assert np.array_equal(v, _unpack_bits_ref(data.tobytes(), bits_per_value, count))
+
+
+@pytest.mark.parametrize("bits_per_value", [1, 3, 8, 12, 16, 24, 25, 26, 32, 40, 57])
+@pytest.mark.parametrize("count", [1, 7, 8, 1001])
+def test_grib_simple_packing_pack_bits(bits_per_value, count):
+    rng = np.random.default_rng(bits_per_value)
+    v = rng.integers(0, 1 << bits_per_value, count, dtype=np.uint64)
+    data = simple_packing.pack_bits(v, bits_per_value)
+    assert len(data) == (count * bits_per_value + 7) // 8
+    assert np.array_equal(simple_packing.unpack_bits(data, bits_per_value, count), v)
+
+
+@pytest.mark.parametrize("bits_per_value", [8, 12, 16, 24])
+@pytest.mark.parametrize("decimal_scale_factor", [0, 2, -1])
+def test_grib_simple_packing_encode(bits_per_value, decimal_scale_factor):
+    v = np.random.default_rng(0).uniform(-500, 1200, 1001)
+    r, e, bits, data = simple_packing.encode(v, bits_per_value, decimal_scale_factor)
+    assert bits == bits_per_value
+    assert r <= v.min() * 10.0**decimal_scale_factor
+
+    x = simple_packing.unpack_bits(data, bits, len(v)).astype(np.float64)
+    d = (x * 2.0**e + r) * 10.0**-decimal_scale_factor
+    step = 2.0**e * 10.0**-decimal_scale_factor
+    assert np.abs(d - v).max() <= step * 0.5 * (1 + 1e-9)
+    # the smallest binary scale factor is used
+    assert (v.max() - v.min()) * 10.0**decimal_scale_factor > 2.0 ** (e - 1) * (
+        (1 << bits) - 1
+    )
+
+
+@pytest.mark.parametrize("precision", [1, 0.01, 1e-4])
+def test_grib_simple_packing_precision(precision):
+    v = np.random.default_rng(0).uniform(200, 320, 1001)
+    bits, e = simple_packing.bits_per_value_for_precision(v, precision)
+    r, e, bits, data = simple_packing.encode(v, bits, binary_scale_factor=e)
+    x = simple_packing.unpack_bits(data, bits, len(v)).astype(np.float64)
+    assert np.abs(x * 2.0**e + r - v).max() <= precision
+    assert simple_packing.bits_per_value_for_precision(v, 2 * precision)[0] < bits
+
+    assert simple_packing.bits_per_value_for_precision(np.full(10, 3.0), 1) == (0, 0)
+    assert simple_packing.bits_per_value_for_precision(v, 1e-30) == (32, None)
+
+
+def test_grib_simple_packing_encode_message():
+    h = GribCodesHandle.from_sample("regular_ll_sfc_grib2")
+    n = h.get("numberOfValues")
+    v = np.random.default_rng(0).uniform(-40, 50, n)
+    v[::5] = np.nan
+
+    message = simple_packing.encode_message(h.get_buffer(), v, 12, 1)
+    with temp_file() as tmp:
+        with open(tmp, "wb") as f:
+            f.write(message)
+        f = from_source("file", tmp)[0]
+        assert f.metadata("bitsPerValue") == 12
+        assert f.metadata("decimalScaleFactor") == 1
+        assert f.metadata("bitmapPresent") == 1
+        d = f.values
+        assert np.array_equal(np.isnan(d), np.isnan(v))
+        assert np.allclose(d, v, equal_nan=True, atol=0.02)
+        assert f.metadata("shortName") == h.get("shortName")
+
+    with pytest.raises(ValueError):
+        h1 = GribCodesHandle.from_sample("regular_ll_sfc_grib1")
+        v = np.zeros(h1.get("numberOfValues"))
+        simple_packing.encode_message(h1.get_buffer(), v, 12)
+
+
+def test_grib_simple_packing_unpack_bits_bad():
+    with pytest.raises(ValueError):
+        simple_packing.unpack_bits(b"\0" * 16, 0, 1)
+
+    with pytest.raises(ValueError):
+        simple_packing.unpack_bits(b"\0" * 16, 64, 1)
+
+
+@pytest.mark.parametrize("path", _corpus(), ids=os.path.basename)
+def test_grib_simple_packing_same_as_eccodes(path):
+    ds = from_source("file", path)
+    for f in ds:
+        h = GribField(f.path, f._offset, f._length).handle
+        simple = h.get_string("packingType") == "grid_simple"
+        for dtype in (None, np.float64, np.float32):
+            ref = _eccodes_values(h, dtype=dtype)
+            v = simple_packing.decode(h, dtype=dtype)
+            if not simple:
+                assert v is None
+                continue
+
+            assert v.dtype == ref.dtype
+            assert v.shape == ref.shape
+            # bit-identical
+            assert np.array_equal(v, ref, equal_nan=True)
+
+
+@pytest.mark.parametrize("sample", ["regular_ll_sfc_grib1", "regular_ll_sfc_grib2"])
+@pytest.mark.parametrize("bits_per_value", [1, 5, 12, 16, 24, 27, 32, 48])
+def test_grib_simple_packing_bits_per_value(sample, bits_per_value):
+    h = GribCodesHandle.from_sample(sample)
+    n = h.get("numberOfValues")
+    rng = np.random.default_rng(bits_per_value)
+    h.set_long("bitsPerValue", bits_per_value)
+    h.set_values(rng.uniform(-40, 50, n))
+    assert h.get_long("bitsPerValue") == bits_per_value
+
+    for dtype in (None, np.float32):
+        ref = _eccodes_values(h, dtype=dtype)
+        v = simple_packing.decode(h, dtype=dtype)
+        assert np.array_equal(v, ref)
+
+
+@pytest.mark.parametrize("sample", ["regular_ll_sfc_grib1", "regular_ll_sfc_grib2"])
+def test_grib_simple_packing_constant(sample):
+    h = GribCodesHandle.from_sample(sample)
+    h.set_long("decimalScaleFactor", 2)
+    h.set_values(np.full(h.get("numberOfValues"), 1.234567))
+    assert h.get_long("bitsPerValue") == 0
+
+    v = simple_packing.decode(h)
+    assert np.array_equal(v, _eccodes_values(h))
+
+
+def test_grib_simple_packing_with_missing():
+    h = GribCodesHandle.from_sample("reduced_gg_pl_32_grib2")
+    v = np.arange(h.get("numberOfValues"), dtype=np.float64)
+    v[5::7] = np.nan
+    h.set_double("missingValue", 9999)
+    h.set_long("bitmapPresent", 1)
+    h.set_values(np.where(np.isnan(v), 9999, v))
+
+    for dtype in (None, np.float32):
+        d = simple_packing.decode(h, dtype=dtype)
+        assert np.array_equal(d, _eccodes_values(h, dtype=dtype), equal_nan=True)
+
+    with temp_file() as tmp:
+        with open(tmp, "wb") as f:
+            h.write_to(f)
+        f = from_source("file", tmp)[0]
+        ref = f.values
+        with settings.temporary("use-numpy-grib-decoder", True):
+            assert np.array_equal(f.values, ref, equal_nan=True)
+
+
+def test_grib_simple_packing_setting(monkeypatch):
+    calls = []
+    decode = simple_packing.decode
+
+    def _decode(*args, **kwargs):
+        v = decode(*args, **kwargs)
+        calls.append(v is not None)
+        return v
+
+    monkeypatch.setattr(simple_packing, "decode", _decode)
+
+    ds = from_source("file", earthkit_examples_file("test.grib"))
+    ref = ds.to_numpy()
+    assert calls == []
+
+    with settings.temporary("use-numpy-grib-decoder", True):
+        assert np.array_equal(ds.to_numpy(), ref)
+        assert calls == [True, True]
+
+        # other packing types fall back to ecCodes
+        calls.clear()
+        ds = from_source("file", earthkit_test_data_file("mercator.grib"))
+        v = ds[0].values
+        assert calls == [False]
+
+    assert np.array_equal(v, ds[0].values, equal_nan=True)
+
+
+@pytest.mark.long_test
+@pytest.mark.parametrize("bits_per_value", [12, 16, 24])
+def test_grib_simple_packing_benchmark(bits_per_value):
+    h = GribCodesHandle.from_sample("regular_ll_sfc_grib2")
+    h.set_multiple(
+        {
+            "Ni": 1440,
+            "Nj": 721,
+            "iDirectionIncrement": 250000,
+            "jDirectionIncrement": 250000,
+            "longitudeOfLastGridPointInDegrees": 359.75,
+            "latitudeOfLastGridPointInDegrees": -90,
+            "bitsPerValue": bits_per_value,
+        }
+    )
+    h.set_values(np.random.default_rng(0).uniform(200, 320, 1440 * 721))
+
+    with temp_file() as tmp:
+        with open(tmp, "wb") as f:
+            for _ in range(10):
+                h.write_to(f)
+
+        ds = from_source("file", tmp)
+        times = {}
+        values = {}
+        for mode in ("eccodes", "numpy"):
+            with settings.temporary("use-numpy-grib-decoder", mode == "numpy"):
+                # the handles are taken from the pool so only the decoding is timed
+                ds.to_numpy()
+                t0 = time.perf_counter()
+                values[mode] = ds.to_numpy()
+                times[mode] = time.perf_counter() - t0
+
+        assert values["numpy"].shape == (10, 721, 1440)
+        assert np.array_equal(values["numpy"], values["eccodes"])
+
+        # the decoding is about as fast as ecCodes
+        assert times["numpy"] < 2 * times["eccodes"], times
+
+
+if __name__ == "__main__":
+    from earthkit.data.testing import main
+
+    main(__file__)
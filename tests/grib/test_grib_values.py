@@ -15,6 +15,10 @@ import sys
 import numpy as np
 import pytest
 
+from earthkit.data import from_source, settings
+from earthkit.data.core.temporary import temp_file
+from earthkit.data.testing import earthkit_examples_file, earthkit_test_data_file
+
 here = os.path.dirname(__file__)
 sys.path.insert(0, here)
 from grib_fixtures import load_file_or_numpy_fs  # noqa: E402
@@ -355,6 +359,218 @@ def test_grib_values_with_missing(mode):
     assert np.count_nonzero(np.isnan(m)) == 38
 
 
+@pytest.mark.parametrize("mode", ["file", "numpy_fs"])
+@pytest.mark.parametrize("nthreads", [1, 4])
+def test_grib_to_numpy_threads(mode, nthreads):
+    ds = load_file_or_numpy_fs("tuv_pl.grib", mode)
+    ref = np.array([f.to_numpy() for f in ds])
+
+    with settings.temporary("number-of-decode-threads", nthreads):
+        v = ds.to_numpy()
+        assert v.shape == (18, 7, 12)
+        assert np.array_equal(v, ref)
+
+        v = ds.values
+        assert v.shape == (18, 84)
+        assert np.array_equal(v, ref.reshape(18, 84))
+
+        d = ds.data(keys=("lat", "value"))
+        assert d.shape == (19, 7, 12)
+        assert np.array_equal(d[1:], ref)
+
+
+@pytest.mark.parametrize("mode", ["file", "numpy_fs"])
+def test_grib_to_numpy_out(mode):
+    ds = load_file_or_numpy_fs("test.grib", mode)
+    ref = ds.to_numpy(flatten=True)
+
+    out = np.zeros((2, 209), dtype=np.float32)
+    v = ds.to_numpy(flatten=True, out=out)
+    assert v is out
+    assert np.allclose(out, ref)
+
+    # slices can be used as output
+    out = np.zeros((4, 11, 19))
+    ds.to_numpy(out=out[1:3])
+    assert np.allclose(out[1:3].reshape(2, 209), ref)
+    assert np.all(out[0] == 0)
+    assert np.all(out[3] == 0)
+
+    with pytest.raises(ValueError):
+        ds.to_numpy(out=np.zeros((2, 210)))
+
+    with pytest.raises(ValueError):
+        ds.to_numpy(out=np.zeros((3, 209)), flatten=True)
+
+
+def test_grib_to_numpy_shape_mismatch():
+    ds = from_source("file", earthkit_examples_file("test.grib")) + from_source(
+        "file", earthkit_examples_file("test6.grib")
+    )
+    with pytest.raises(ValueError):
+        ds.to_numpy()
+
+
+def _decoded_types(monkeypatch):
+    import eccodes
+
+    calls = []
+    ori = eccodes.codes_get_array
+
+    def _get_array(handle, key, ktype=None):
+        v = ori(handle, key, ktype=ktype)
+        calls.append((key, v.dtype))
+        return v
+
+    monkeypatch.setattr(eccodes, "codes_get_array", _get_array)
+    return calls
+
+
+def test_grib_float32_values_decode(monkeypatch):
+    from earthkit.data.core.geography import geometry_cache
+
+    ds = from_source("file", earthkit_examples_file("test.grib"))
+    ref = ds[0].data()
+    calls = _decoded_types(monkeypatch)
+
+    v = ds.to_numpy(dtype="float32")
+    assert v.dtype == np.float32
+    assert calls == [("values", np.float32)] * 2
+
+    # the coordinates are decoded only once per grid
+    geometry_cache.clear()
+    d = ds[0].data(dtype=np.float32)
+    assert d.dtype == np.float32
+    assert np.allclose(d, ref)
+    ds[1].data(dtype=np.float32)
+    assert [k for k, _ in calls[2:]] == ["latitudes", "longitudes"] + ["values"] * 2
+    geometry_cache.clear()
+
+
+def test_grib_values_with_missing_float32():
+    f = from_source("file", earthkit_test_data_file("test_single_with_missing.grib"))
+    ref = f[0].values
+
+    h = f[0].handle
+    mv = h.get("missingValue")
+    v = f[0].to_numpy(flatten=True, dtype=np.float32)
+    assert v.dtype == np.float32
+    assert np.array_equal(np.isnan(v), np.isnan(ref))
+    assert np.allclose(v, ref, equal_nan=True)
+
+    # the handle is not modified
+    assert h.get("missingValue") == mv
+
+
+def test_grib_values_with_missing_grib2():
+    from earthkit.data.readers.grib.codes import GribCodesHandle
+
+    h = GribCodesHandle.from_sample("reduced_gg_pl_32_grib2")
+    v = np.arange(h.get("numberOfValues"), dtype=np.float64)
+    v[5::7] = np.nan
+    h.set_double("missingValue", 9999)
+    h.set_long("bitmapPresent", 1)
+    h.set_values(np.where(np.isnan(v), 9999, v))
+
+    for dtype in (None, np.float32):
+        d = h.get_values(dtype=dtype)
+        assert np.array_equal(np.isnan(d), np.isnan(v))
+        assert np.allclose(d, v, equal_nan=True)
+
+    # the bitmap is read from the file
+    with temp_file() as tmp:
+        with open(tmp, "wb") as f:
+            h.write_to(f)
+        ds = from_source("file", tmp)
+        d = ds[0].values
+        assert np.array_equal(np.isnan(d), np.isnan(v))
+        assert np.allclose(d, v, equal_nan=True)
+
+
+@pytest.mark.parametrize("mode", ["file", "numpy_fs"])
+def test_grib_field_to_numpy_out(mode):
+    ds = load_file_or_numpy_fs("test.grib", mode)
+    f = ds[0]
+    ref = f.to_numpy()
+
+    out = np.zeros((11, 19), dtype=np.float32)
+    v = f.to_numpy(out=out)
+    assert v is out
+    assert np.allclose(out, ref)
+
+    out = np.zeros((2, 209))
+    f.to_numpy(flatten=True, out=out[1])
+    assert np.array_equal(out[1], ref.flatten())
+
+    with pytest.raises(ValueError):
+        f.to_numpy(out=np.zeros(209))
+
+
+@pytest.mark.parametrize("mode", ["file", "numpy_fs"])
+def test_grib_data_out(mode):
+    ds = load_file_or_numpy_fs("test.grib", mode)
+    ref = ds[0].data()
+
+    out = np.zeros((3, 11, 19), dtype=np.float32)
+    d = ds[0].data(out=out)
+    assert d is out
+    assert np.allclose(out, ref)
+
+    out = np.zeros(209)
+    ds[0].data("lon", flatten=True, out=out)
+    assert np.array_equal(out, ref[1].flatten())
+
+    with pytest.raises(ValueError):
+        ds[0].data(keys=("lat", "lon"), out=np.zeros((3, 11, 19)))
+
+    ref = ds.data()
+    out = np.zeros((4, 11, 19), dtype=np.float32)
+    d = ds.data(out=out)
+    assert d is out
+    assert np.allclose(out, ref)
+
+    out = np.zeros((2, 209))
+    ds.data("value", flatten=True, out=out)
+    assert np.array_equal(out, ref[2:].reshape(2, 209))
+
+    with pytest.raises(ValueError):
+        ds.data(out=np.zeros((3, 11, 19)))
+
+
+@pytest.mark.long_test
+def test_grib_to_numpy_threads_benchmark():
+    import time
+
+    from earthkit.data.testing import earthkit_test_data_file
+
+    with open(earthkit_test_data_file("ml_data.grib"), "rb") as f:
+        data = f.read()
+
+    with temp_file() as tmp:
+        with open(tmp, "wb") as f:
+            for _ in range(50):
+                f.write(data)
+
+        ds = from_source("file", tmp)
+        times = {}
+        values = {}
+        for n in (1, 4):
+            s = {"number-of-decode-threads": n, "handle-pool-size": 0}
+            with settings.temporary(s):
+                t0 = time.perf_counter()
+                values[n] = ds.to_numpy()
+                times[n] = time.perf_counter() - t0
+
+        assert values[1].shape[0] == len(ds)
+        assert np.array_equal(values[4], values[1])
+
+    if (os.cpu_count() or 1) < 4:
+        pytest.skip("the speed-up of the threads needs 4 CPUs")
+
+    # the fields are decoded concurrently into the output array
+    assert 1.5 * times[4] < times[1], times
+
+
 if __name__ == "__main__":
     from earthkit.data.testing import main
 
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+
+# (C) Copyright 2020 ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+#
+
+import itertools
+import os
+import shutil
+import time
+
+import pytest
+
+from earthkit.data import from_source
+from earthkit.data.core.temporary import temp_directory, temp_file
+from earthkit.data.indexing.database.sql import (
+    SqlDatabase,
+    SqlOrder,
+    SqlRemapping,
+    SqlSelection,
+)
+from earthkit.data.testing import NO_PYARROW, earthkit_test_data_file
+
+pytestmark = pytest.mark.skipif(NO_PYARROW, reason="pyarrow not installed")
+
+PARAMS = ["t", "u", "v", "z"]
+LEVELS = [1000, 850, 700, 500, 300]
+STEPS = [0, 6, 12]
+
+
+def _entries(n=1):
+    for i, (step, level, param) in enumerate(
+        itertools.product(STEPS * n, LEVELS, PARAMS)
+    ):
+        entry = {
+            "_path": "a.grib",
+            "_offset": i * 10,
+            "_length": 10,
+            "param": param,
+            "step": step,
+            "levtype": "pl",
+        }
+        # keys can be missing or appear later
+        if param != "z":
+            entry["levelist"] = level
+        if i > 3:
+            entry["number"] = i % 3
+        yield entry
+
+
+@pytest.fixture
+def dbs():
+    from earthkit.data.indexing.database.arrow import ArrowDatabase
+
+    with temp_directory() as tmp:
+        sql = SqlDatabase(os.path.join(tmp, "a.db"))
+        sql.load_iterator(_entries())
+        arrow = ArrowDatabase(os.path.join(tmp, "a.arrow"))
+        assert arrow.load_iterator(_entries()) == 60
+        yield sql, arrow
+
+
+def _filter(db, *filters):
+    for f in filters:
+        db = db.filter(f)
+    return db
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [
+        [],
+        [SqlSelection(dict(param=["t", "z"], step="6"))],
+        [
+            SqlSelection(dict(param=["t", "z"], levelist=[500, 850])),
+            SqlOrder(dict(levelist="ascending", param=["z", "t"])),
+            SqlSelection(dict(step=6)),
+        ],
+        [
+            SqlOrder(dict(step="descending", param="ascending")),
+            SqlSelection(dict(number=[0, 1])),
+            SqlOrder(dict(levelist="descending")),
+        ],
+        [SqlOrder(dict(levelist="ascending", number=["1", 0]))],
+        [
+            SqlRemapping(remapping={"pl": "{param}_{levelist}"}),
+            SqlSelection(dict(pl=["t_850", "z", "u_500"])),
+            SqlOrder(dict(pl="descending")),
+        ],
+        [
+            SqlSelection(
+                dict(pl=["t850", "v300"]),
+                remapping={"pl": "{param}{levelist}"},
+            )
+        ],
+    ],
+)
+def test_indexing_arrow_same_as_sql(dbs, filters):
+    # the entries with the same keys are in the order of the file, which is not
+    # guaranteed by sqlite
+    filters = [SqlOrder(dict(_offset="ascending"))] + filters
+    sql, arrow = [_filter(db, *filters) for db in dbs]
+
+    assert arrow.count() == sql.count()
+    assert list(arrow.lookup_dicts()) == list(sql.lookup_dicts())
+    assert list(arrow.lookup_dicts(limit=3, offset=2, with_parts=False)) == list(
+        sql.lookup_dicts(limit=3, offset=2, with_parts=False)
+    )
+
+    ref = [(p.path, p.offset, p.length) for p in sql.lookup_parts()]
+    assert [(p.path, p.offset, p.length) for p in arrow.lookup_parts()] == ref
+    assert [(p.path, p.offset) for p in arrow.iter_parts(chunk_size=7)] == [
+        x[:2] for x in ref
+    ]
+    parts = arrow.lookup_parts_by_rowid(arrow.rowids()[::-1])
+    assert [(p.path, p.offset, p.length) for p in parts] == ref[::-1]
+
+    keys = ("param", "levelist", "step", "number", "unknown")
+    a = arrow.unique_values(*keys)
+    s = sql.unique_values(*keys)
+    assert list(a.keys()) == list(s.keys())
+    for k in s:
+        assert sorted(a[k], key=str) == sorted(s[k], key=str), k
+
+    names = ("i_param", "i_levelist", "i_number")
+    assert sorted(arrow.unique_combinations(*names), key=str) == sorted(
+        sql.unique_combinations(*names), key=str
+    )
+
+
+def test_indexing_arrow_file(dbs):
+    from earthkit.data.indexing.database.arrow import ArrowDatabase
+
+    _, arrow = dbs
+    db = ArrowDatabase(arrow.db_path)
+    assert db.count() == 60
+    assert db.table.schema.field("i_param").type.value_type == "string"
+    assert db.dbkeys["i_step"].cast is int
+
+    with pytest.raises(NotImplementedError):
+        db.refresh(None)
+
+
+@pytest.mark.cache
+def test_indexing_arrow_source():
+    with temp_directory() as tmp:
+        for p in ["t", "u", "v"]:
+            shutil.copy(earthkit_test_data_file(f"{p}_pl.grib"), tmp)
+
+        ref = from_source("file", tmp, indexing=True)
+        ds = from_source("file", tmp, indexing=True, backend="arrow")
+        assert ds.db.__class__.__name__ == "ArrowDatabase"
+        assert len(ds) == len(ref) == 18
+
+        for x in (ref, ds):
+            x = x.sel(param=["t", "v"], level=[500, 850]).order_by(
+                levelist="ascending", param=["v", "t"]
+            )
+            assert x.metadata("param", "level") == [
+                ("v", 500),
+                ("t", 500),
+                ("v", 850),
+                ("t", 850),
+            ]
+        assert ds.sel(param="u").to_numpy().shape == (6, 7, 12)
+        assert sorted(ds.metadata("param", "level")) == sorted(
+            ref.metadata("param", "level")
+        )
+
+        with pytest.raises(ValueError):
+            from_source("file", tmp, indexing=True, backend="unknown")
+
+        # the arrow index cannot be updated
+        assert ds.path_iterator is None
+        assert ds.refresh() == 0
+        with pytest.raises(ValueError):
+            from_source("file", tmp, indexing=True, backend="arrow", refresh=True)
+
+
+@pytest.mark.long_test
+def test_indexing_arrow_benchmark():
+    from earthkit.data.indexing.database.arrow import ArrowDatabase
+
+    n = 5_000_000 // (len(STEPS) * len(LEVELS) * len(PARAMS))
+    filters = [
+        SqlSelection(dict(param=["t", "z"])),
+        SqlRemapping(remapping={"pl": "{param}{levelist}"}),
+        SqlSelection(dict(step=[6, 12])),
+        SqlOrder(dict(levelist="ascending", param=["z", "t"])),
+    ]
+
+    times = {}
+    results = {}
+    with temp_file() as tmp:
+        for db in (SqlDatabase(tmp + ".db"), ArrowDatabase(tmp + ".arrow")):
+            name = db.__class__.__name__
+            db.load_iterator(_entries(n))
+
+            t0 = time.perf_counter()
+            r = _filter(db, *filters)
+            count = r.count()
+            parts = r.lookup_parts(limit=1000, offset=count // 2)
+            values = r.unique_values("param", "levelist", "pl")
+            times[name] = time.perf_counter() - t0
+            assert len(parts) == 1000
+
+            # the entries with the same keys are not in the same order
+            page = r.lookup_dicts(limit=1000, offset=count // 2)
+            results[name] = (
+                count,
+                [(x["levelist"], x["param"]) for x in page],
+                {k: sorted(v, key=str) for k, v in values.items()},
+            )
+            os.remove(db.db_path)
+
+    assert results["ArrowDatabase"] == results["SqlDatabase"]
+
+    # the filters are evaluated on the memory mapped columns, which is
+    # about 9 times faster than the SQLite query
+    assert 3 * times["ArrowDatabase"] < times["SqlDatabase"], times
+
+
+if __name__ == "__main__":
+    from earthkit.data.testing import main
+
+    main(__file__)
@@ -10,11 +10,15 @@
 #
 
 import os
+import shutil
 import sys
+import time
 
 import pytest
 
-from earthkit.data import from_source
+from earthkit.data import from_source, settings
+from earthkit.data.core.temporary import temp_directory, temp_file
+from earthkit.data.testing import earthkit_test_data_file
 
 here = os.path.dirname(__file__)
 sys.path.insert(0, here)
@@ -49,6 +53,165 @@ def test_indexing_db_directory():
     assert ds.db.count() == 18
 
 
+def _db_entries(ds):
+    entries = []
+    for e in ds.db.lookup_dicts():
+        e["_path"] = os.path.basename(e["_path"])
+        entries.append(e)
+    return entries
+
+
+def _db_indexes(ds):
+    cursor = ds.db.connection.execute(
+        "SELECT name FROM sqlite_master WHERE type='index';"
+    )
+    return sorted(x[0] for x in cursor)
+
+
+@pytest.mark.cache
+@pytest.mark.parametrize("processes", [2, 0])
+def test_indexing_db_directory_processes(processes):
+    tmp1, path1 = get_tmp_fixture("directory")
+    ds1 = from_source("file", path1, indexing=True)
+
+    tmp2, path2 = get_tmp_fixture("directory")
+    with settings.temporary("number-of-indexing-processes", processes):
+        ds2 = from_source("file", path2, indexing=True)
+
+    assert ds2.db.count() == 18
+    # same entries in the same order
+    assert _db_entries(ds1) == _db_entries(ds2)
+    assert "path_index" in _db_indexes(ds2)
+    assert "i_param_index" in _db_indexes(ds2)
+    assert len(ds2.sel(param="t")) == 6
+
+
+def test_indexing_db_load_batches(monkeypatch):
+    from earthkit.data.indexing.database.sql import EntriesLoader, SqlDatabase
+
+    monkeypatch.setattr(EntriesLoader, "BATCH_SIZE", 2)
+
+    entries = [
+        {"_path": "a.grib", "_offset": i * 10, "_length": 10, "param": p, "levelist": i}
+        for i, p in enumerate(["t", "u", "v", "t", "u"])
+    ]
+    # new keys can appear at any position
+    entries[3]["step"] = 6
+
+    with temp_file() as tmp:
+        db = SqlDatabase(tmp)
+        assert db.load_iterator(iter(entries)) == 5
+        assert db.count() == 5
+
+        assert list(db.lookup_dicts()) == entries
+        assert [p.offset for p in db.lookup_parts(resolve_paths=False)] == [
+            0,
+            10,
+            20,
+            30,
+            40,
+        ]
+
+
+@pytest.mark.cache
+def test_indexing_db_directory_refresh(monkeypatch):
+    from earthkit.data.readers.grib import parsing
+
+    starts = []
+    parse = parsing._parse_grib_file
+
+    def _parse(path, entry_path, with_statistics, progress_bar=True, start=0):
+        starts.append((os.path.basename(path), start))
+        return parse(path, entry_path, with_statistics, progress_bar, start=start)
+
+    monkeypatch.setattr(parsing, "_parse_grib_file", _parse)
+
+    with temp_directory() as tmp:
+        shutil.copy(earthkit_test_data_file("t_pl.grib"), tmp)
+        ds = from_source("file", tmp, indexing=True)
+        ds_u = ds.sel(param="u")
+        assert len(ds) == 6
+        assert len(ds_u) == 0
+
+        starts.clear()
+        assert ds.refresh() == 0
+        assert starts == []
+
+        # new file
+        shutil.copy(earthkit_test_data_file("u_pl.grib"), tmp)
+        assert ds.refresh() == 6
+        assert starts == [("u_pl.grib", 0)]
+        assert len(ds) == 12
+        assert ds_u.refresh() == 6
+        assert ds_u.metadata("param") == ["u"] * 6
+
+        # appended messages
+        size = os.path.getsize(os.path.join(tmp, "u_pl.grib"))
+        with open(os.path.join(tmp, "u_pl.grib"), "ab") as f:
+            with open(earthkit_test_data_file("v_pl.grib"), "rb") as g:
+                f.write(g.read())
+        starts.clear()
+        assert ds.refresh() == 6
+        assert len(starts) == 1
+        assert starts[0][0] == "u_pl.grib" and 0 < starts[0][1] <= size
+        assert ds.unique_values("param")["param"] == ["t", "u", "v"]
+
+        # rewritten file
+        shutil.copy(
+            earthkit_test_data_file("v_pl.grib"), os.path.join(tmp, "t_pl.grib")
+        )
+        starts.clear()
+        assert ds.refresh() == 0
+        assert starts == [("t_pl.grib", 0)]
+        assert sorted(ds.unique_values("param")["param"]) == ["u", "v"]
+        assert len(ds.sel(param="v")) == 12
+
+        # removed file
+        os.remove(os.path.join(tmp, "u_pl.grib"))
+        assert ds.refresh() == -12
+        assert ds.metadata("param") == ["v"] * 6
+
+        # refresh when opening the cached index
+        shutil.copy(earthkit_test_data_file("u_pl.grib"), tmp)
+        assert len(from_source("file", tmp, indexing=True)) == 6
+        assert len(from_source("file", tmp, indexing=True, refresh=True)) == 12
+
+
+@pytest.mark.long_test
+@pytest.mark.cache
+def test_indexing_db_directory_benchmark():
+    times = {}
+    fields = {}
+    with temp_directory() as tmp:
+        for processes in (1, 4):
+            path = os.path.join(tmp, str(processes))
+            os.makedirs(path)
+            for i in range(200):
+                for p in ["t", "u", "v"]:
+                    shutil.copy(
+                        earthkit_test_data_file(f"{p}_pl.grib"),
+                        os.path.join(path, f"{p}_{i}.grib"),
+                    )
+
+            with settings.temporary("number-of-indexing-processes", processes):
+                t0 = time.perf_counter()
+                ds = from_source("file", path, indexing=True)
+                times[processes] = time.perf_counter() - t0
+            assert ds.db.count() == 200 * 18
+            fields[processes] = sorted(
+                (os.path.basename(f.path), f._offset, f.metadata("param")) for f in ds
+            )
+
+    # the same fields are indexed with and without the processes
+    assert fields[4] == fields[1]
+
+    if (os.cpu_count() or 1) < 4:
+        pytest.skip("the speed-up of the processes needs 4 CPUs")
+
+    # the files are parsed concurrently
+    assert 1.5 * times[4] < times[1], times
+
+
 if __name__ == "__main__":
     from earthkit.data.testing import main
 
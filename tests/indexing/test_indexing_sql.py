@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+
+# (C) Copyright 2020 ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+#
+
+import itertools
+import os
+import time
+import tracemalloc
+
+import pytest
+
+from earthkit.data import settings
+from earthkit.data.core.temporary import temp_file
+from earthkit.data.indexing.database.sql import (
+    SqlDatabase,
+    SqlOrder,
+    SqlRemapping,
+    SqlSelection,
+)
+from earthkit.data.readers.grib.index.sql import FieldListInFilesWithSqlIndex
+
+PARAMS = ["t", "u", "v", "z"]
+LEVELS = [1000, 850, 700, 500, 300]
+STEPS = [0, 6, 12]
+
+
+def _entries(n=1):
+    entries = []
+    for i, (step, level, param) in enumerate(
+        itertools.product(STEPS * n, LEVELS, PARAMS)
+    ):
+        entries.append(
+            {
+                "_path": "a.grib",
+                "_offset": i * 10,
+                "_length": 10,
+                "param": param,
+                "levelist": level,
+                "step": step,
+                "levtype": "pl",
+            }
+        )
+    return entries
+
+
+@pytest.fixture
+def db():
+    with temp_file() as tmp:
+        db = SqlDatabase(tmp)
+        db.load_iterator(iter(_entries()))
+        yield db
+
+
+def _filter(db, *filters):
+    for f in filters:
+        db = db.filter(f)
+    return db
+
+
+def _keys(db, *names):
+    return [tuple(e[k] for k in names) for e in db.lookup_dicts()]
+
+
+def _keys_from(entries):
+    return [(e["param"], e["levelist"], e["step"]) for e in entries]
+
+
+def _plan(db, statement, params):
+    return [
+        x[-1] for x in db.connection.execute("EXPLAIN QUERY PLAN " + statement, params)
+    ]
+
+
+def test_indexing_sql_sel_order_by(db):
+    entries = _entries()
+
+    r = _filter(
+        db,
+        SqlSelection(dict(param=["t", "z"], levelist=[500, 850])),
+        SqlOrder(dict(levelist="ascending", param=["z", "t"])),
+        SqlSelection(dict(step=6)),
+    )
+    ref = sorted(
+        [
+            e
+            for e in entries
+            if e["param"] in ("t", "z")
+            and e["levelist"] in (500, 850)
+            and e["step"] == 6
+        ],
+        key=lambda e: (e["levelist"], ["z", "t"].index(e["param"])),
+    )
+    assert _keys(r, "param", "levelist", "step") == _keys_from(ref)
+    assert r.count() == 4
+
+    # the values are cast to the type of the column
+    assert (
+        r.count()
+        == _filter(
+            db, SqlSelection(dict(param=["t", "z"], levelist=["500", "850"], step="6"))
+        ).count()
+    )
+
+    # the later orders come first
+    r = _filter(
+        db,
+        SqlOrder(dict(step="descending", param="ascending")),
+        SqlSelection(dict(levelist=1000)),
+        SqlOrder(dict(param="descending")),
+    )
+    ref = sorted(
+        [e for e in entries if e["levelist"] == 1000],
+        key=lambda e: (-ord(e["param"]), -e["step"]),
+    )
+    assert _keys(r, "param", "levelist", "step") == _keys_from(ref)
+
+    parts = r.lookup_parts(limit=3, offset=2, resolve_paths=False)
+    assert [p.offset for p in parts] == [e["_offset"] for e in ref[2:5]]
+    parts = r.lookup_parts(offset=10, resolve_paths=False)
+    assert [p.offset for p in parts] == [e["_offset"] for e in ref[10:]]
+
+    # without an order the entries are in the order of the file
+    r = _filter(db, SqlSelection(dict(param=["z", "t"], step=[12, 0])))
+    statement, _ = r.query.select()
+    assert statement.endswith(" ORDER BY rowid;"), statement
+    ref = [e for e in entries if e["param"] in ("t", "z") and e["step"] in (0, 12)]
+    assert _keys(r, "param", "levelist", "step") == _keys_from(ref)
+
+
+def test_indexing_sql_remapping(db):
+    r = _filter(
+        db,
+        SqlSelection(dict(levelist=[500, 850], step=0)),
+        SqlRemapping(remapping={"pl": "{param}{levelist}"}),
+        SqlOrder(dict(pl=["z500", "t850", "u500"])),
+    )
+    assert [x[0] for x in r._execute_select(["i_pl"], limit=3, offset=5)] == [
+        "z500",
+        "t850",
+        "u500",
+    ]
+    assert r.unique_values("pl")["i_pl"][5:] == ["z500", "t850", "u500"]
+
+    # selection on a remapped key
+    r = _filter(
+        db,
+        SqlSelection(
+            dict(pl=["t_850", "z_500"], step=12),
+            remapping={"pl": "{param}_{levelist}"},
+        ),
+    )
+    assert _keys(r, "param", "levelist") == [("t", 850), ("z", 500)]
+
+    # literals are escaped
+    r = _filter(
+        db,
+        SqlRemapping(remapping={"quoted": "{param}'s"}),
+        SqlSelection(dict(quoted="t's", step=0, levelist=1000)),
+    )
+    assert r.count() == 1
+
+
+def test_indexing_sql_single_statement(db):
+    r = _filter(
+        db,
+        SqlSelection(dict(param=["t", "z"])),
+        SqlRemapping(remapping={"pl": "{param}{levelist}"}),
+        SqlSelection(dict(levelist=500)),
+        SqlOrder(dict(pl="descending")),
+    )
+    statement, params = r.query.select(["path", "offset", "length"], limit=10)
+    assert statement.count("SELECT") == 1
+    assert params == ["t", "z", 500, 10, 0]
+
+    # no view is created
+    tables = db.connection.execute("SELECT name FROM sqlite_temp_master;").fetchall()
+    assert tables == []
+
+    # the sql indexes are used
+    plan = " ".join(_plan(r, statement, params))
+    assert "USING INDEX" in plan, plan
+    assert "CO-ROUTINE" not in plan, plan
+
+    assert r.unique_values("param", "levelist", "unknown") == {
+        "i_param": ["z", "t"],
+        "i_levelist": [500],
+        "i_unknown": [],
+    }
+
+
+def test_indexing_sql_unique_values(db):
+    r = _filter(
+        db,
+        SqlSelection(dict(levelist=[300, 1000])),
+        SqlOrder(dict(param="descending", levelist="ascending", step="descending")),
+    )
+    assert r.unique_values("param", "levelist", "step") == {
+        "i_param": ["z", "v", "u", "t"],
+        "i_levelist": [300, 1000],
+        "i_step": [12, 6, 0],
+    }
+
+    statements = []
+    r.connection.set_trace_callback(statements.append)
+    try:
+        r.unique_values("param", "levelist", "step")
+    finally:
+        r.connection.set_trace_callback(None)
+    assert len([x for x in statements if x.startswith(("SELECT", "WITH"))]) == 1
+
+
+def test_indexing_sql_rowids(db):
+    r = _filter(
+        db,
+        SqlSelection(dict(step=[0, 12])),
+        SqlOrder(dict(param="descending")),
+    )
+    ref = r.lookup_parts(resolve_paths=False)
+    assert len(ref) == 40
+    assert [p.offset for p in r.iter_parts(resolve_paths=False, chunk_size=7)] == [
+        p.offset for p in ref
+    ]
+
+    rowids = r.rowids()
+    assert len(rowids) == 40
+    parts = r.lookup_parts_by_rowid(rowids[::-1], resolve_paths=False)
+    assert [p.offset for p in parts] == [p.offset for p in ref[::-1]]
+
+    dicts = list(r.lookup_dicts_by_rowid(rowids[5:8], with_parts=False))
+    assert dicts == list(r.lookup_dicts(limit=3, offset=5, with_parts=False))
+    assert "_offset" not in dicts[0]
+
+
+def test_indexing_sql_fieldlist_pages(db, monkeypatch):
+    monkeypatch.setattr(SqlDatabase, "MAX_VARIABLES", 4)
+
+    ref = [p.offset for p in db.lookup_parts(resolve_paths=False)]
+    with settings.temporary({"sql-index-page-size": 7, "sql-index-cache-pages": 2}):
+        ds = FieldListInFilesWithSqlIndex(db=db)
+        assert len(ds) == 60
+
+        # sequential access does not load the rowids
+        assert [f._offset for f in ds] == ref
+        assert db._rowids is None
+
+        # random access
+        for n in [0, 59, 3, 30, 31, 15, 58, 1]:
+            assert ds[n]._offset == ref[n]
+            assert len(ds._cache) <= 2
+        assert ds[-1]._offset == ref[-1]
+        assert sorted(ds._cache.keys()) == [0, 8]
+        assert len(db.rowids()) == 60
+
+        with pytest.raises(IndexError):
+            ds.part(60)
+
+        assert ds.get_metadata(22) == {
+            k: v
+            for k, v in _entries()[22].items()
+            if k not in ("_path", "_offset", "_length")
+        }
+
+
+def test_indexing_sql_availability(db, monkeypatch):
+    ds = FieldListInFilesWithSqlIndex(db=db)
+    path = ds.availability_path
+    assert path == db.db_path + ".availability.json"
+
+    ref = FieldListInFilesWithSqlIndex._custom_availability(
+        ds, ignore_keys=["_path", "_offset", "_length"]
+    )
+    # the availability is built from the distinct combinations, not the fields
+    monkeypatch.setattr(ds, "get_metadata", None)
+    try:
+        assert ds.availability.to_list() == ref.to_list()
+        assert ds.availability.count() == 60
+        assert ds._is_full_hypercube()
+
+        # the availability is read back from the file next to the database
+        assert FieldListInFilesWithSqlIndex(db=db)._load_availability().to_list() == (
+            ref.to_list()
+        )
+
+        # the availability of a selection is not stored
+        r = ds.sel(param=["t", "z"], step=6)
+        assert r.availability_path is None
+        assert r.availability.unique_values() == {
+            "levelist": (300, 500, 700, 850, 1000),
+            "levtype": ("pl",),
+            "param": ("t", "z"),
+            "step": (6,),
+        }
+
+        # it is rebuilt when the database changes
+        st = os.stat(path)
+        os.utime(db.db_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+        assert FieldListInFilesWithSqlIndex(db=db)._load_availability() is None
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+@pytest.mark.long_test
+def test_indexing_sql_benchmark():
+    # 10M entries
+    n = 10_000_000 // (len(STEPS) * len(LEVELS) * len(PARAMS))
+
+    with temp_file() as tmp:
+        db = SqlDatabase(tmp)
+        db.load_iterator(iter(_entries(n)))
+
+        r = _filter(
+            db,
+            SqlSelection(dict(param=["t", "z"])),
+            SqlRemapping(remapping={"pl": "{param}{levelist}"}),
+            SqlSelection(dict(levelist=[500, 850])),
+            SqlOrder(dict(levelist="ascending", param=["z", "t"])),
+            SqlSelection(dict(step=6)),
+        )
+
+        # the selections are resolved with the indexes of the columns
+        statement, params = r.query.select(["path", "offset", "length"], 1000, 0)
+        plan = " ".join(_plan(r, statement, params))
+        assert "USING INDEX" in plan, plan
+
+        statement, params = r.query.count()
+        plan = " ".join(_plan(r, statement, params))
+        assert "USING" in plan and "INDEX" in plan, plan
+
+        parts = r.lookup_parts(limit=1000, offset=10_000, resolve_paths=False)
+        assert len(parts) == 1000
+
+        values = r.unique_values("param", "levelist", "step")
+        assert values["i_param"] == ["z", "t"]
+
+        # walk the whole index
+        ds = FieldListInFilesWithSqlIndex(db=db)
+        tracemalloc.start()
+        assert sum(1 for _ in ds.db.iter_parts(resolve_paths=False)) == len(ds)
+        memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert memory < 100 * 1024**2
+
+        # the fields are looked up by rowid, so accessing them does not
+        # depend on their position
+        statement = "SELECT path FROM entries WHERE rowid IN (?, ?);"
+        plan = " ".join(_plan(db, statement, [1, 2]))
+        assert "INTEGER PRIMARY KEY" in plan, plan
+
+        ds.db.rowids()
+        step = len(ds) // 1000
+
+        def access(start):
+            t0 = time.perf_counter()
+            for i in range(start, start + 500 * step, step):
+                ds.part(i)
+            return time.perf_counter() - t0
+
+        first = access(step)
+        last = access(len(ds) - 500 * step)
+        assert last < 2 * first, (first, last)
+
+
+def _best_time(func, repeat=3):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+@pytest.mark.long_test
+def test_indexing_sql_unique_values_benchmark():
+    def entries():
+        keys = itertools.product(
+            range(20), range(0, 240, 6), range(10), range(100, 900, 50), PARAMS
+        )
+        for i, (date, step, number, level, param) in enumerate(keys):
+            yield {
+                "_path": "a.grib",
+                "_offset": i * 10,
+                "_length": 10,
+                "param": param,
+                "levelist": level,
+                "step": step,
+                "date": 20200101 + date,
+                "number": number,
+                "levtype": "pl",
+                "class": "od",
+                "expver": "0001",
+            }
+
+    columns = ["param", "levelist", "step", "date", "number", "levtype", "class"]
+    columns += ["expver", "unknown"]
+
+    with temp_file() as tmp:
+        db = SqlDatabase(tmp)
+        db.load_iterator(entries())
+        r = _filter(
+            db,
+            SqlSelection(dict(param=["t", "u", "z"])),
+            SqlOrder(dict(levelist="ascending", param="descending")),
+        )
+        assert r.count() == 384_000
+
+        # the distinct values of each column computed by separate queries
+        names = [c for c in r.dbkeys if c.startswith("i_")]
+        statement, params = r.query.select(names)
+
+        def baseline():
+            return {
+                c: [
+                    x[0]
+                    for x in r.connection.execute(
+                        f"SELECT DISTINCT {c} FROM ({statement[:-1]})", params
+                    )
+                ]
+                for c in names
+            }
+
+        ref = baseline()
+        values = r.unique_values(*columns)
+        assert values["i_unknown"] == []
+        assert {k: v for k, v in values.items() if k != "i_unknown"} == ref
+        assert values["i_param"] == ["z", "u", "t"]
+
+        assert _best_time(lambda: r.unique_values(*columns)) < _best_time(baseline)
+
+
+if __name__ == "__main__":
+    from earthkit.data.testing import main
+
+    main(__file__)
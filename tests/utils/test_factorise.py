@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+# (C) Copyright 2020 ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+#
+
+import itertools
+import json
+import time
+
+import numpy as np
+import pytest
+
+from earthkit.data.utils.factorise import Table, Tree, factorise
+
+
+def test_factorise_cube_with_hole():
+    req = [
+        dict(param=p, level=lev, step=s)
+        for p, lev, s in itertools.product("tuv", [500, 850], [0, 6])
+        if not (p == "v" and lev == 850)
+    ]
+
+    tree = factorise(req)
+    assert tree.to_list() == [
+        {"level": [500], "param": ["t", "u", "v"], "step": [0, 6]},
+        {"level": [850], "param": ["t", "u"], "step": [0, 6]},
+    ]
+    assert tree.tree().splitlines() == [
+        "step=[0, 6]",
+        "   level=500, param=[t, u, v]",
+        "   level=850, param=[t, u]",
+    ]
+    assert tree.count() == 10
+    assert tree.count(param="v") == 2
+
+    # the order of the requests does not matter
+    assert factorise(req[::-1]).tree() == tree.tree()
+
+
+def test_factorise_lists_and_missing_keys():
+    req = [
+        dict(param="t", level=["500", "850"], step="0"),
+        dict(param="u", level="500", step=["0", "6"]),
+        dict(param="z"),
+    ]
+
+    tree = factorise(req)
+    assert tree.to_list() == [
+        {"level": ["-"], "param": ["z"], "step": ["-"]},
+        {"level": ["500"], "param": ["u"], "step": ["0", "6"]},
+        {"level": ["500", "850"], "param": ["t"], "step": ["0"]},
+    ]
+    assert tree.count() == 5
+
+    # the requests are not modified
+    assert req[0] == dict(param="t", level=["500", "850"], step="0")
+
+
+def test_factorise_intervals():
+    req = [
+        dict(param="t", date="2020-01-01/2020-01-10"),
+        dict(param="t", date="2020-01-05/2020-01-20"),
+        dict(param="u", date="2020-01-01/2020-01-03"),
+    ]
+
+    tree = factorise(req, intervals=["date"])
+    assert tree.tree().splitlines() == [
+        "date=2020-01-01/2020-01-03, param=u",
+        "date=2020-01-01/2020-01-20, param=t",
+    ]
+    assert tree.count() == 23
+    assert req[0]["date"] == "2020-01-01/2020-01-10"
+
+
+@pytest.mark.parametrize("intervals", [None, ["date"]])
+def test_factorise_as_dict(intervals):
+    req = [
+        dict(param="t", level=[500, 850], date="2020-01-01/2020-01-10"),
+        dict(param="u", level=1000, date="2020-01-05/2020-01-20"),
+    ]
+
+    tree = factorise(req, intervals=intervals)
+    d = json.loads(json.dumps(tree.as_dict()))
+    r = Tree.from_dict(d)
+    assert r.tree() == tree.tree()
+    assert r.count() == tree.count()
+    assert r.unique_values() == tree.unique_values()
+
+
+def test_factorise_table():
+    table = Table()
+    table.column("param", ["t", "u", "t", "u", "t"])
+    table.column("level", [500, 500, 850, 850, 500])
+    tree = table.process()
+    assert tree.to_list() == [{"level": [500, 850], "param": ["t", "u"]}]
+
+
+def _mars_cube(n, seed=0):
+    # columns of n rows with the shape of a MARS archive, with missing fields
+    shape = (1000, 2, 61, 10, 10, 6)
+    rng = np.random.default_rng(seed)
+    index = rng.choice(np.prod(shape[:-1]), n // 6, replace=False)
+    date, time_, step, level, param = np.unravel_index(np.sort(index), shape[:-1])
+    date = np.repeat(date, shape[-1])
+    columns = {
+        "date": (20000101 + date).tolist(),
+        "time": (np.repeat(time_, shape[-1]) * 1200).tolist(),
+        "step": (np.repeat(step, shape[-1]) * 6).tolist(),
+        "levelist": np.array([1000, 925, 850, 700, 500, 400, 300, 250, 200, 100])[
+            np.repeat(level, shape[-1])
+        ].tolist(),
+        "param": np.array(list("tuvzqwrdcs"))[np.repeat(param, shape[-1])].tolist(),
+        "number": np.tile(np.arange(shape[-1]), len(date) // shape[-1]).tolist(),
+        "class": ["od"] * len(date),
+    }
+    return columns
+
+
+@pytest.mark.long_test
+def test_factorise_benchmark():
+    times = {}
+    for n in (10**6, 10**7):
+        columns = _mars_cube(n)
+
+        t0 = time.perf_counter()
+        table = Table()
+        for k, v in columns.items():
+            table.column(k, v)
+        tree = table.process()
+        times[n] = time.perf_counter() - t0
+
+        assert tree.count() == len(set(zip(*columns.values())))
+
+    # the time grows linearly with the number of rows (10 times more rows
+    # took about 8 times longer)
+    assert times[10**7] < 20 * times[10**6], times
+
+
+if __name__ == "__main__":
+    from earthkit.data.testing import main
+
+    main(__file__)